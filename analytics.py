@@ -0,0 +1,136 @@
+"""
+KJSIT Book Recommendation System - Analytics Aggregates
+Maintains the analytics_counters table: totals, books per genre, books per
+author and ratings per value. Writers adjust the counters in the same
+transaction as the change they make, so the analytics page reads one small
+precomputed row set instead of aggregating the books and ratings tables.
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func, select, union_all
+
+from models import AnalyticsCounter, Book, Rating, User
+
+TOP_AUTHORS = 10
+
+# Written by rebuild_analytics_summary. Until it exists the counters only hold
+# increments made since the table was created, not the existing rows
+INITIALISED = ('meta', 'initialised')
+
+
+def _rating_key(rating) -> str:
+    return repr(float(rating))
+
+
+def adjust_counter(session, metric: str, key: str, delta: int):
+    """Add delta to one counter, creating it if needed"""
+    if not delta:
+        return
+
+    updated = session.query(AnalyticsCounter).filter_by(metric=metric, key=key).update(
+        {AnalyticsCounter.count: AnalyticsCounter.count + delta},
+        synchronize_session=False
+    )
+    if not updated:
+        session.add(AnalyticsCounter(metric=metric, key=key, count=delta))
+        session.flush()
+
+
+def record_books_added(session, books: Iterable[Dict]):
+    """Count newly inserted books (Book column mappings) by genre and author"""
+    genres, authors, total = Counter(), Counter(), 0
+    for book in books:
+        total += 1
+        if book.get('genre') is not None:
+            genres[book['genre']] += 1
+        authors[book['author']] += 1
+
+    adjust_counter(session, 'total', 'books', total)
+    for genre, count in genres.items():
+        adjust_counter(session, 'genre', genre, count)
+    for author, count in authors.items():
+        adjust_counter(session, 'author', author, count)
+
+
+def record_user_added(session):
+    """Count a newly registered user"""
+    adjust_counter(session, 'total', 'users', 1)
+
+
+def record_rating_change(session, old_rating: Optional[float], new_rating: Optional[float]):
+    """
+    Count a rating write: old_rating is None for a new rating, new_rating is
+    None for a deleted one, and both are set for an update.
+    """
+    if old_rating is not None and new_rating is not None and float(old_rating) == float(new_rating):
+        return
+
+    if old_rating is None:
+        adjust_counter(session, 'total', 'ratings', 1)
+    else:
+        adjust_counter(session, 'rating', _rating_key(old_rating), -1)
+
+    if new_rating is None:
+        adjust_counter(session, 'total', 'ratings', -1)
+    else:
+        adjust_counter(session, 'rating', _rating_key(new_rating), 1)
+
+
+def rebuild_analytics_summary(session):
+    """Recompute every counter from the base tables (after bulk loads or seeding)"""
+    session.query(AnalyticsCounter).delete(synchronize_session=False)
+
+    counters = [
+        AnalyticsCounter(metric=INITIALISED[0], key=INITIALISED[1], count=1),
+        AnalyticsCounter(metric='total', key='books', count=session.query(Book).count()),
+        AnalyticsCounter(metric='total', key='users', count=session.query(User).count()),
+        AnalyticsCounter(metric='total', key='ratings', count=session.query(Rating).count()),
+    ]
+    for genre, count in session.query(Book.genre, func.count(Book.id)).filter(
+        Book.genre.isnot(None)
+    ).group_by(Book.genre):
+        counters.append(AnalyticsCounter(metric='genre', key=genre, count=count))
+    for author, count in session.query(Book.author, func.count(Book.id)).group_by(Book.author):
+        counters.append(AnalyticsCounter(metric='author', key=author, count=count))
+    for rating, count in session.query(Rating.rating, func.count(Rating.id)).group_by(Rating.rating):
+        counters.append(AnalyticsCounter(metric='rating', key=_rating_key(rating), count=count))
+
+    session.add_all(counters)
+    session.flush()
+
+
+def read_analytics_summary(session, top_authors: int = TOP_AUTHORS) -> Dict:
+    """
+    Read the precomputed aggregates in one query. The counters are built
+    from the base tables the first time, if they have never been populated
+    (writes made before that only touched a few counters and are discarded).
+    """
+    metric, key = INITIALISED
+    if not session.query(AnalyticsCounter.id).filter_by(metric=metric, key=key).first():
+        rebuild_analytics_summary(session)
+        session.commit()
+
+    columns = (AnalyticsCounter.metric, AnalyticsCounter.key, AnalyticsCounter.count)
+    authors = select(*columns).where(AnalyticsCounter.metric == 'author').order_by(
+        AnalyticsCounter.count.desc()
+    ).limit(top_authors).subquery()
+    rows = session.execute(union_all(
+        select(*columns).where(AnalyticsCounter.metric.notin_(['author', INITIALISED[0]])),
+        select(authors)
+    )).all()
+
+    summary = {'total_books': 0, 'total_users': 0, 'total_ratings': 0,
+               'genres': [], 'authors': [], 'ratings': []}
+    for metric, key, count in rows:
+        if metric == 'total':
+            summary[f'total_{key}'] = count
+        elif count > 0:
+            value = float(key) if metric == 'rating' else key
+            summary[f'{metric}s'].append((value, count))
+
+    summary['genres'].sort()
+    summary['authors'].sort(key=lambda item: (-item[1], item[0]))
+    summary['ratings'].sort()
+    return summary
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+KJSIT Book Recommendation System - JSON API
+Small HTTP API over the recommendation engine for clients that should not
+go through Streamlit (library kiosk, catalogue integration). Each worker
+process keeps one warm engine and one pooled database engine; when served
+by several processes the engine is loaded once and inherited through fork.
+"""
+
+import os
+import sys
+import json
+import math
+import shutil
+import argparse
+import subprocess
+import time
+from typing import Any
+
+import numpy as np
+from flask import Flask, Response, g, jsonify, request
+from flask_cors import CORS
+
+from config import Config
+from models import create_tables
+from recommendation_engine import BookRecommendationEngine, get_recommendation_engine
+from data_version import DataVersionMonitor
+from metrics import metrics
+
+def to_json(value: Any) -> Any:
+    """Convert engine results (numpy scalars, NaN) into plain JSON values"""
+    if isinstance(value, dict):
+        return {key: to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _limit(default: int = None) -> int:
+    """The request's ?limit=, clamped to [1, API_MAX_LIMIT]"""
+    limit = request.args.get('limit', default or Config.MAX_RECOMMENDATIONS, type=int)
+    return max(1, min(limit, Config.API_MAX_LIMIT))
+
+
+def _search_cursor(raw: str, sort: str) -> tuple:
+    """
+    Decode a search cursor (the previous page's next_cursor, JSON encoded)
+    into (sort key, book_id); ValueError unless the key fits the sort.
+    """
+    cursor = json.loads(raw)
+    if not isinstance(cursor, list) or len(cursor) != 2:
+        raise ValueError("cursor must be [sort key, book id]")
+    key, book_id = cursor
+
+    column, _ = BookRecommendationEngine.SEARCH_SORT_KEYS.get(sort, BookRecommendationEngine.SEARCH_SORT_KEYS['rating'])
+    if column in ('title', 'author'):
+        key_ok = isinstance(key, str)
+    else:
+        key_ok = isinstance(key, (int, float)) and not isinstance(key, bool) and math.isfinite(key)
+    if not key_ok or not isinstance(book_id, int) or isinstance(book_id, bool):
+        raise ValueError(f"cursor does not fit sort '{sort}'")
+    return key, book_id
+
+
+def _error(message: str, status: int):
+    return jsonify({'error': message}), status
+
+
+def create_app(warm: bool = False) -> Flask:
+    """Build the API application; warm=True loads the engine up front"""
+    app = Flask(__name__)
+    CORS(app)
+
+    # The engine reads tables added after the database was first created (rating_events, data_versions)
+    create_tables()
+
+    if warm:
+        get_recommendation_engine()
+
+    # Polled at the start of every request, so writes from other processes are picked up
+    data_versions = DataVersionMonitor()
+
+    @app.before_request
+    def start_timer():
+        g.started = time.perf_counter()
+        if request.endpoint not in ('prometheus_metrics', 'metrics_snapshot'):
+            data_versions.sync(get_recommendation_engine())
+
+    @app.after_request
+    def record_request(response):
+        if request.endpoint and 'started' in g:
+            metrics.observe(f"api.{request.endpoint}", time.perf_counter() - g.started,
+                            error=response.status_code >= 500)
+        return response
+
+    @app.get('/metrics')
+    def prometheus_metrics():
+        return Response(metrics.to_prometheus(), mimetype='text/plain; version=0.0.4')
+
+    @app.get('/api/metrics')
+    def metrics_snapshot():
+        return jsonify(metrics.snapshot())
+
+    @app.get('/api/health')
+    def health():
+        engine = get_recommendation_engine()
+        return jsonify({
+            'status': 'ok',
+            'model_version': engine.model_version,
+            'event_seq': engine.event_seq,
+            'data_version': data_versions.poll(),
+            'books': len(engine.books_df)
+        })
+
+    @app.get('/api/books/search')
+    def search_books():
+        query = request.args.get('q', '').strip()
+        if not query:
+            return _error("Missing search query 'q'", 400)
+
+        sort = request.args.get('sort', 'rating')
+        cursor = request.args.get('cursor')
+        try:
+            cursor = _search_cursor(cursor, sort) if cursor else None
+        except ValueError as e:
+            return _error(f"Invalid cursor: {e}", 400)
+
+        page = get_recommendation_engine().search_books_page(
+            query,
+            page_size=_limit(),
+            cursor=cursor,
+            genre=request.args.get('genre') or None,
+            min_rating=request.args.get('min_rating', type=float),
+            sort=sort
+        )
+        return jsonify(to_json(page))
+
+    @app.get('/api/books/popular')
+    def popular_books():
+        return jsonify(to_json(get_recommendation_engine().get_popular_books(_limit())))
+
+    @app.get('/api/books/genre/<genre>')
+    def books_by_genre(genre):
+        engine = get_recommendation_engine()
+        if engine.resolve_genre(genre) is None:
+            return _error("Unknown genre", 404)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        return jsonify(to_json(engine.get_books_by_genre(genre, _limit(), offset)))
+
+    @app.get('/api/books/<int:book_id>')
+    def book_details(book_id):
+        book = get_recommendation_engine().get_book_details(book_id)
+        if book is None:
+            return _error("Book not found", 404)
+        return jsonify(to_json(book))
+
+    @app.get('/api/books/<int:book_id>/similar')
+    def similar_books(book_id):
+        engine = get_recommendation_engine()
+        if not engine.get_books([book_id]):
+            return _error("Book not found", 404)
+        return jsonify(to_json(engine.get_content_based_recommendations(book_id, _limit())))
+
+    @app.get('/api/users/<int:user_id>/recommendations/collaborative')
+    def collaborative_recommendations(user_id):
+        engine = get_recommendation_engine()
+        return jsonify(to_json(engine.get_collaborative_filtering_recommendations(user_id, _limit())))
+
+    @app.get('/api/users/<int:user_id>/recommendations')
+    def hybrid_recommendations(user_id):
+        engine = get_recommendation_engine()
+        return jsonify(to_json(engine.get_hybrid_recommendations(
+            user_id, _limit(),
+            department=request.args.get('department') or None,
+            year=request.args.get('year') or None
+        )))
+
+    return app
+
+
+def serve(port: int = None, workers: int = None, host: str = '0.0.0.0'):
+    """
+    Serve the API with several worker processes.
+
+    Uses gunicorn (--preload, so the engine is loaded once in the master
+    and inherited by the workers). Without gunicorn (e.g. on Windows) it
+    falls back to werkzeug's threaded server in a single process: werkzeug's
+    multi-process mode forks a throwaway child per request, which would
+    lose every catch-up and cache the request did.
+    """
+    port = port or Config.API_PORT
+    workers = workers or Config.API_WORKERS or os.cpu_count() or 1
+
+    if shutil.which('gunicorn'):
+        print(f"🚀 Starting API on port {port} with {workers} gunicorn worker(s)...")
+        subprocess.run([
+            'gunicorn', '--preload', '--workers', str(workers),
+            '--bind', f"{host}:{port}", 'api_server:create_app(warm=True)'
+        ])
+        return
+
+    from werkzeug.serving import run_simple
+
+    print("📚 Loading recommendation engine...")
+    app = create_app(warm=True)
+
+    if workers > 1:
+        print(f"⚠️ gunicorn not found; serving from one process instead of {workers} "
+              "(pip install gunicorn)")
+    print(f"🚀 Starting API on port {port} (threaded, single process)...")
+    run_simple(host, port, app, threaded=True)
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description='KJSIT Book Recommendation JSON API')
+    parser.add_argument('--port', '-p', type=int, default=None,
+                        help='Port to listen on (default: API_PORT)')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                        help='Worker processes (default: one per CPU core)')
+
+    args = parser.parse_args()
+    try:
+        serve(args.port, args.workers)
+    except KeyboardInterrupt:
+        print("\n👋 API server stopped by user")
+    except Exception as e:
+        print(f"❌ Error starting API server: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,20 @@ import plotly.graph_objects as go
 from datetime import datetime
 import os
 import json
+import threading
+import functools
 from dotenv import load_dotenv
-from models import get_session, User, Book, Rating, Review, create_tables
+from models import get_engine, User, Book, Rating, Review, create_tables
 from sqlalchemy import func
-from recommendation_engine import recommendation_engine
+from sqlalchemy.orm import sessionmaker
+from recommendation_engine import create_recommendation_engine
+from analytics import read_analytics_summary, record_user_added
+from queries import get_user_ratings_page, get_precomputed_recommendations
+from rating_service import delete_rating, submit_rating
+from data_version import USERS, DataVersionMonitor, bump_data_version, version_token
+from metrics import metrics
+from config import Config
+import math
 import hashlib
 
 # Load environment variables
@@ -264,10 +274,44 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource(show_spinner=False)
+def get_db_engine():
+    """Pooled SQLAlchemy engine shared by every session of this server process"""
+    return get_engine()
+
+@st.cache_resource(show_spinner=False)
+def get_session_factory():
+    return sessionmaker(bind=get_db_engine())
+
+def get_session():
+    """Open a session on the pooled engine"""
+    return get_session_factory()()
+
+@st.cache_resource(show_spinner="Loading recommendation engine...")
+def get_recommendation_engine():
+    """Recommendation engine shared by every session of this server process"""
+    return create_recommendation_engine()
+
+@st.cache_resource(show_spinner=False)
+def _data_version_monitor():
+    return DataVersionMonitor()
+
+def sync_data_version():
+    """Catch the shared engine up with writes from any process (run at the start of each rerun)"""
+    _data_version_monitor().sync(get_recommendation_engine())
+
+def current_data_version():
+    """Token that cached read models are keyed on; changes whenever any process writes"""
+    return version_token(_data_version_monitor().poll())
+
+@st.cache_resource(show_spinner=False)
+def _create_tables_once():
+    create_tables()
+
 def init_database():
     """Initialize database tables"""
     try:
-        create_tables()
+        _create_tables_once()
         st.success("Database initialized successfully!")
     except Exception as e:
         st.error(f"Error initializing database: {e}")
@@ -311,6 +355,8 @@ def register_user(student_id, name, email, department, year, password):
         )
 
         session.add(new_user)
+        record_user_added(session)
+        bump_data_version(session, USERS)
         session.commit()
         return True, "User registered successfully!"
     except Exception as e:
@@ -319,24 +365,185 @@ def register_user(student_id, name, email, department, year, password):
     finally:
         session.close()
 
-def get_user_stats(user_id):
+_cache_lookup = threading.local()
+
+def cached_read(name):
+    """st.cache_data that also counts hits and misses (the body only runs on a miss)"""
+    def decorator(func):
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            _cache_lookup.missed = True
+            return func(*args, **kwargs)
+
+        cached = st.cache_data(show_spinner=False)(compute)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            _cache_lookup.missed = False
+            result = cached(*args, **kwargs)
+            metrics.record_cache(name, hit=not _cache_lookup.missed)
+            return result
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorator
+
+def save_rating(user_id, book_id, rating, review_text=None):
+    """Save a rating (and optional review) and push it to the shared engine"""
+    session = get_session()
+    try:
+        submit_rating(
+            session, user_id, book_id, rating, review_text,
+            engine=get_recommendation_engine()
+        )
+        return True, "Rating submitted successfully!"
+    except ValueError as e:
+        return False, str(e)
+    except Exception as e:
+        return False, f"Error saving rating: {e}"
+    finally:
+        session.close()
+
+def remove_rating(user_id, book_id):
+    """Delete a rating and push the removal to the shared engine"""
+    session = get_session()
+    try:
+        delete_rating(session, user_id, book_id, engine=get_recommendation_engine())
+        return True, "Rating removed"
+    except ValueError as e:
+        return False, str(e)
+    except Exception as e:
+        return False, f"Error removing rating: {e}"
+    finally:
+        session.close()
+
+@cached_read('user_stats')
+def get_user_stats(user_id, data_version):
     """Get user statistics"""
     session = get_session()
     try:
-        ratings_count = session.query(Rating).filter_by(user_id=user_id).count()
-        avg_rating = session.query(Rating.rating).filter_by(user_id=user_id).first()
-        avg_rating = avg_rating[0] if avg_rating else 0
+        ratings_count, avg_rating = session.query(
+            func.count(Rating.id), func.avg(Rating.rating)
+        ).filter(Rating.user_id == user_id).one()
 
         return {
             'total_ratings': ratings_count,
-            'average_rating': round(avg_rating, 2)
+            'average_rating': round(avg_rating or 0, 2)
         }
     finally:
         session.close()
 
+@cached_read('my_books_page')
+def get_user_rated_books_page(user_id, page_size, cursor, genre, data_version):
+    """Get one page of the books a user has rated, as plain dicts"""
+    session = get_session()
+    try:
+        return get_user_ratings_page(session, user_id, page_size, cursor, genre)
+    finally:
+        session.close()
+
+@cached_read('analytics_summary')
+def get_analytics_summary(data_version):
+    """Get the aggregates shown on the analytics page"""
+    session = get_session()
+    try:
+        # Totals and distributions come precomputed from analytics_counters
+        summary = read_analytics_summary(session)
+        summary['sample_books'] = [{
+            'title': book.title,
+            'author': book.author,
+            'genre': book.genre,
+            'accession_number': book.accession_number,
+            'price': book.price
+        } for book in session.query(Book).limit(10)]
+        return summary
+    finally:
+        session.close()
+
+def get_precomputed_books(kind, subject_id, limit, score_key):
+    """Precomputed recommendations as book dicts, or None to fall back to live scoring"""
+    session = get_session()
+    try:
+        rows = get_precomputed_recommendations(session, kind, subject_id, limit)
+    finally:
+        session.close()
+    metrics.record_cache('precomputed_recommendations', hit=rows is not None)
+    if rows is None:
+        return None
+
+    scores = dict(rows)
+    books = get_recommendation_engine().get_books([book_id for book_id, _ in rows])
+    for book in books:
+        book[score_key] = scores[book['book_id']]
+    return books
+
+@cached_read('hybrid_recommendations')
+def get_cached_hybrid_recommendations(user_id, limit, department, year, data_version):
+    books = get_precomputed_books('user', user_id, limit, 'predicted_rating')
+    if books is None:
+        books = get_recommendation_engine().get_hybrid_recommendations(
+            user_id, limit, department=department, year=year
+        )
+    return books
+
+@cached_read('similar_books')
+def get_cached_similar_books(book_id, limit, data_version):
+    books = get_precomputed_books('similar', book_id, limit, 'similarity_score')
+    if books is None:
+        books = get_recommendation_engine().get_content_based_recommendations(book_id, limit)
+    return books
+
+@cached_read('popular_books')
+def get_cached_popular_books(limit, data_version):
+    return get_recommendation_engine().get_popular_books(limit)
+
+PAGE_SIZE = 10
+
+SEARCH_SORT_OPTIONS = {
+    "Rating": 'rating',
+    "Title": 'title',
+    "Author": 'author',
+    "Price (Low to High)": 'price_asc',
+    "Price (High to Low)": 'price_desc'
+}
+
+def get_page_cursor(view, signature):
+    """Cursor for the current page of a paginated view; back to page 1 when its inputs change"""
+    if st.session_state.get(f"{view}_signature") != signature:
+        st.session_state[f"{view}_signature"] = signature
+        st.session_state[f"{view}_cursors"] = [None]
+    return st.session_state[f"{view}_cursors"][-1]
+
+def render_pager(view, total, next_cursor):
+    """Previous/next controls for a paginated view"""
+    cursors = st.session_state[f"{view}_cursors"]
+    page_number = len(cursors)
+    page_count = max(1, math.ceil(total / PAGE_SIZE))
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("⬅️ Previous", key=f"{view}_prev", disabled=page_number == 1):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.write(f"Page {page_number} of {page_count} ({total} books)")
+    with col3:
+        if st.button("Next ➡️", key=f"{view}_next", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
+
+def book_details_button(book_id, key):
+    """View Details toggle; the open details stay open across reruns (e.g. while rating)"""
+    open_key = f"details_{key}"
+    if st.button("View Details", key=key):
+        st.session_state[open_key] = not st.session_state.get(open_key, False)
+    if st.session_state.get(open_key):
+        show_book_details(book_id, key)
+
 def main():
     # Initialize database
     init_database()
+    sync_data_version()
 
     # Sidebar
     st.sidebar.markdown('<div class="sidebar-header">📚 KJSIT Book Recommender</div>',
@@ -407,7 +614,7 @@ def main():
     st.sidebar.write(f"**Department:** {user.department}")
     st.sidebar.write(f"**Year:** {user.year}")
 
-    user_stats = get_user_stats(user.id)
+    user_stats = get_user_stats(user.id, current_data_version())
     st.sidebar.write(f"**Books Rated:** {user_stats['total_ratings']}")
     st.sidebar.write(f"**Avg Rating:** {user_stats['average_rating']} ⭐")
 
@@ -416,25 +623,25 @@ def main():
         st.session_state.current_user = None
         st.rerun()
 
-    # Main navigation
-    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
-        "🏠 Home", "🔍 Search", "📖 My Books", "📊 Analytics", "👥 Community", "📝 Journals", "📓 Blackbooks"
-    ])
-
-    with tab1:
-        show_home_page()
-
-    with tab2:
-        show_search_page()
-
-    with tab3:
-        show_my_books_page(user.id)
-
-    with tab4:
-        show_analytics_page()
+    # Main navigation: only the selected page is rendered (and computed) per rerun
+    pages = {
+        "🏠 Home": show_home_page,
+        "🔍 Search": show_search_page,
+        "📖 My Books": lambda: show_my_books_page(user.id),
+        "📊 Analytics": show_analytics_page,
+        "👥 Community": show_community_page,
+        "📝 Journals": lambda: st.info("Journals are coming soon."),
+        "📓 Blackbooks": lambda: st.info("Blackbooks are coming soon.")
+    }
+    # Hidden unless the user is listed in ADMIN_STUDENT_IDS
+    if user.student_id in Config.ADMIN_STUDENT_IDS:
+        pages["🩺 Diagnostics"] = show_diagnostics_page
+    active_page = st.radio(
+        "Navigation", list(pages), horizontal=True,
+        key="active_page", label_visibility="collapsed"
+    )
 
-    with tab5:
-        show_community_page()
+    pages[active_page]()
 
 
 def show_home_page():
@@ -443,7 +650,13 @@ def show_home_page():
     user = st.session_state.current_user
 
     # Get hybrid recommendations
-    recommendations = recommendation_engine.get_hybrid_recommendations(user.id, 6)
+    recommendations = get_cached_hybrid_recommendations(
+        user.id, 6, user.department, user.year, current_data_version()
+    )
+
+    if recommendations and recommendations[0].get('sources') == ['cold_start']:
+        st.caption(f"Popular with {user.department} {user.year} students. "
+                   "Rate a few books to make these your own.")
 
     if recommendations:
         cols = st.columns(2)
@@ -466,8 +679,7 @@ def show_home_page():
                     external_url = get_book_external_url(book['title'], book['author'])
                     col1, col2 = st.columns(2)
                     with col1:
-                        if st.button(f"View Details", key=f"rec_{book['book_id']}"):
-                            show_book_details(book['book_id'])
+                        book_details_button(book['book_id'], f"rec_{book['book_id']}")
                     with col2:
                         if external_url:
                             st.markdown(f"[🌐 External Link]({external_url})")
@@ -476,7 +688,7 @@ def show_home_page():
 
         # Show popular books instead
         st.subheader("🔥 Popular Books")
-        popular_books = recommendation_engine.get_popular_books(6)
+        popular_books = get_cached_popular_books(6, current_data_version())
 
         if popular_books:
             cols = st.columns(2)
@@ -498,8 +710,7 @@ def show_home_page():
                     external_url = get_book_external_url(book['title'], book['author'])
                     col1, col2 = st.columns(2)
                     with col1:
-                        if st.button(f"View Details", key=f"popular_{book['book_id']}"):
-                            show_book_details(book['book_id'])
+                        book_details_button(book['book_id'], f"popular_{book['book_id']}")
                     with col2:
                         if external_url:
                             st.markdown(f"[🌐 External Link]({external_url})")
@@ -512,41 +723,39 @@ def show_search_page():
     search_query = st.text_input("Search by title, author, or genre:")
 
     if search_query:
-        results = recommendation_engine.search_books(search_query, 20)
+        # Filter values from the previous run drive the query; the widgets render below
+        genre_filter = st.session_state.get("search_genre", "All")
+        min_rating = st.session_state.get("search_min_rating", 3.0)
+        sort_by = st.session_state.get("search_sort", "Rating")
+
+        cursor = get_page_cursor("search", (search_query, genre_filter, min_rating, sort_by))
+        page = get_recommendation_engine().search_books_page(
+            search_query,
+            page_size=PAGE_SIZE,
+            cursor=cursor,
+            genre=None if genre_filter == "All" else genre_filter,
+            min_rating=min_rating,
+            sort=SEARCH_SORT_OPTIONS[sort_by]
+        )
+        facets = page['facets']
 
-        if results:
-            # Filter options
+        if facets:
+            # Filter options (genre counts cover every match, not just this page)
+            genre_options = ["All"] + sorted(set(facets) | ({genre_filter} - {"All"}))
             col1, col2, col3 = st.columns(3)
             with col1:
-                genre_filter = st.selectbox("Filter by Genre",
-                    ["All"] + list(set([r['genre'] for r in results if r['genre']])))
+                st.selectbox("Filter by Genre", genre_options, key="search_genre",
+                    format_func=lambda g: g if g == "All" else f"{g} ({facets.get(g, 0)})")
             with col2:
-                min_rating = st.slider("Minimum Rating", 0.0, 5.0, 3.0)
+                st.slider("Minimum Rating", 0.0, 5.0, 3.0, key="search_min_rating")
             with col3:
-                sort_by = st.selectbox("Sort by", ["Rating", "Title", "Author", "Price (Low to High)", "Price (High to Low)"])
-
-            # Apply filters
-            filtered_results = results
-            if genre_filter != "All":
-                filtered_results = [r for r in results if r['genre'] == genre_filter]
-            filtered_results = [r for r in filtered_results if r['average_rating'] >= min_rating]
-
-            # Sort results
-            if sort_by == "Rating":
-                filtered_results.sort(key=lambda x: x['average_rating'], reverse=True)
-            elif sort_by == "Title":
-                filtered_results.sort(key=lambda x: x['title'])
-            elif sort_by == "Author":
-                filtered_results.sort(key=lambda x: x['author'])
-            elif sort_by == "Price (Low to High)":
-                # Sort by price, handling None values
-                filtered_results.sort(key=lambda x: x.get('price', 0) or 0)
-            elif sort_by == "Price (High to Low)":
-                # Sort by price descending, handling None values
-                filtered_results.sort(key=lambda x: x.get('price', 0) or 0, reverse=True)
+                st.selectbox("Sort by", list(SEARCH_SORT_OPTIONS), key="search_sort")
+
+            if not page['items']:
+                st.info("No books match the selected filters.")
 
             # Display results
-            for book in filtered_results:
+            for book in page['items']:
                 with st.container():
                     col1, col2, col3 = st.columns([2, 1, 1])
                     with col1:
@@ -565,92 +774,109 @@ def show_search_page():
                     with col3:
                         # Check if book has external URL
                         external_url = get_book_external_url(book['title'], book['author'])
-                        if st.button("View Details", key=f"search_{book['book_id']}"):
-                            show_book_details(book['book_id'])
+                        book_details_button(book['book_id'], f"search_{book['book_id']}")
                         if external_url:
                             st.markdown(f"[🌐 External]({external_url})")
+
+            if page['total']:
+                render_pager("search", page['total'], page['next_cursor'])
         else:
             st.info("No books found matching your search.")
 
 def show_my_books_page(user_id):
     st.subheader("📖 My Books")
 
-    # Get user's ratings
-    session = get_session()
-    try:
-        user_ratings = session.query(Rating, Book).join(Book).filter(
-            Rating.user_id == user_id
-        ).all()
-
-        if user_ratings:
-            for rating, book in user_ratings:
-                with st.container():
-                    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
-                    with col1:
-                        st.markdown(f"""
-                        <div class="book-card">
-                            <h4>{book.title}</h4>
-                            <p><strong>Author:</strong> {book.author}</p>
-                            <p><strong>Genre:</strong> {book.genre or 'N/A'}</p>
-                            <p><strong>Accession:</strong> {book.accession_number or 'N/A'}</p>
-                            <p><strong>Price:</strong> ₹{book.price if book.price else 'N/A'}</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    with col2:
-                        st.write(f"**Your Rating:** {rating.rating:.1f} ⭐")
-                    with col3:
-                        st.write(f"**Avg Rating:** {book.average_rating:.1f} ⭐")
-                    with col4:
-                        # Check if book has external URL
-                        external_url = get_book_external_url(book.title, book.author)
-                        if st.button("Update Rating", key=f"update_{book.id}"):
-                            new_rating = st.number_input(
-                                f"New rating for {book.title}",
-                                min_value=1.0, max_value=5.0, step=0.5,
-                                key=f"rating_{book.id}"
-                            )
-                            if st.button("Save", key=f"save_{book.id}"):
-                                # Update rating logic here
+    # Get one page of the user's ratings
+    genre_filter = st.session_state.get("my_books_genre", "All")
+    cursor = get_page_cursor("my_books", (user_id, genre_filter))
+    page = get_user_rated_books_page(
+        user_id, PAGE_SIZE, cursor,
+        None if genre_filter == "All" else genre_filter,
+        current_data_version()
+    )
+    facets = page['facets']
+
+    if facets:
+        genre_options = ["All"] + sorted(set(facets) | ({genre_filter} - {"All"}))
+        st.selectbox("Filter by Genre", genre_options, key="my_books_genre",
+            format_func=lambda g: g if g == "All" else f"{g} ({facets.get(g, 0)})")
+
+        for book in page['items']:
+            with st.container():
+                col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+                with col1:
+                    st.markdown(f"""
+                    <div class="book-card">
+                        <h4>{book['title']}</h4>
+                        <p><strong>Author:</strong> {book['author']}</p>
+                        <p><strong>Genre:</strong> {book['genre'] or 'N/A'}</p>
+                        <p><strong>Accession:</strong> {book['accession_number'] or 'N/A'}</p>
+                        <p><strong>Price:</strong> ₹{book['price'] if book['price'] else 'N/A'}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+                with col2:
+                    st.write(f"**Your Rating:** {book['user_rating']:.1f} ⭐")
+                with col3:
+                    st.write(f"**Avg Rating:** {book['average_rating']:.1f} ⭐")
+                with col4:
+                    # Check if book has external URL
+                    external_url = get_book_external_url(book['title'], book['author'])
+                    edit_key = f"edit_{book['book_id']}"
+                    if st.button("Update Rating", key=f"update_{book['book_id']}"):
+                        st.session_state[edit_key] = not st.session_state.get(edit_key, False)
+                    if st.session_state.get(edit_key):
+                        new_rating = st.number_input(
+                            f"New rating for {book['title']}",
+                            min_value=1.0, max_value=5.0, step=0.5,
+                            value=float(book['user_rating']),
+                            key=f"rating_{book['book_id']}"
+                        )
+                        if st.button("Save", key=f"save_{book['book_id']}"):
+                            success, message = save_rating(user_id, book['book_id'], new_rating)
+                            if success:
+                                st.session_state[edit_key] = False
                                 st.success("Rating updated!")
-                        if external_url:
-                            st.markdown(f"[🌐 External]({external_url})")
-        else:
-            st.info("You haven't rated any books yet. Start exploring and rate some books!")
-
-    finally:
-        session.close()
+                            else:
+                                st.error(message)
+                        if st.button("🗑️ Remove", key=f"remove_{book['book_id']}"):
+                            success, message = remove_rating(user_id, book['book_id'])
+                            if success:
+                                st.session_state[edit_key] = False
+                                st.success("Rating removed!")
+                            else:
+                                st.error(message)
+                    if external_url:
+                        st.markdown(f"[🌐 External]({external_url})")
+
+        render_pager("my_books", page['total'], page['next_cursor'])
+    else:
+        st.info("You haven't rated any books yet. Start exploring and rate some books!")
 
 def show_analytics_page():
     st.subheader("📊 Analytics Dashboard")
 
-    # Get overall statistics
-    session = get_session()
     try:
-        total_books = session.query(Book).count()
-        total_users = session.query(User).count()
-        total_ratings = session.query(Rating).count()
+        # Get overall statistics
+        summary = get_analytics_summary(current_data_version())
 
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Total Books", total_books)
+            st.metric("Total Books", summary['total_books'])
         with col2:
-            st.metric("Total Users", total_users)
+            st.metric("Total Users", summary['total_users'])
         with col3:
-            st.metric("Total Ratings", total_ratings)
+            st.metric("Total Ratings", summary['total_ratings'])
 
         # Show some sample books
         st.subheader("📚 Sample Books from Collection")
-        sample_books = session.query(Book).limit(10).all()
-        for book in sample_books:
-            price_info = f"₹{book.price:.2f}" if book.price else "Price not available"
-            accession_info = f"Accession: {book.accession_number}" if book.accession_number else "Accession: N/A"
-            st.markdown(f"**{book.title}** by {book.author} ({book.genre}) - {accession_info} - {price_info}")
+        for book in summary['sample_books']:
+            price_info = f"₹{book['price']:.2f}" if book['price'] else "Price not available"
+            accession_info = f"Accession: {book['accession_number']}" if book['accession_number'] else "Accession: N/A"
+            st.markdown(f"**{book['title']}** by {book['author']} ({book['genre']}) - {accession_info} - {price_info}")
 
         # Genre distribution
         st.subheader("📈 Genre Distribution")
-        genre_data = session.query(Book.genre, func.count(Book.id)).filter(
-            Book.genre.isnot(None)
-        ).group_by(Book.genre).all()
+        genre_data = summary['genres']
         
         st.write(f"Found {len(genre_data)} genres")
         
@@ -668,7 +894,7 @@ def show_analytics_page():
 
         # Top authors
         st.subheader("👥 Top Authors by Book Count")
-        author_data = session.query(Book.author, func.count(Book.id)).group_by(Book.author).order_by(func.count(Book.id).desc()).limit(10).all()
+        author_data = summary['authors']
         if author_data:
             authors, counts = zip(*author_data)
             fig = px.bar(x=counts, y=authors, orientation='h', title="Top Authors")
@@ -677,9 +903,7 @@ def show_analytics_page():
         
         # Rating distribution
         st.subheader("⭐ Rating Distribution")
-        rating_data = session.query(Rating.rating, func.count(Rating.id)).group_by(
-            Rating.rating
-        ).all()
+        rating_data = summary['ratings']
         
         st.write(f"Found {len(rating_data)} rating values")
 
@@ -700,15 +924,67 @@ def show_analytics_page():
         st.error(f"Error in analytics page: {e}")
         import traceback
         st.text(traceback.format_exc())
-    finally:
-        session.close()
+
+def show_diagnostics_page():
+    st.subheader("🩺 Diagnostics")
+    refresh = st.toggle("Live refresh (every 5s)", key="diagnostics_live")
+
+    @st.fragment(run_every=5 if refresh else None)
+    def live_metrics():
+        snapshot = metrics.snapshot()
+        st.caption(f"Process uptime: {snapshot['uptime_seconds']:.0f}s (metrics are per server process)")
+
+        st.subheader("⏱️ Method Latency")
+        if snapshot['methods']:
+            methods = pd.DataFrame.from_dict(snapshot['methods'], orient='index')
+            latency_columns = ['mean_seconds', 'p50_seconds', 'p95_seconds', 'p99_seconds']
+            methods[latency_columns] = methods[latency_columns] * 1000
+            methods = methods.rename(columns={
+                'mean_seconds': 'mean (ms)', 'p50_seconds': 'p50 (ms)',
+                'p95_seconds': 'p95 (ms)', 'p99_seconds': 'p99 (ms)',
+                'calls_per_second': 'calls/s', 'total_seconds': 'total (s)'
+            })
+            st.dataframe(methods, use_container_width=True)
+        else:
+            st.info("No calls recorded yet.")
+
+        st.subheader("🗄️ Cache Hit Rates")
+        if snapshot['caches']:
+            st.dataframe(pd.DataFrame.from_dict(snapshot['caches'], orient='index'), use_container_width=True)
+        else:
+            st.info("No cache lookups recorded yet.")
+
+        st.subheader("🏗️ Model Builds")
+        if snapshot['builds']:
+            builds = pd.DataFrame.from_dict(snapshot['builds'], orient='index')
+            builds['finished_at'] = pd.to_datetime(builds['finished_at'], unit='s')
+            st.dataframe(builds, use_container_width=True)
+
+        st.subheader("🧠 Model Memory")
+        memory = get_recommendation_engine().memory_report()
+        columns = memory.pop('books_df_columns', {})
+        st.dataframe(pd.DataFrame(
+            {'MB': {name: size / 2**20 for name, size in memory.items()}}
+        ), use_container_width=True)
+        if columns:
+            with st.expander("books_df by column"):
+                st.dataframe(pd.DataFrame(
+                    {'KB': {name: size / 2**10 for name, size in columns.items()}}
+                ), use_container_width=True)
+
+        with st.expander("Prometheus export"):
+            st.code(metrics.to_prometheus(), language="text")
+        with st.expander("JSON snapshot"):
+            st.json(snapshot)
+
+    live_metrics()
 
 def show_community_page():
     st.subheader("👥 Community")
 
     # Popular books this week
     st.subheader("🔥 Trending This Week")
-    popular_books = recommendation_engine.get_popular_books(5)
+    popular_books = get_cached_popular_books(5, current_data_version())
 
     for book in popular_books:
         with st.container():
@@ -727,8 +1003,7 @@ def show_community_page():
             external_url = get_book_external_url(book['title'], book['author'])
             col1, col2 = st.columns(2)
             with col1:
-                if st.button(f"View Details", key=f"community_{book['book_id']}"):
-                    show_book_details(book['book_id'])
+                book_details_button(book['book_id'], f"community_{book['book_id']}")
             with col2:
                 if external_url:
                     st.markdown(f"[🌐 External Link]({external_url})")
@@ -755,9 +1030,9 @@ def get_book_external_url(book_title, book_author):
     
     return None
 
-def show_book_details(book_id):
+def show_book_details(book_id, key="details"):
     """Show detailed view of a book"""
-    book_details = recommendation_engine.get_book_details(book_id)
+    book_details = get_recommendation_engine().get_book_details(book_id)
 
     if not book_details:
         st.error("Book not found")
@@ -781,16 +1056,21 @@ def show_book_details(book_id):
 
     # Rating section
     st.subheader("⭐ Rate this book")
-    rating = st.slider("Your rating", 1.0, 5.0, 3.0, 0.5)
-    review_text = st.text_area("Write a review (optional)")
+    rating = st.slider("Your rating", 1.0, 5.0, 3.0, 0.5, key=f"{key}_rating")
+    review_text = st.text_area("Write a review (optional)", key=f"{key}_review")
 
-    if st.button("Submit Rating"):
-        # Save rating logic here
-        st.success("Rating submitted successfully!")
+    if st.button("Submit Rating", key=f"{key}_submit"):
+        success, message = save_rating(
+            st.session_state.current_user.id, book_id, rating, review_text
+        )
+        if success:
+            st.success(message)
+        else:
+            st.error(message)
 
     # Similar books
     st.subheader("📚 Similar Books")
-    similar_books = recommendation_engine.get_content_based_recommendations(book_id, 5)
+    similar_books = get_cached_similar_books(book_id, 5, current_data_version())
 
     if similar_books:
         for book in similar_books:
@@ -0,0 +1,617 @@
+#!/usr/bin/env python3
+"""
+KJSIT Book Recommendation System - Benchmarks
+Builds synthetic catalogs at several scales and measures the recommendation
+engine against each one: the model build (load_data and its phases) and
+every query path, reporting wall time, peak RSS and Python allocations.
+Each scale runs in its own process, so one scale cannot skew another's RSS
+and a scale that runs out of memory is recorded instead of aborting the run.
+Results are written as JSON named after the git commit, and --compare diffs
+two result files.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import subprocess
+import statistics
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS from getrusage
+    resource = None
+
+try:
+    import psutil
+except ImportError:  # psutil is optional; only the current RSS needs it
+    psutil = None
+
+from config import BRANCH_GENRE_MAPPING
+
+RESULTS_FORMAT_VERSION = 1
+DEFAULT_DATA_DIR = 'benchmark_data'
+DEFAULT_RESULTS_DIR = 'benchmark_results'
+
+# Scale name -> (books, users, ratings per user); users grow with the catalog
+SCALES = {
+    '1k': (1_000, 100, 12),
+    '10k': (10_000, 1_000, 12),
+    '100k': (100_000, 10_000, 12),
+}
+
+# Query paths timed at every scale
+QUERY_METHODS = [
+    'get_popular_books',
+    'get_books_by_genre',
+    'get_collaborative_filtering_recommendations',
+    'get_content_based_recommendations',
+    'get_hybrid_recommendations',
+    'search_books',
+    'get_book_details',
+]
+
+SUBJECT_WORDS = [
+    'ENGINEERING', 'PHYSICS', 'CHEMISTRY', 'MATHEMATICS', 'DATA', 'STRUCTURES',
+    'ALGORITHMS', 'DATABASE', 'SYSTEMS', 'COMPUTER', 'NETWORKS', 'OPERATING',
+    'DIGITAL', 'ELECTRONICS', 'SIGNALS', 'CONTROL', 'MICROPROCESSORS', 'THEORY',
+    'APPLIED', 'INTRODUCTION', 'PRINCIPLES', 'ANALYSIS', 'DESIGN', 'MACHINE',
+    'LEARNING', 'COMMUNICATION', 'ANALOG', 'CIRCUITS', 'SOFTWARE', 'PROGRAMMING',
+]
+SURNAMES = ['SHARMA', 'GUPTA', 'PATEL', 'KUMAR', 'REDDY', 'SINGH', 'MEHTA', 'DESAI',
+            'TANENBAUM', 'KNUTH', 'STALLINGS', 'GALVIN', 'NAGRATH', 'BALAGURUSAMY']
+
+
+def build_synthetic_database(db_path: str, books: int, users: int, ratings_per_user: int,
+                             seed: int = 42):
+    """
+    Write a synthetic catalog shaped like the Book Bank: titles held as
+    several accession copies, one genre per branch and the same description
+    template per genre, with department-skewed ratings like seed_data.py.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from models import Base, Book, User, Rating
+
+    rng = random.Random(seed)
+    genres = list(BRANCH_GENRE_MAPPING.values())
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    try:
+        book_rows, book_genres = [], []
+        title_count = max(1, books // 3)
+        titles = []
+        for _ in range(title_count):
+            title = ' '.join(rng.sample(SUBJECT_WORDS, rng.randint(2, 4)))
+            author = f"{rng.choice(SURNAMES)}, {chr(65 + rng.randrange(26))}."
+            titles.append((title, author, rng.choice(genres), round(rng.uniform(150, 1200), 2)))
+
+        for book_id in range(1, books + 1):
+            title, author, genre, price = titles[rng.randrange(title_count)]
+            book_rows.append({
+                'id': book_id,
+                'isbn': f"978-9-{book_id:09d}",
+                'accession_number': f"CB{book_id}",
+                'title': title,
+                'author': author,
+                'genre': genre,
+                'publisher': 'SYNTHETIC',
+                'price': price,
+                'description': f"A textbook from KJSIT Library Book Bank - {genre} department.",
+                'language': 'English'
+            })
+            book_genres.append(genre)
+
+        by_genre = {genre: [] for genre in genres}
+        for book_id, genre in enumerate(book_genres, start=1):
+            by_genre[genre].append(book_id)
+
+        user_rows, rating_rows = [], []
+        totals = {}
+        for user_id in range(1, users + 1):
+            department = rng.choice(genres)
+            user_rows.append({
+                'id': user_id,
+                'student_id': f"BENCH{user_id:06d}",
+                'name': f"Bench User {user_id}",
+                'email': f"bench{user_id}@kjsit.edu.in",
+                'department': department,
+                'year': rng.choice(['FE', 'SE', 'TE', 'BE']),
+                'password_hash': 'x'
+            })
+
+            own = min(int(ratings_per_user * 0.7), len(by_genre[department]))
+            rated = set(rng.sample(by_genre[department], own)) if own else set()
+            while len(rated) < min(ratings_per_user, books):
+                rated.add(rng.randint(1, books))
+
+            for book_id in rated:
+                if book_genres[book_id - 1] == department:
+                    rating = round(rng.uniform(3.5, 5.0), 1)
+                else:
+                    rating = round(rng.uniform(3.0, 4.5), 1)
+                rating_rows.append({'user_id': user_id, 'book_id': book_id, 'rating': rating})
+                total, count = totals.get(book_id, (0.0, 0))
+                totals[book_id] = (total + rating, count + 1)
+
+        for row in book_rows:
+            total, count = totals.get(row['id'], (0.0, 0))
+            row['average_rating'] = total / count if count else 0.0
+            row['total_ratings'] = count
+            row['rating_sum'] = total
+
+        session.bulk_insert_mappings(Book, book_rows)
+        session.bulk_insert_mappings(User, user_rows)
+        session.bulk_insert_mappings(Rating, rating_rows)
+        session.commit()
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def _rss_mb() -> Optional[float]:
+    """Current resident set size"""
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss / 2**20
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far (high-water mark)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def _measure_allocations(func) -> float:
+    """Peak Python allocations (MiB) during one traced call"""
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2**20
+
+
+def _query_arguments(engine, method: str, rng: random.Random, repeat: int) -> List[tuple]:
+    """Inputs for one query path, sampled from the loaded data"""
+    books = engine.books_df
+    book_ids = books['book_id'].tolist()
+    user_ids = sorted(engine.ratings_df['user_id'].unique().tolist()) if not engine.ratings_df.empty else [1]
+    genres = list(BRANCH_GENRE_MAPPING.values())
+
+    samples = []
+    for _ in range(repeat):
+        if method == 'get_popular_books':
+            samples.append((10,))
+        elif method == 'get_books_by_genre':
+            samples.append((rng.choice(genres), 10))
+        elif method in ('get_collaborative_filtering_recommendations', 'get_hybrid_recommendations'):
+            samples.append((rng.choice(user_ids), 10))
+        elif method == 'get_content_based_recommendations':
+            samples.append((rng.choice(book_ids), 10))
+        elif method == 'search_books':
+            samples.append((rng.choice(SUBJECT_WORDS).lower(), 10))
+        elif method == 'get_book_details':
+            samples.append((rng.choice(book_ids),))
+    return samples
+
+
+def run_scale(db_path: str, repeat: int, seed: int) -> Dict:
+    """
+    Measure one scale in this process (called in a child by run_benchmarks).
+    DATABASE_URL must already point at db_path.
+    """
+    from metrics import metrics
+    from models import create_tables
+    from recommendation_engine import BookRecommendationEngine
+
+    # Databases generated by older versions lack tables added since (e.g. rating_events)
+    create_tables()
+    result = {'build': {}, 'phases': {}, 'queries': {}}
+
+    # load_data logs and swallows its own failures (e.g. MemoryError); keep them to report
+    logged_errors = []
+    handler = logging.Handler(logging.ERROR)
+    handler.emit = lambda record: logged_errors.append(record.getMessage())
+    logging.getLogger().addHandler(handler)
+
+    started = time.perf_counter()
+    engine = BookRecommendationEngine()
+    if logged_errors or engine.books_df.empty:
+        raise RuntimeError(logged_errors[-1] if logged_errors else "engine loaded no books")
+    result['build'] = {
+        'wall_seconds': time.perf_counter() - started,
+        'rss_mb': _rss_mb(),
+        'peak_rss_mb': _peak_rss_mb(),
+        'precision': engine.dtype.name,
+        'books': len(engine.books_df),
+        'ratings': len(engine.ratings_df)
+    }
+    # Phase durations come from the engine's own build instrumentation
+    for phase, build in metrics.snapshot()['builds'].items():
+        result['phases'][phase] = {'wall_seconds': build['last_seconds']}
+    result['build']['allocated_mb'] = _measure_allocations(engine.load_data)
+
+    rng = random.Random(seed)
+    for method in QUERY_METHODS:
+        func = getattr(engine, method)
+        samples = _query_arguments(engine, method, rng, repeat)
+        timings = []
+        for args in samples:
+            started = time.perf_counter()
+            func(*args)
+            timings.append(time.perf_counter() - started)
+
+        result['queries'][method] = {
+            'repeat': len(timings),
+            'median_seconds': statistics.median(timings),
+            'min_seconds': min(timings),
+            'max_seconds': max(timings),
+            'allocated_mb': _measure_allocations(lambda: func(*samples[0])),
+            'peak_rss_mb': _peak_rss_mb()
+        }
+
+    memory = engine.memory_report()
+    memory.pop('books_df_columns', None)
+    result['model_memory_mb'] = {name: size / 2**20 for name, size in memory.items()}
+    result['rss_mb'] = _rss_mb()
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+
+# Ranked query paths compared between precisions
+PRECISION_METHODS = [
+    'get_collaborative_filtering_recommendations',
+    'get_content_based_recommendations',
+    'get_hybrid_recommendations',
+]
+
+# float32 fails the precision check when a path's mean top-k overlap with float64 drops below this
+PRECISION_MIN_OVERLAP = 0.95
+
+
+def check_precision(
+    db_path: str,
+    repeat: int,
+    seed: int,
+    k: int = 10,
+    samples: int = 50,
+    min_overlap: float = PRECISION_MIN_OVERLAP
+) -> Dict:
+    """
+    Build the model at float64 and float32 and compare them: top-k
+    agreement of every ranked query path over sampled users and books,
+    model memory, build time and query latency. A path passes when its
+    mean overlap is at least min_overlap; 'passed' is set when all do.
+    DATABASE_URL must already point at db_path.
+    """
+    from models import create_tables
+    from recommendation_engine import BookRecommendationEngine
+
+    create_tables()
+    engines = {}
+    result = {'k': k, 'samples': samples, 'min_overlap': min_overlap, 'precisions': {}, 'agreement': {}}
+    for precision in ('float64', 'float32'):
+        started = time.perf_counter()
+        engine = BookRecommendationEngine(precision=precision)
+        build_seconds = time.perf_counter() - started
+        if engine.books_df.empty:
+            raise RuntimeError("engine loaded no books")
+
+        memory = engine.memory_report()
+        memory.pop('books_df_columns', None)
+        latency = {}
+        rng = random.Random(seed)
+        for method in PRECISION_METHODS:
+            func = getattr(engine, method)
+            timings = []
+            for args in _query_arguments(engine, method, rng, repeat):
+                started = time.perf_counter()
+                func(*args)
+                timings.append(time.perf_counter() - started)
+            latency[method] = statistics.median(timings)
+
+        result['precisions'][precision] = {
+            'build_seconds': build_seconds,
+            'model_memory_mb': {name: size / 2**20 for name, size in memory.items()},
+            'median_seconds': latency
+        }
+        engines[precision] = engine
+
+    reference, candidate = engines['float64'], engines['float32']
+    rng = random.Random(seed)
+    for method in PRECISION_METHODS:
+        overlaps, exact = [], 0
+        for args in _query_arguments(reference, method, rng, samples):
+            args = args[:-1] + (k,)
+            expected = [book['book_id'] for book in getattr(reference, method)(*args)]
+            actual = [book['book_id'] for book in getattr(candidate, method)(*args)]
+            if expected == actual:
+                exact += 1
+            if expected or actual:
+                overlaps.append(len(set(expected) & set(actual)) / max(len(expected), len(actual)))
+            else:
+                overlaps.append(1.0)
+        result['agreement'][method] = {
+            'mean_overlap': statistics.mean(overlaps),
+            'min_overlap': min(overlaps),
+            'identical_rankings': exact / len(overlaps),
+            'passed': statistics.mean(overlaps) >= min_overlap
+        }
+    result['passed'] = all(agreement['passed'] for agreement in result['agreement'].values())
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _limit_memory(max_memory_gb: float):
+    """Cap the child's address space so an oversized scale fails with MemoryError"""
+    def apply():
+        if resource is not None and max_memory_gb:
+            limit = int(max_memory_gb * 2**30)
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    return apply
+
+
+def _run_child(args: List[str], env: Dict, timeout: Optional[float], max_memory_gb: float) -> Dict:
+    """Run this script in child mode; returns its JSON result or an 'error' entry"""
+    cmd = [sys.executable, os.path.abspath(__file__)] + args
+    try:
+        child = subprocess.run(cmd, env=env, capture_output=True, text=True, timeout=timeout,
+                               preexec_fn=_limit_memory(max_memory_gb) if os.name == 'posix' else None)
+    except subprocess.TimeoutExpired:
+        return {'error': f"timed out after {timeout}s"}
+
+    if child.returncode == 0:
+        return json.loads(child.stdout.strip().splitlines()[-1])
+
+    lines = child.stderr.strip().splitlines()
+    if child.returncode < 0:
+        # SIGKILL here is almost always the kernel's OOM killer
+        error = f"killed by signal {-child.returncode}" + (
+            " (out of memory?)" if child.returncode == -9 else "")
+    else:
+        error = lines[-1] if lines else f"exit code {child.returncode}"
+    return {'error': error, 'stderr_tail': lines[-10:]}
+
+
+def run_benchmarks(
+    scales: List[str],
+    repeat: int = 5,
+    seed: int = 42,
+    data_dir: str = DEFAULT_DATA_DIR,
+    output: Optional[str] = None,
+    max_memory_gb: float = 0,
+    timeout: Optional[float] = None,
+    rebuild: bool = False,
+    precision_check: bool = False,
+    min_overlap: float = PRECISION_MIN_OVERLAP
+) -> Dict:
+    """
+    Build (or reuse) the synthetic database for each scale and measure it
+    in a child process. precision_check also compares float32 against
+    float64 models (see check_precision for min_overlap). Returns the
+    results and writes them as JSON.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    commit = _git_commit()
+    results = {
+        'version': RESULTS_FORMAT_VERSION,
+        'commit': commit,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': seed,
+        'repeat': repeat,
+        'scales': {}
+    }
+
+    for name in scales:
+        books, users, ratings_per_user = SCALES[name]
+        db_path = os.path.abspath(os.path.join(data_dir, f"bench_{name}_{seed}.db"))
+
+        if rebuild or not os.path.exists(db_path):
+            print(f"🏗️  Building {name} dataset ({books} books, {users} users)...")
+            started = time.perf_counter()
+            build_synthetic_database(db_path, books, users, ratings_per_user, seed)
+            print(f"   built in {time.perf_counter() - started:.1f}s")
+
+        print(f"⏱️  Measuring {name}...")
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+        entry = {'books': books, 'users': users, 'ratings_per_user': ratings_per_user}
+        entry.update(_run_child(
+            ['--run-scale', db_path, '--repeat', str(repeat), '--seed', str(seed)],
+            env, timeout, max_memory_gb
+        ))
+
+        if precision_check and 'error' not in entry:
+            print(f"🎯 Checking float32 against float64 on {name}...")
+            entry['precision_check'] = _run_child(
+                ['--check-precision', db_path, '--repeat', str(repeat), '--seed', str(seed),
+                 '--min-overlap', str(min_overlap)],
+                env, timeout, max_memory_gb
+            )
+
+        results['scales'][name] = entry
+        _print_scale(name, entry)
+        if 'precision_check' in entry:
+            _print_precision_check(entry['precision_check'])
+
+    output = output or os.path.join(DEFAULT_RESULTS_DIR, f"{commit or 'nocommit'}-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {output}")
+    return results
+
+
+def _fmt_mb(value) -> str:
+    return f"{value:.0f} MB" if value is not None else "n/a"
+
+
+def _print_scale(name: str, entry: Dict):
+    if 'error' in entry:
+        print(f"   ❌ {name}: {entry['error']}")
+        return
+
+    build = entry['build']
+    print(f"   • build: {build['wall_seconds'] * 1000:.0f} ms, peak RSS {_fmt_mb(build['peak_rss_mb'])}, "
+          f"allocated {build['allocated_mb']:.1f} MB")
+    for phase, values in entry['phases'].items():
+        print(f"       - {phase}: {values['wall_seconds'] * 1000:.1f} ms")
+    memory = entry.get('model_memory_mb', {})
+    if memory:
+        print("   • model memory: " + ", ".join(f"{name} {size:.1f} MB" for name, size in memory.items()))
+    for method, values in entry['queries'].items():
+        print(f"   • {method}: median {values['median_seconds'] * 1000:.2f} ms "
+              f"(max {values['max_seconds'] * 1000:.2f} ms), allocated {values['allocated_mb']:.1f} MB")
+
+
+def _print_precision_check(check: Dict):
+    if 'error' in check:
+        print(f"   ❌ precision check: {check['error']}")
+        return
+
+    wide, narrow = check['precisions']['float64'], check['precisions']['float32']
+    print(f"   • model memory: {wide['model_memory_mb']['total']:.1f} MB (float64) -> "
+          f"{narrow['model_memory_mb']['total']:.1f} MB (float32); build "
+          f"{wide['build_seconds'] * 1000:.0f} -> {narrow['build_seconds'] * 1000:.0f} ms")
+    for method, agreement in check['agreement'].items():
+        print(f"   {'•' if agreement['passed'] else '❌'} {method}: top-{check['k']} overlap {agreement['mean_overlap']:.3f} "
+              f"(min {agreement['min_overlap']:.2f}, identical {agreement['identical_rankings']:.0%}), "
+              f"median {wide['median_seconds'][method] * 1000:.2f} -> "
+              f"{narrow['median_seconds'][method] * 1000:.2f} ms")
+
+
+def compare_results(old_path: str, new_path: str, threshold: float = 0.10) -> int:
+    """
+    Print per-metric ratios between two result files. Returns the number of
+    regressions (new slower or larger than old by more than threshold).
+    """
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print(f"📊 {old.get('commit')} -> {new.get('commit')}")
+    regressions = 0
+
+    def report(label, before, after):
+        nonlocal regressions
+        if not before or after is None:
+            return
+        ratio = after / before
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = ' ⚠️'
+            regressions += 1
+        elif ratio < 1 - threshold:
+            flag = ' ✅'
+        print(f"   {label:<58} {before:>10.4f} -> {after:>10.4f}  x{ratio:.2f}{flag}")
+
+    for name in new['scales']:
+        if name not in old['scales']:
+            continue
+        before, after = old['scales'][name], new['scales'][name]
+        print(f"• {name}")
+        if 'error' in before or 'error' in after:
+            print(f"   old: {before.get('error', 'ok')}  new: {after.get('error', 'ok')}")
+            continue
+
+        report('build wall (s)', before['build']['wall_seconds'], after['build']['wall_seconds'])
+        report('build peak RSS (MB)', before['build']['peak_rss_mb'], after['build']['peak_rss_mb'])
+        report('build allocated (MB)', before['build']['allocated_mb'], after['build']['allocated_mb'])
+        for phase, values in after['phases'].items():
+            if phase in before['phases']:
+                report(f"{phase} (s)", before['phases'][phase]['wall_seconds'], values['wall_seconds'])
+        for method, values in after['queries'].items():
+            if method in before['queries']:
+                report(f"{method} median (s)", before['queries'][method]['median_seconds'],
+                       values['median_seconds'])
+        for name, size in after.get('model_memory_mb', {}).items():
+            if name in before.get('model_memory_mb', {}):
+                report(f"{name} memory (MB)", before['model_memory_mb'][name], size)
+        report('final peak RSS (MB)', before['peak_rss_mb'], after['peak_rss_mb'])
+
+    print(f"{'⚠️' if regressions else '✅'} {regressions} regression(s) above {threshold:.0%}")
+    return regressions
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description='Benchmark the recommendation engine at several scales')
+    parser.add_argument('--scales', nargs='+', default=['1k', '10k'], choices=list(SCALES),
+                        help='Scales to run (default: 1k 10k)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed calls per query path')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for data and query sampling')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Where synthetic databases are kept')
+    parser.add_argument('--rebuild', action='store_true', help='Regenerate the synthetic databases')
+    parser.add_argument('--output', '-o', help='Results file (default: benchmark_results/<commit>-<time>.json)')
+    parser.add_argument('--max-memory-gb', type=float, default=0,
+                        help='Address-space cap per scale; larger scales fail with MemoryError')
+    parser.add_argument('--timeout', type=float, default=None, help='Seconds allowed per scale')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Diff two result files')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Regression threshold for --compare')
+    parser.add_argument('--precision-check', action='store_true',
+                        help='Also compare float32 models against float64 (top-k agreement, memory, latency)')
+    parser.add_argument('--min-overlap', type=float, default=PRECISION_MIN_OVERLAP,
+                        help='Mean top-k overlap float32 must reach in --precision-check (default: 0.95)')
+    parser.add_argument('--run-scale', metavar='DB', help=argparse.SUPPRESS)
+    parser.add_argument('--check-precision', metavar='DB', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.run_scale:
+        # Child mode: measure one database and print the result as the last line
+        print(json.dumps(run_scale(args.run_scale, args.repeat, args.seed)))
+        return
+
+    if args.check_precision:
+        print(json.dumps(check_precision(
+            args.check_precision, args.repeat, args.seed, min_overlap=args.min_overlap
+        )))
+        return
+
+    if args.compare:
+        regressions = compare_results(args.compare[0], args.compare[1], args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    results = run_benchmarks(args.scales, args.repeat, args.seed, args.data_dir, args.output,
+                             args.max_memory_gb, args.timeout, args.rebuild, args.precision_check,
+                             args.min_overlap)
+
+    if args.precision_check:
+        failed = [name for name, entry in results['scales'].items()
+                  if 'precision_check' in entry and not entry['precision_check'].get('passed')]
+        if failed:
+            print(f"❌ float32 precision check failed for: {', '.join(failed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
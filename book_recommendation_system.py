@@ -1,6 +1,8 @@
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from data_loader import read_library_workbook
+from title_resolver import TitleResolver
 
 def load_and_clean_data(file_path):
     """
@@ -14,8 +16,8 @@ def load_and_clean_data(file_path):
     """
     print("📚 Loading and cleaning dataset...")
     
-    # Read the Excel file, using header=1 as first row is metadata
-    df = pd.read_excel(file_path, sheet_name='Sheet1', header=1)
+    # Read the Excel file (via the columnar cache), using header=1 as first row is metadata
+    df = read_library_workbook(file_path, sheet_name='Sheet1', header=1)
     
     # Rename columns for clarity
     df.columns = ['Accession_Number', 'Title', 'Author', 'Publisher', 'Price', 'Branch']
@@ -79,7 +81,7 @@ def build_model(df):
     print("✅ Model built successfully")
     return tfidf, cosine_sim
 
-def recommend_books(title, df, cosine_sim, tfidf, top_n=5, branch=None, author=None):
+def recommend_books(title, df, cosine_sim, tfidf, top_n=5, branch=None, author=None, resolver=None):
     """
     Recommend books based on content similarity.
     
@@ -91,26 +93,26 @@ def recommend_books(title, df, cosine_sim, tfidf, top_n=5, branch=None, author=N
         top_n (int): Number of recommendations to return
         branch (str, optional): Filter by branch/subject area
         author (str, optional): Filter by author
+        resolver (TitleResolver, optional): Title index built once per model;
+            built on the fly when omitted
         
     Returns:
         pd.DataFrame: Recommended books
     """
     print(f"🔍 Searching for books similar to '{title}'...")
     
-    # Check if the book exists in the dataset
-    if title not in df['Title'].values:
-        # Try partial matching
-        partial_matches = df[df['Title'].str.contains(title, case=False, na=False)]
-        if partial_matches.empty:
-            print(f"❌ Book '{title}' not found in the dataset")
-            return pd.DataFrame()
-        else:
-            # Use the first match if multiple found
-            title = partial_matches.iloc[0]['Title']
-            print(f"📎 Found similar book: '{title}'")
-    
-    # Get the index of the book
-    idx = df[df['Title'] == title].index[0]
+    # Resolve the title through the index (exact, then prefix, then fuzzy matches)
+    if resolver is None:
+        resolver = TitleResolver(df)
+    matching_positions = resolver.resolve_positions(title, limit=1)
+    if not matching_positions:
+        print(f"❌ Book '{title}' not found in the dataset")
+        return pd.DataFrame()
+    
+    # Row position of the best match (cosine_sim rows follow frame order)
+    idx = matching_positions[0]
+    if df.iloc[idx]['Title'] != title:
+        print(f"📎 Found similar book: '{df.iloc[idx]['Title']}'")
     
     # Get similarity scores for all books
     sim_scores = list(enumerate(cosine_sim[idx]))
@@ -180,6 +182,9 @@ def main():
     # Build recommendation model
     tfidf, cosine_sim = build_model(df)
     
+    # Build the title index once for all lookups against this model
+    resolver = TitleResolver(df)
+    
     print("\n" + "="*50)
     print("BOOK RECOMMENDATION SYSTEM")
     print("="*50)
@@ -187,7 +192,7 @@ def main():
     # Example 1: Basic recommendations
     print("\n📝 Example 1: Basic recommendations for 'ENGINEERING PHYSICS'")
     print("-" * 50)
-    rec1 = recommend_books("ENGINEERING PHYSICS", df, cosine_sim, tfidf)
+    rec1 = recommend_books("ENGINEERING PHYSICS", df, cosine_sim, tfidf, resolver=resolver)
     if not rec1.empty:
         print(rec1.to_string(index=False))
     
@@ -195,7 +200,7 @@ def main():
     print("\n📝 Example 2: Recommendations for 'ENGINEERING PHYSICS' in 'BASIC SCIENCE AND HUMANITIES'")
     print("-" * 50)
     rec2 = recommend_books("ENGINEERING PHYSICS", df, cosine_sim, tfidf, 
-                          branch="BASIC SCIENCE AND HUMANITIES")
+                          branch="BASIC SCIENCE AND HUMANITIES", resolver=resolver)
     if not rec2.empty:
         print(rec2.to_string(index=False))
     
@@ -203,7 +208,7 @@ def main():
     print("\n📝 Example 3: Recommendations for 'ENGINEERING PHYSICS' by author 'GUPTA'")
     print("-" * 50)
     rec3 = recommend_books("ENGINEERING PHYSICS", df, cosine_sim, tfidf, 
-                          author="GUPTA")
+                          author="GUPTA", resolver=resolver)
     if not rec3.empty:
         print(rec3.to_string(index=False))
 
@@ -1,6 +1,8 @@
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from data_loader import read_library_workbook
+from title_resolver import TitleResolver
 
 def load_and_clean_data(file_path):
     """
@@ -14,8 +16,8 @@ def load_and_clean_data(file_path):
     """
     print("📚 Loading and cleaning dataset...")
     
-    # Read the Excel file, using header=1 as first row is metadata
-    df = pd.read_excel(file_path, sheet_name='Sheet1', header=1)
+    # Read the Excel file (via the columnar cache), using header=1 as first row is metadata
+    df = read_library_workbook(file_path, sheet_name='Sheet1', header=1)
     
     # Rename columns for clarity
     df.columns = ['Accession_Number', 'Title', 'Author', 'Publisher', 'Price', 'Branch']
@@ -80,7 +82,7 @@ def build_model(df):
     print("✅ Model built successfully")
     return tfidf, cosine_sim
 
-def recommend_books(title, df, cosine_sim, tfidf, top_n=5, branch=None, author=None):
+def recommend_books(title, df, cosine_sim, tfidf, top_n=5, branch=None, author=None, resolver=None):
     """
     Recommend books based on content similarity.
     
@@ -92,32 +94,37 @@ def recommend_books(title, df, cosine_sim, tfidf, top_n=5, branch=None, author=N
         top_n (int): Number of recommendations to return
         branch (str, optional): Filter by branch/subject area
         author (str, optional): Filter by author
+        resolver (TitleResolver, optional): Title index built once per model;
+            built on the fly when omitted
         
     Returns:
         pd.DataFrame: Recommended books
     """
     print(f"🔍 Searching for books similar to '{title}'...")
     
-    # Check if the book exists in the dataset
-    matching_books = df[df['Title'].str.contains(title, case=False, na=False)]
-    if matching_books.empty:
+    # Resolve the title through the index (exact, then prefix, then fuzzy matches)
+    if resolver is None:
+        resolver = TitleResolver(df)
+    matching_positions = resolver.resolve_positions(title)
+    if not matching_positions:
         print(f"❌ No books found matching '{title}' in the dataset")
         return pd.DataFrame()
-    elif len(matching_books) == 1:
+    elif len(matching_positions) == 1:
         # Exact match or single match
-        book_row = matching_books.iloc[0]
+        book_row = df.iloc[matching_positions[0]]
         print(f"📎 Found book: '{book_row['Title']}' (Accession: {book_row['Accession_Number']})")
     else:
-        # Multiple matches - show options
-        print(f"📎 Found {len(matching_books)} books matching '{title}':")
-        for i, (idx, book) in enumerate(matching_books.head(5).iterrows()):
+        # Multiple matches - show the best ranked options
+        print(f"📎 Found {len(matching_positions)} books matching '{title}':")
+        for i, pos in enumerate(matching_positions[:5]):
+            book = df.iloc[pos]
             print(f"   {i+1}. '{book['Title']}' by {book['Author']} (Accession: {book['Accession_Number']})")
-        # Use the first match for recommendations
-        book_row = matching_books.iloc[0]
-        print(f"Using first match: '{book_row['Title']}' (Accession: {book_row['Accession_Number']})")
+        # Use the best match for recommendations
+        book_row = df.iloc[matching_positions[0]]
+        print(f"Using best match: '{book_row['Title']}' (Accession: {book_row['Accession_Number']})")
     
-    # Get the index of the book
-    idx = matching_books.index[0]
+    # Get the row position of the book
+    idx = matching_positions[0]
     
     # Get similarity scores for all books
     sim_scores = list(enumerate(cosine_sim[idx]))
@@ -187,6 +194,9 @@ def main():
     # Build recommendation model
     tfidf, cosine_sim = build_model(df)
     
+    # Build the title index once for all lookups against this model
+    resolver = TitleResolver(df)
+    
     print("\n" + "="*50)
     print("BOOK RECOMMENDATION SYSTEM (All Editions Preserved)")
     print("="*50)
@@ -194,7 +204,7 @@ def main():
     # Example 1: Basic recommendations
     print("\n📝 Example 1: Basic recommendations for 'ENGINEERING PHYSICS'")
     print("-" * 50)
-    rec1 = recommend_books("ENGINEERING PHYSICS", df, cosine_sim, tfidf)
+    rec1 = recommend_books("ENGINEERING PHYSICS", df, cosine_sim, tfidf, resolver=resolver)
     if not rec1.empty:
         print(rec1.to_string(index=False))
     
@@ -202,7 +212,7 @@ def main():
     print("\n📝 Example 2: Recommendations for 'ENGINEERING PHYSICS' in 'BASIC SCIENCE AND HUMANITIES'")
     print("-" * 50)
     rec2 = recommend_books("ENGINEERING PHYSICS", df, cosine_sim, tfidf, 
-                          branch="BASIC SCIENCE AND HUMANITIES")
+                          branch="BASIC SCIENCE AND HUMANITIES", resolver=resolver)
     if not rec2.empty:
         print(rec2.to_string(index=False))
     
@@ -210,7 +220,7 @@ def main():
     print("\n📝 Example 3: Recommendations for 'ENGINEERING PHYSICS' by author 'GAUR'")
     print("-" * 50)
     rec3 = recommend_books("ENGINEERING PHYSICS", df, cosine_sim, tfidf, 
-                          author="GAUR")
+                          author="GAUR", resolver=resolver)
     if not rec3.empty:
         print(rec3.to_string(index=False))
 
@@ -17,6 +17,17 @@ class Config:
     # Application
     PORT = int(os.getenv('PORT', 8501))
 
+    # JSON API (see api_server.py)
+    API_PORT = int(os.getenv('API_PORT', 5000))
+    API_WORKERS = int(os.getenv('API_WORKERS', 0))  # 0 = one per CPU core
+    API_MAX_LIMIT = int(os.getenv('API_MAX_LIMIT', 100))
+
+    # Student IDs that see the diagnostics page (comma separated)
+    ADMIN_STUDENT_IDS = {
+        student_id.strip() for student_id in os.getenv('ADMIN_STUDENT_IDS', '').split(',')
+        if student_id.strip()
+    }
+
     # API Keys
     GOOGLE_BOOKS_API_KEY = os.getenv('GOOGLE_BOOKS_API_KEY', '')
 
@@ -24,10 +35,77 @@ class Config:
     MIN_RATINGS_THRESHOLD = int(os.getenv('MIN_RATINGS_THRESHOLD', 5))
     SIMILARITY_THRESHOLD = float(os.getenv('SIMILARITY_THRESHOLD', 0.3))
     MAX_RECOMMENDATIONS = int(os.getenv('MAX_RECOMMENDATIONS', 10))
+    # Float width of model matrices and scores: 'float32' (default) or 'float64'
+    MODEL_PRECISION = os.getenv('MODEL_PRECISION', 'float32')
+
+    # Ingestion
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 0))  # 0 = one per CPU core
+    INGEST_CHUNK_SIZE = int(os.getenv('INGEST_CHUNK_SIZE', 500))
+
+    # Content-based similarity: 'tfidf' refits a TfidfVectorizer on every load;
+    # 'hashing' keeps a HashingContentIndex that only vectorises new or changed
+    # books and refreshes IDF weights in the background (see content_index.py)
+    CONTENT_INDEX = os.getenv('CONTENT_INDEX', 'tfidf').lower()
+    CONTENT_HASH_FEATURES = int(os.getenv('CONTENT_HASH_FEATURES', 2 ** 18))
+    CONTENT_REWEIGHT_INTERVAL = float(os.getenv('CONTENT_REWEIGHT_INTERVAL', 300))  # seconds, 0 = off
+
+    # Hybrid recommendations: 'two_stage' scores only the candidates proposed by
+    # the generators in pipeline.py; 'full' scores the whole catalog
+    RECOMMENDATION_PIPELINE = os.getenv('RECOMMENDATION_PIPELINE', 'two_stage').lower()
+
+    # Directory for the model shared by every server process on this host
+    # (see model_store.py); empty = each process builds its own
+    SHARED_MODEL_DIR = os.getenv('SHARED_MODEL_DIR', '')
+    # Rating events a process replays on top of the shared model (in private
+    # copies of the arrays) before it publishes a new version for all to share
+    SHARED_MODEL_REPUBLISH_EVENTS = int(os.getenv('SHARED_MODEL_REPUBLISH_EVENTS', 50))
+
+    # Offline recommendation precompute (see precompute.py)
+    PRECOMPUTE_LIMIT = int(os.getenv('PRECOMPUTE_LIMIT', 10))
+    PRECOMPUTE_WORKERS = int(os.getenv('PRECOMPUTE_WORKERS', 0))  # 0 = one per CPU core
+    PRECOMPUTE_BLOCK_SIZE = int(os.getenv('PRECOMPUTE_BLOCK_SIZE', 64))
+
+    # Columnar cache of parsed workbooks (see data_loader.py)
+    WORKBOOK_CACHE = os.getenv('WORKBOOK_CACHE', 'True').lower() == 'true'
 
     # File paths
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     DATABASE_PATH = os.path.join(BASE_DIR, 'books_recommendation.db')
 
+# Library branch -> book genre, as used when loading the Book Bank workbooks
+BRANCH_GENRE_MAPPING = {
+    'BASIC SCIENCE AND HUMANITIES': 'Engineering Physics',
+    'COMPUTER': 'Computer Science',
+    'INFORMATION TECHNOLOGY': 'Information Technology',
+    'ELECTRONICS': 'Electronics',
+    'ELECTRONICS AND TELECOMMUNICATIONS': 'Electronics and Telecommunications'
+}
+
+# Other names a genre is looked up by: library branch names and the
+# department codes used in student IDs (e.g. 21CS001)
+GENRE_ALIASES = {
+    **BRANCH_GENRE_MAPPING,
+    'CS': 'Computer Science',
+    'COMP': 'Computer Science',
+    'IT': 'Information Technology',
+    'EL': 'Electronics',
+    'ELEX': 'Electronics',
+    'ET': 'Electronics and Telecommunications',
+    'EXTC': 'Electronics and Telecommunications',
+    'BS': 'Engineering Physics',
+    'BSH': 'Engineering Physics',
+    # Department names offered on the registration form ('Computer' is a branch name above)
+    'ELECTRONICS & TELECOMMUNICATION': 'Electronics and Telecommunications',
+    'AIDS': 'Computer Science'
+}
+
+# Registration form year -> year as stored for existing students
+YEAR_ALIASES = {
+    'FY': 'FE',
+    'SY': 'SE',
+    'TY': 'TE',
+    'LY': 'BE'
+}
+
 # Create config instance
 config = Config()
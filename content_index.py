@@ -0,0 +1,357 @@
+"""
+KJSIT Book Recommendation System - Hashing Content Index
+Content-based similarity without a fitted vocabulary. Book text is mapped
+to a fixed feature space with the hashing trick, so a new or changed book
+is vectorised on its own (O(document length)) and appended, and existing
+vectors never move when the catalog grows. Document frequencies are kept
+up to date on every change; the IDF weights derived from them are
+refreshed by reweight(), normally from a background thread, because
+re-weighting touches every stored vector.
+"""
+
+import zlib
+import bisect
+import logging
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+from metrics import metrics, timed
+
+# Appended rows are kept as small blocks; past this many they are merged
+MAX_BLOCKS = 32
+# Rows of removed or changed books are dropped at the next reweight once they exceed this fraction
+COMPACT_FRACTION = 0.1
+
+
+def _fingerprint(text: str) -> int:
+    # Stable across processes (the index is pickled into the shared model store)
+    return zlib.crc32(text.encode('utf-8'))
+
+
+def top_k(scores: np.ndarray, limit: int) -> np.ndarray:
+    """Positions of the limit highest finite scores, best first"""
+    limit = min(limit, int(np.isfinite(scores).sum()))
+    if limit <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, limit - 1)[:limit]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+class HashingContentIndex:
+    """Append-only, L2-normalised TF-IDF rows over hashed unigrams and bigrams"""
+
+    def __init__(self, n_features: int = 2 ** 18, dtype=np.float32):
+        self.n_features = int(n_features)
+        self.dtype = np.dtype(dtype)
+        self.vectorizer = HashingVectorizer(
+            n_features=self.n_features,
+            stop_words='english',
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            norm=None,
+            dtype=self.dtype
+        )
+        # Row storage: raw term counts and weighted rows in aligned blocks
+        self._raw_blocks: List[sparse.csr_matrix] = []
+        self._weighted_blocks: List[sparse.csr_matrix] = []
+        self._block_starts: List[int] = []
+        self._size = 0
+        # Row position -> book id, live book id -> row position, per-row live flag
+        self._book_ids: List[int] = []
+        self._positions: Dict[int, int] = {}
+        self._alive = bytearray()
+        self._fingerprints: Dict[int, int] = {}
+        # Number of live documents containing each feature, and the IDF in use
+        self.doc_freq = np.zeros(self.n_features, dtype=np.int64)
+        self.idf = np.ones(self.n_features, dtype=self.dtype)
+        self.pending_changes = 0
+        # Bumped whenever reweight swaps in new IDF weights (existing rows change)
+        self.weights_version = 0
+        self._init_runtime()
+
+    def _init_runtime(self):
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ('_lock', '_stop', '_thread'):
+            state.pop(name)
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault('weights_version', 0)
+        self.__dict__.update(state)
+        self._init_runtime()
+
+    @classmethod
+    def build(
+        cls,
+        book_ids: Sequence[int],
+        texts: Sequence[str],
+        n_features: int = 2 ** 18,
+        dtype=np.float32
+    ) -> 'HashingContentIndex':
+        """Index a whole catalog and weight it with its own IDF"""
+        index = cls(n_features, dtype)
+        index.add_many(book_ids, texts)
+        index.reweight()
+        return index
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, book_id) -> bool:
+        return book_id in self._positions
+
+    def _weigh(self, raw: sparse.csr_matrix, idf: np.ndarray) -> sparse.csr_matrix:
+        return normalize(raw @ sparse.diags(idf), copy=False).astype(self.dtype, copy=False).tocsr()
+
+    def _rows(self, blocks: List[sparse.csr_matrix], starts: List[int], start: int, stop: int) -> sparse.csr_matrix:
+        """Rows [start, stop) across a block list"""
+        parts = []
+        for block_index in range(max(bisect.bisect_right(starts, start) - 1, 0), len(blocks)):
+            block_start = starts[block_index]
+            if block_start >= stop:
+                break
+            block = blocks[block_index]
+            parts.append(block[max(start - block_start, 0):min(stop - block_start, block.shape[0])])
+        if not parts:
+            return sparse.csr_matrix((0, self.n_features), dtype=self.dtype)
+        return sparse.vstack(parts, format='csr')
+
+    def _retire(self, position: int):
+        # Caller holds the lock
+        raw = self._rows(self._raw_blocks, self._block_starts, position, position + 1)
+        self.doc_freq[raw.indices] -= 1
+        self._alive[position] = 0
+        book_id = self._book_ids[position]
+        self._positions.pop(book_id, None)
+        self._fingerprints.pop(book_id, None)
+
+    @timed('content_index.add')
+    def add_many(self, book_ids: Sequence[int], texts: Sequence[str]):
+        """Add or replace books; each is vectorised independently of the rest of the catalog"""
+        book_ids = [int(book_id) for book_id in book_ids]
+        if not book_ids:
+            return
+
+        raw = self.vectorizer.transform(texts).tocsr()
+        raw.sum_duplicates()
+
+        with self._lock:
+            for book_id in book_ids:
+                if book_id in self._positions:
+                    self._retire(self._positions[book_id])
+
+            # Each row's indices are unique, so this counts documents per feature
+            np.add.at(self.doc_freq, raw.indices, 1)
+
+            self._raw_blocks.append(raw)
+            self._weighted_blocks.append(self._weigh(raw, self.idf))
+            self._block_starts.append(self._size)
+            for offset, (book_id, text) in enumerate(zip(book_ids, texts)):
+                self._positions[book_id] = self._size + offset
+                self._fingerprints[book_id] = _fingerprint(text)
+            self._book_ids.extend(book_ids)
+            self._alive.extend(b'\x01' * len(book_ids))
+            self._size += len(book_ids)
+            self.pending_changes += len(book_ids)
+
+            if len(self._raw_blocks) > MAX_BLOCKS:
+                self._merge_tail()
+
+    def add(self, book_id: int, text: str):
+        """Add or replace one book"""
+        self.add_many([book_id], [text])
+
+    def remove(self, book_id: int):
+        """Drop a book from results and document frequencies"""
+        with self._lock:
+            position = self._positions.get(book_id)
+            if position is not None:
+                self._retire(position)
+                self.pending_changes += 1
+
+    def sync(self, book_ids: Sequence[int], texts: Sequence[str]) -> Tuple[int, int]:
+        """
+        Bring the index in line with a full catalog listing: only new or
+        changed books are vectorised, missing books are removed.
+        Returns (added or changed, removed).
+        """
+        changed_ids, changed_texts = [], []
+        for book_id, text in zip(book_ids, texts):
+            book_id = int(book_id)
+            if self._fingerprints.get(book_id) != _fingerprint(text):
+                changed_ids.append(book_id)
+                changed_texts.append(text)
+
+        listed = set(int(book_id) for book_id in book_ids)
+        removed = [book_id for book_id in list(self._positions) if book_id not in listed]
+
+        self.add_many(changed_ids, changed_texts)
+        for book_id in removed:
+            self.remove(book_id)
+        return len(changed_ids), len(removed)
+
+    def _merge_tail(self):
+        # Caller holds the lock; the first (large) block stays as is
+        first = 1 if len(self._raw_blocks) > 1 else 0
+        self._raw_blocks[first:] = [sparse.vstack(self._raw_blocks[first:], format='csr')]
+        self._weighted_blocks[first:] = [sparse.vstack(self._weighted_blocks[first:], format='csr')]
+        self._block_starts[first:] = [self._block_starts[first]]
+
+    def _compact(self):
+        # Caller holds the lock: drop retired rows and renumber positions
+        keep = np.flatnonzero(np.frombuffer(bytes(self._alive), dtype=np.uint8))
+        self._raw_blocks = [sparse.vstack(self._raw_blocks, format='csr')[keep]]
+        self._weighted_blocks = [sparse.vstack(self._weighted_blocks, format='csr')[keep]]
+        self._block_starts = [0]
+        self._book_ids = [self._book_ids[position] for position in keep]
+        self._positions = {book_id: position for position, book_id in enumerate(self._book_ids)}
+        self._alive = bytearray(b'\x01' * len(keep))
+        self._size = len(keep)
+
+    def _current_idf(self, doc_freq: np.ndarray) -> np.ndarray:
+        # Smoothed IDF, as TfidfVectorizer(smooth_idf=True)
+        n_docs = max(len(self._positions), 0)
+        return (np.log((1 + n_docs) / (1 + np.maximum(doc_freq, 0))) + 1).astype(self.dtype)
+
+    @timed('content_index.reweight', build=True)
+    def reweight(self):
+        """
+        Recompute IDF from the current document frequencies and re-weight
+        every row. The heavy part runs outside the lock, so queries and
+        appends continue meanwhile; rows appended during it are weighted
+        with the new IDF when it is swapped in.
+        """
+        with self._lock:
+            size = self._size
+            raw_blocks = list(self._raw_blocks)
+            idf = self._current_idf(self.doc_freq)
+            self.pending_changes = 0
+
+        if raw_blocks:
+            raw = sparse.vstack(raw_blocks, format='csr')
+            weighted = self._weigh(raw, idf)
+        else:
+            raw = weighted = sparse.csr_matrix((0, self.n_features), dtype=self.dtype)
+
+        with self._lock:
+            tail = self._rows(self._raw_blocks, self._block_starts, size, self._size)
+            self._raw_blocks, self._weighted_blocks, self._block_starts = [raw], [weighted], [0]
+            if tail.shape[0]:
+                self._raw_blocks.append(tail)
+                self._weighted_blocks.append(self._weigh(tail, idf))
+                self._block_starts.append(size)
+            self.idf = idf
+            self.weights_version += 1
+
+            dead = self._size - len(self._positions)
+            if dead and dead > COMPACT_FRACTION * self._size:
+                self._compact()
+
+    def vector(self, book_id: int):
+        """A book's weighted, normalised row (1 x n_features), or None"""
+        with self._lock:
+            position = self._positions.get(book_id)
+            if position is None:
+                return None
+            return self._rows(self._weighted_blocks, self._block_starts, position, position + 1)
+
+    def vectors(self, book_ids: Sequence[int]) -> sparse.csr_matrix:
+        """Weighted rows of several books in the given order (zero rows for unknown books)"""
+        with self._lock:
+            positions = np.array([self._positions.get(int(book_id), -1) for book_id in book_ids], dtype=np.int64)
+            blocks = list(self._weighted_blocks)
+            starts = np.array(self._block_starts, dtype=np.int64)
+
+        known = positions >= 0
+        block_of = np.searchsorted(starts, positions, side='right') - 1
+        parts, order = [], []
+        for block_index in np.unique(block_of[known]):
+            selected = np.flatnonzero(known & (block_of == block_index))
+            parts.append(blocks[block_index][positions[selected] - starts[block_index]])
+            order.append(selected)
+        unknown = np.flatnonzero(~known)
+        if unknown.size or not parts:
+            parts.append(sparse.csr_matrix((len(unknown), self.n_features), dtype=self.dtype))
+            order.append(unknown)
+
+        stacked = sparse.vstack(parts, format='csr')
+        return stacked[np.argsort(np.concatenate(order), kind='stable')]
+
+    def score(self, query) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Dot product of a query row (1 x n_features) with every stored row.
+        Returns (scores, book id per row); retired rows score -inf.
+        """
+        with self._lock:
+            blocks = list(self._weighted_blocks)
+            book_ids = np.asarray(self._book_ids[:self._size], dtype=np.int64)
+            alive = np.frombuffer(bytes(self._alive), dtype=np.uint8)
+
+        query = sparse.csr_matrix(query).T
+        scores = np.concatenate([(block @ query).toarray().ravel() for block in blocks]) if blocks else np.zeros(0)
+        scores[alive[:len(scores)] == 0] = -np.inf
+        return scores, book_ids
+
+    def matrix(self) -> Tuple[sparse.csr_matrix, np.ndarray]:
+        """All stored rows stacked, with the book id per row (-1 for retired rows)"""
+        with self._lock:
+            blocks = list(self._weighted_blocks)
+            book_ids = np.asarray(self._book_ids[:self._size], dtype=np.int64)
+            book_ids[np.frombuffer(bytes(self._alive), dtype=np.uint8) == 0] = -1
+        if not blocks:
+            return sparse.csr_matrix((0, self.n_features), dtype=self.dtype), book_ids
+        return sparse.vstack(blocks, format='csr'), book_ids
+
+    def similar(self, book_id: int, limit: int = 10) -> List[Tuple[int, float]]:
+        """Most similar live books as (book_id, cosine similarity), excluding the book itself"""
+        query = self.vector(book_id)
+        if query is None:
+            return []
+
+        scores, book_ids = self.score(query)
+        scores[book_ids == book_id] = -np.inf
+        return [(int(book_ids[i]), float(scores[i])) for i in top_k(scores, limit)]
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the stored rows and statistics"""
+        total = self.doc_freq.nbytes + self.idf.nbytes
+        for block in self._raw_blocks + self._weighted_blocks:
+            total += block.data.nbytes + block.indices.nbytes + block.indptr.nbytes
+        return int(total)
+
+    def start_background_reweight(self, interval: float):
+        """Re-weight every interval seconds (when something changed) on a daemon thread"""
+        if self._thread is not None or interval <= 0:
+            return
+        self._thread = threading.Thread(
+            target=self._reweight_loop, args=(interval,), name='content-index-reweight', daemon=True
+        )
+        self._thread.start()
+
+    def stop_background_reweight(self):
+        """Stop the background thread, if running"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stop.clear()
+
+    def _reweight_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            if not self.pending_changes:
+                continue
+            try:
+                self.reweight()
+            except Exception as e:
+                logging.error(f"Error re-weighting content index: {e}")
+                metrics.record_error('content_index.reweight')
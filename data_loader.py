@@ -0,0 +1,140 @@
+"""
+KJSIT Book Recommendation System - Workbook Loader
+Shared loader for the Library Book Bank workbook. The first parse of a sheet
+is written to a columnar (Feather) cache next to the workbook; later runs
+memory-map the cache instead of re-parsing the xlsx.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, Optional, Union
+
+import pandas as pd
+
+from config import Config
+from metrics import metrics
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional; without it every run parses the xlsx
+    feather = None
+
+CACHE_FORMAT_VERSION = 1
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """Content hash of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_paths(file_path: str, sheet_name: Union[str, int]) -> Dict[str, str]:
+    """Cache and metadata paths for one sheet of a workbook"""
+    stem, _ = os.path.splitext(file_path)
+    base = f"{stem}.{sheet_name}.cache"
+    return {'data': f"{base}.feather", 'meta': f"{base}.json"}
+
+
+def _read_meta(meta_path: str) -> Optional[Dict]:
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path: str, meta: Dict):
+    tmp_path = f"{meta_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def _is_fresh(meta: Optional[Dict], stat, file_path: str, sheet_name, header, meta_path) -> bool:
+    """
+    Check a cache entry against the workbook. Size and mtime are compared
+    first; when only the mtime moved (copied or touched file) the content
+    hash decides, and a match re-stamps the entry so the next check is cheap.
+    """
+    if not meta or meta.get('version') != CACHE_FORMAT_VERSION:
+        return False
+    if meta.get('sheet_name') != sheet_name or meta.get('header') != header:
+        return False
+    if meta.get('size') != stat.st_size:
+        return False
+    if meta.get('mtime_ns') == stat.st_mtime_ns:
+        return True
+
+    if meta.get('sha256') != file_sha256(file_path):
+        return False
+
+    meta['mtime_ns'] = stat.st_mtime_ns
+    try:
+        _write_meta(meta_path, meta)
+    except OSError:
+        pass
+    return True
+
+
+def read_library_workbook(
+    file_path: str,
+    sheet_name: Union[str, int] = 'Sheet1',
+    header: int = 1,
+    use_cache: Optional[bool] = None
+) -> pd.DataFrame:
+    """
+    Read one sheet of a library workbook, going through the columnar cache.
+
+    Args:
+        file_path (str): Path to the Excel file
+        sheet_name (str|int): Sheet to read
+        header (int): Header row (the Book Bank sheets have a metadata row first)
+        use_cache (bool, optional): Override Config.WORKBOOK_CACHE
+
+    Returns:
+        pd.DataFrame: The raw sheet, exactly as pd.read_excel returns it
+    """
+    if use_cache is None:
+        use_cache = Config.WORKBOOK_CACHE
+
+    if not use_cache or feather is None:
+        return pd.read_excel(file_path, sheet_name=sheet_name, header=header)
+
+    # Raises FileNotFoundError for a missing workbook, like pd.read_excel
+    stat = os.stat(file_path)
+    paths = cache_paths(file_path, sheet_name)
+    meta = _read_meta(paths['meta'])
+
+    if os.path.exists(paths['data']) and _is_fresh(meta, stat, file_path, sheet_name, header, paths['meta']):
+        try:
+            df = feather.read_table(paths['data'], memory_map=True).to_pandas()
+            metrics.record_cache('workbook', hit=True)
+            return df
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable workbook cache {paths['data']}: {e}")
+
+    metrics.record_cache('workbook', hit=False)
+    df = pd.read_excel(file_path, sheet_name=sheet_name, header=header)
+
+    try:
+        tmp_path = f"{paths['data']}.tmp"
+        # Uncompressed so the cache can be memory-mapped without decoding
+        feather.write_feather(df, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, paths['data'])
+        _write_meta(paths['meta'], {
+            'version': CACHE_FORMAT_VERSION,
+            'sheet_name': sheet_name,
+            'header': header,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_sha256(file_path)
+        })
+    except Exception as e:
+        logging.warning(f"Could not write workbook cache for {file_path}: {e}")
+
+    return df
@@ -0,0 +1,123 @@
+"""
+KJSIT Book Recommendation System - Data Versions
+Lets every process tell, in microseconds, whether any process has written
+to the database since it last looked. Writers bump a per-scope counter in
+the data_versions table in the same transaction as their change; readers
+poll the counters at the start of each request and use them as cache keys,
+replaying the rating event log (or rebuilding, after a catalog load) only
+when something changed.
+
+On SQLite the poll is `PRAGMA data_version` on a dedicated connection,
+which only changes when another connection commits, so the counters table
+is read only after a write. Other databases read the (one row per scope)
+table on every poll.
+"""
+
+import os
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from metrics import timed
+from models import DataVersion, get_engine
+
+# Books loaded or replaced in bulk (ingest, seeding): models are rebuilt
+CATALOG = 'catalog'
+# Rating writes, each also in the rating event log: models catch up incrementally
+RATINGS = 'ratings'
+# Registrations: only cached reads change
+USERS = 'users'
+
+
+def bump_data_version(session, scope: str):
+    """Advance one scope's counter, creating it if needed (commit with the write)"""
+    updated = session.query(DataVersion).filter_by(scope=scope).update(
+        {DataVersion.version: DataVersion.version + 1},
+        synchronize_session=False
+    )
+    if not updated:
+        session.add(DataVersion(scope=scope, version=1))
+        session.flush()
+
+
+def version_token(versions: Dict[str, int]) -> Tuple:
+    """Hashable form of the counters, for cache keys"""
+    return tuple(sorted(versions.items()))
+
+
+class DataVersionMonitor:
+    """Polls the data version counters over its own connection (one monitor per process)"""
+
+    def __init__(self, db_engine=None):
+        self._db_engine = db_engine or get_engine()
+        self._sqlite = self._db_engine.dialect.name == 'sqlite'
+        self._connection = None
+        self._pid = None
+        self._sqlite_version = None
+        self._versions: Dict[str, int] = {}
+        self._synced: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+
+    def _cursor(self):
+        # A forked child must not share the parent's connection
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = self._db_engine.raw_connection()
+            self._pid = os.getpid()
+            self._sqlite_version = None
+        return self._connection.cursor()
+
+    def poll(self) -> Dict[str, int]:
+        """Current counter per scope; unchanged counters mean nothing was written"""
+        with self._lock:
+            try:
+                cursor = self._cursor()
+                try:
+                    if self._sqlite:
+                        cursor.execute('PRAGMA data_version')
+                        sqlite_version = cursor.fetchone()[0]
+                        if sqlite_version == self._sqlite_version:
+                            return self._versions
+                    cursor.execute('SELECT scope, version FROM data_versions')
+                    versions = {scope: version for scope, version in cursor.fetchall()}
+                finally:
+                    cursor.close()
+                if self._sqlite:
+                    self._sqlite_version = sqlite_version
+                else:
+                    # End the read so the next poll sees new commits (REPEATABLE READ)
+                    self._connection.rollback()
+            except Exception as e:
+                # Table not created yet, or the connection dropped: retry on a new one next time
+                logging.warning(f"Could not read data versions: {e}")
+                self._close()
+                return self._versions
+
+            self._versions = versions
+            return versions
+
+    def _close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+        self._connection = None
+
+    @timed('data_version.sync')
+    def sync(self, engine) -> Dict[str, int]:
+        """
+        Poll and bring engine up to date with writes since the last sync: a
+        catalog change rebuilds it, rating changes are replayed from the
+        rating event log. Returns the counters.
+        """
+        versions = self.poll()
+        with self._lock:
+            synced, self._synced = self._synced, versions
+        if synced is None:
+            # First sync: the engine was built from the database moments ago
+            engine.catch_up()
+        elif versions.get(CATALOG) != synced.get(CATALOG):
+            engine.refresh_data()
+        elif versions.get(RATINGS) != synced.get(RATINGS):
+            engine.catch_up()
+        return versions
@@ -1,7 +1,8 @@
 import pandas as pd
+from data_loader import read_library_workbook
 
 # Load the dataset to examine its structure
-df = pd.read_excel('KJSIT Library Book Bank data.xlsx', sheet_name='Sheet1', header=1)
+df = read_library_workbook('KJSIT Library Book Bank data.xlsx', sheet_name='Sheet1', header=1)
 
 print("=== DATASET OVERVIEW ===")
 print(f"Total rows: {len(df)}")
@@ -1,6 +1,14 @@
+import os
+import sys
+import csv
+import json
+import argparse
+import multiprocessing
+import numpy as np
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from data_loader import read_library_workbook
+from title_resolver import TitleResolver
 
 def load_and_clean_data(file_path):
     """
@@ -15,8 +23,8 @@ def load_and_clean_data(file_path):
     """
     print("📚 Loading and cleaning dataset...")
     
-    # Read the Excel file, using header=1 as first row is metadata
-    df = pd.read_excel(file_path, sheet_name='Sheet1', header=1)
+    # Read the Excel file (via the columnar cache), using header=1 as first row is metadata
+    df = read_library_workbook(file_path, sheet_name='Sheet1', header=1)
     
     # Rename columns for clarity
     df.columns = ['Accession_Number', 'Title', 'Author', 'Publisher', 'Price', 'Branch']
@@ -24,8 +32,8 @@ def load_and_clean_data(file_path):
     # Fill missing values with empty strings
     df = df.fillna('')
     
-    # Drop rows with empty titles
-    df = df[df['Title'] != '']
+    # Drop rows with empty titles; keep a positional index so row i matches tfidf_matrix[i]
+    df = df[df['Title'] != ''].reset_index(drop=True)
     
     print(f"✅ Dataset loaded with {len(df)} books (all editions preserved)")
     print(f"   Unique titles: {df['Title'].nunique()}")
@@ -56,29 +64,62 @@ def create_book_profiles(df):
 
 def build_model(df):
     """
-    Build TF-IDF vectorizer and compute cosine similarity matrix.
+    Build the TF-IDF model. Only the sparse, L2-normalised TF-IDF matrix is
+    kept; similarities are computed per query row instead of as a dense
+    N×N cosine similarity matrix.
     
     Args:
         df (pd.DataFrame): Dataset with Profile column
         
     Returns:
-        tuple: (tfidf_vectorizer, cosine_sim_matrix)
+        tuple: (tfidf_vectorizer, tfidf_matrix)
     """
     print("🧠 Building recommendation model...")
     
-    # Initialize TF-IDF Vectorizer with English stopwords
+    # Initialize TF-IDF Vectorizer with English stopwords (rows are L2-normalised)
     tfidf = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
     
     # Fit and transform the Profile column
-    tfidf_matrix = tfidf.fit_transform(df['Profile'])
-    
-    # Compute cosine similarity matrix
-    cosine_sim = cosine_similarity(tfidf_matrix, tfidf_matrix)
+    tfidf_matrix = tfidf.fit_transform(df['Profile']).tocsr()
     
     print("✅ Model built successfully")
-    return tfidf, cosine_sim
+    return tfidf, tfidf_matrix
+
+def _top_k_positions(scores, k):
+    """
+    Positions of the k highest scores, best first, with ties broken by position.
+    argpartition finds the k-th best score in linear time; only the rows at or
+    above it are sorted.
+    """
+    kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+    above = np.flatnonzero(scores > kth)
+    tied = np.flatnonzero(scores == kth)[:k - len(above)]
+    top = np.concatenate([above, tied])
+    return top[np.lexsort((top, -scores[top]))]
 
-def recommend_books(title, df, cosine_sim, tfidf, top_n=5, branch=None, author=None):
+def top_similar_indices(tfidf_matrix, idx, k):
+    """
+    Find the k rows most similar to row idx, best first, excluding idx itself.
+    
+    Args:
+        tfidf_matrix (scipy.sparse.csr_matrix): L2-normalised TF-IDF matrix
+        idx (int): Row position of the query book
+        k (int): Number of rows to return
+        
+    Returns:
+        np.ndarray: Row positions ordered by descending similarity
+    """
+    # Rows are unit length, so one sparse dot product gives the cosine similarities
+    scores = (tfidf_matrix @ tfidf_matrix[idx].T).toarray().ravel()
+    scores[idx] = -np.inf
+    
+    k = min(k, len(scores) - 1)
+    if k <= 0:
+        return np.array([], dtype=np.intp)
+    
+    return _top_k_positions(scores, k)
+
+def recommend_books(title, df, tfidf_matrix, tfidf, top_n=5, branch=None, author=None, resolver=None):
     """
     Recommend books based on content similarity.
     Preserves all editions by treating each accession number as unique.
@@ -86,47 +127,45 @@ def recommend_books(title, df, cosine_sim, tfidf, top_n=5, branch=None, author=N
     Args:
         title (str): Title of the book to find recommendations for
         df (pd.DataFrame): Dataset with book information
-        cosine_sim (np.ndarray): Cosine similarity matrix
+        tfidf_matrix (scipy.sparse.csr_matrix): L2-normalised TF-IDF matrix
         tfidf: TF-IDF vectorizer
         top_n (int): Number of recommendations to return
         branch (str, optional): Filter by branch/subject area
         author (str, optional): Filter by author
+        resolver (TitleResolver, optional): Title index built once per model;
+            built on the fly when omitted
         
     Returns:
         pd.DataFrame: Recommended books
     """
     print(f"🔍 Searching for books similar to '{title}'...")
     
-    # Check if the book exists in the dataset
-    matching_books = df[df['Title'].str.contains(title, case=False, na=False)]
-    if matching_books.empty:
+    # Resolve the title through the index (exact, then prefix, then fuzzy matches)
+    if resolver is None:
+        resolver = TitleResolver(df)
+    matching_positions = resolver.resolve_positions(title)
+    if not matching_positions:
         print(f"❌ No books found matching '{title}' in the dataset")
         return pd.DataFrame()
-    elif len(matching_books) == 1:
+    elif len(matching_positions) == 1:
         # Exact match or single match
-        book_row = matching_books.iloc[0]
+        book_row = df.iloc[matching_positions[0]]
         print(f"📎 Found book: '{book_row['Title']}' (Accession: {book_row['Accession_Number']})")
     else:
-        # Multiple matches - show options
-        print(f"📎 Found {len(matching_books)} books matching '{title}':")
-        for i, (idx, book) in enumerate(matching_books.head(5).iterrows()):
+        # Multiple matches - show the best ranked options
+        print(f"📎 Found {len(matching_positions)} books matching '{title}':")
+        for i, pos in enumerate(matching_positions[:5]):
+            book = df.iloc[pos]
             print(f"   {i+1}. '{book['Title']}' (Accession: {book['Accession_Number']}) by {book['Author']}")
-        # Use the first match for recommendations
-        book_row = matching_books.iloc[0]
-        print(f"Using first match: '{book_row['Title']}' (Accession: {book_row['Accession_Number']})")
-    
-    # Get the index of the book
-    idx = matching_books.index[0]
-    
-    # Get similarity scores for all books
-    sim_scores = list(enumerate(cosine_sim[idx]))
+        # Use the best match for recommendations
+        book_row = df.iloc[matching_positions[0]]
+        print(f"Using best match: '{book_row['Title']}' (Accession: {book_row['Accession_Number']})")
     
-    # Sort books based on similarity scores
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
+    # Get the row position of the book
+    idx = matching_positions[0]
     
     # Get indices of top similar books (excluding the book itself)
-    sim_scores = sim_scores[1:top_n*3]  # Get more candidates for filtering
-    book_indices = [i[0] for i in sim_scores]
+    book_indices = top_similar_indices(tfidf_matrix, idx, top_n*3)  # Get more candidates for filtering
     
     # Get the recommended books
     recommendations = df.iloc[book_indices].copy()
@@ -177,28 +216,205 @@ def get_book_details(accession_number, df):
     book = df[df['Accession_Number'] == accession_number]
     return book.iloc[0] if not book.empty else None
 
-def main():
+# Columns written for each recommendation in batch mode
+BATCH_OUTPUT_COLUMNS = [
+    'query', 'query_accession', 'query_title', 'rank', 'similarity',
+    'Accession_Number', 'Title', 'Author', 'Publisher', 'Branch'
+]
+
+# Read-only model shared by the batch worker processes (set before the pool starts)
+_BATCH_MODEL = None
+
+def build_filter_mask(df, branch=None, author=None):
     """
-    Main function to demonstrate the book recommendation system.
+    Build a boolean mask over the whole catalog for the batch filters.
+    Author matching falls back to the first name part that matches anything,
+    like the partial matching in recommend_books.
+    
+    Args:
+        df (pd.DataFrame): Dataset with book information
+        branch (str, optional): Filter by branch/subject area
+        author (str, optional): Filter by author
+        
+    Returns:
+        np.ndarray or None: Allowed rows, or None when no filter is given
     """
-    # Load and clean data
-    file_path = "KJSIT Library Book Bank data.xlsx"
+    if not branch and not author:
+        return None
     
-    try:
-        df = load_and_clean_data(file_path)
-    except FileNotFoundError:
-        print(f"❌ File '{file_path}' not found. Please check the file path.")
-        return
-    except Exception as e:
-        print(f"❌ Error loading data: {e}")
-        return
+    mask = np.ones(len(df), dtype=bool)
+    if branch:
+        mask &= df['Branch'].str.contains(branch, case=False, na=False, regex=False).to_numpy()
     
-    # Create book profiles
-    df = create_book_profiles(df)
+    if author:
+        author_mask = df['Author'].str.contains(author, case=False, na=False, regex=False).to_numpy()
+        if not author_mask.any():
+            for part in author.split():
+                author_mask = df['Author'].str.contains(part, case=False, na=False, regex=False).to_numpy()
+                if author_mask.any():
+                    break
+        mask &= author_mask
     
-    # Build recommendation model
-    tfidf, cosine_sim = build_model(df)
+    return mask
+
+def top_similar_block(tfidf_matrix, rows, k, mask=None):
+    """
+    Vectorised top-k for a block of query rows: one sparse matrix product
+    scores the whole block against the catalog.
     
+    Args:
+        tfidf_matrix (scipy.sparse.csr_matrix): L2-normalised TF-IDF matrix
+        rows (np.ndarray): Row positions of the query books
+        k (int): Number of neighbours per query
+        mask (np.ndarray, optional): Rows allowed in the results
+        
+    Returns:
+        tuple: (indices, scores), both shaped (len(rows), k); filtered-out slots score -inf
+    """
+    scores = (tfidf_matrix[rows] @ tfidf_matrix.T).toarray()
+    scores[np.arange(len(rows)), rows] = -np.inf
+    if mask is not None:
+        scores[:, ~mask] = -np.inf
+    
+    k = min(k, scores.shape[1])
+    top = np.array([_top_k_positions(row_scores, k) for row_scores in scores], dtype=np.intp).reshape(len(rows), k)
+    return top, np.take_along_axis(scores, top, axis=1)
+
+def _init_batch_worker(model):
+    """Pool initializer: keep the shared model in a module global"""
+    global _BATCH_MODEL
+    _BATCH_MODEL = model
+
+def _recommend_block(block):
+    """
+    Compute recommendations for one block of (query_number, query) pairs.
+    Runs in a worker process against the shared model.
+    """
+    model = _BATCH_MODEL
+    df, resolver = model['df'], model['resolver']
+    
+    resolved, unresolved = [], []
+    for number, query in block:
+        # Accession numbers resolve directly, anything else as a title
+        pos = resolver.position_of(query)
+        if pos is None:
+            positions = resolver.resolve_positions(query, limit=1)
+            pos = positions[0] if positions else None
+        if pos is None:
+            unresolved.append((number, query))
+        else:
+            resolved.append((number, query, pos))
+    
+    results = []
+    if resolved:
+        rows = np.array([pos for _, _, pos in resolved])
+        indices, scores = top_similar_block(model['tfidf_matrix'], rows, model['top_n'], model['mask'])
+        
+        for (number, query, pos), row_indices, row_scores in zip(resolved, indices, scores):
+            query_book = df.iloc[pos]
+            records = []
+            for rank, (idx, score) in enumerate(zip(row_indices, row_scores), start=1):
+                # Stop at filtered-out rows (-inf) and books with nothing in common
+                if not score > 0:
+                    break
+                book = df.iloc[idx]
+                records.append({
+                    'query': query,
+                    'query_accession': query_book['Accession_Number'],
+                    'query_title': query_book['Title'],
+                    'rank': rank,
+                    'similarity': round(float(score), 4),
+                    'Accession_Number': book['Accession_Number'],
+                    'Title': book['Title'],
+                    'Author': book['Author'],
+                    'Publisher': book['Publisher'],
+                    'Branch': book['Branch']
+                })
+            results.append((number, records))
+    
+    return results, unresolved
+
+def read_batch_queries(path):
+    """Read one title or accession number per line, skipping blanks and # comments"""
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def run_batch(queries, df, tfidf_matrix, resolver, output_path, top_n=5, branch=None,
+              author=None, workers=None, block_size=256):
+    """
+    Compute recommendations for many queries and stream them to CSV or JSONL.
+    
+    Args:
+        queries (list): Titles or accession numbers
+        df (pd.DataFrame): Dataset with book information
+        tfidf_matrix (scipy.sparse.csr_matrix): L2-normalised TF-IDF matrix
+        resolver (TitleResolver): Title index for the model
+        output_path (str): Destination file; .jsonl/.json writes JSON lines, anything else CSV
+        top_n (int): Recommendations per query
+        branch (str, optional): Filter by branch/subject area
+        author (str, optional): Filter by author
+        workers (int, optional): Worker processes (default: one per CPU core)
+        block_size (int): Queries scored per sparse matrix product
+        
+    Returns:
+        tuple: (recommendations_written, unresolved_queries)
+    """
+    model = {
+        'df': df[BATCH_OUTPUT_COLUMNS[5:]],
+        'tfidf_matrix': tfidf_matrix,
+        'resolver': resolver,
+        'top_n': top_n,
+        'mask': build_filter_mask(df, branch, author)
+    }
+    numbered = list(enumerate(queries))
+    blocks = [numbered[start:start + block_size] for start in range(0, len(numbered), block_size)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(blocks)))
+    
+    print(f"🧮 Scoring {len(queries)} queries in {len(blocks)} block(s) with {workers} worker(s)...")
+    
+    as_jsonl = os.path.splitext(output_path)[1].lower() in ('.jsonl', '.json')
+    written, unresolved = 0, []
+    
+    with open(output_path, 'w', newline='', encoding='utf-8') as out:
+        writer = None if as_jsonl else csv.DictWriter(out, fieldnames=BATCH_OUTPUT_COLUMNS)
+        if writer:
+            writer.writeheader()
+        
+        def write_block(block_result):
+            nonlocal written
+            results, missing = block_result
+            unresolved.extend(missing)
+            for _, records in results:
+                for record in records:
+                    if writer:
+                        writer.writerow(record)
+                    else:
+                        out.write(json.dumps(record, default=str) + '\n')
+                    written += 1
+            out.flush()
+        
+        if workers == 1:
+            _init_batch_worker(model)
+            for block in blocks:
+                write_block(_recommend_block(block))
+        else:
+            # With fork the workers inherit the model copy-on-write; otherwise it is sent once per worker
+            with multiprocessing.Pool(workers, initializer=_init_batch_worker, initargs=(model,)) as pool:
+                for block_result in pool.imap_unordered(_recommend_block, blocks):
+                    write_block(block_result)
+    
+    unresolved.sort()
+    print(f"✅ Wrote {written} recommendations for {len(queries) - len(unresolved)} queries to {output_path}")
+    if unresolved:
+        print(f"⚠️ {len(unresolved)} queries matched no book:")
+        for _, query in unresolved[:20]:
+            print(f"   • {query}")
+    return written, [query for _, query in unresolved]
+
+def run_examples(df, tfidf_matrix, tfidf, resolver):
+    """
+    Run the built-in demonstration queries.
+    """
     print("\n" + "="*60)
     print("BOOK RECOMMENDATION SYSTEM (All Editions Preserved)")
     print("="*60)
@@ -206,23 +422,23 @@ def main():
     # Example 1: Basic recommendations
     print("\n📝 Example 1: Basic recommendations for 'ENGINEERING PHYSICS'")
     print("-" * 60)
-    rec1 = recommend_books("ENGINEERING PHYSICS", df, cosine_sim, tfidf)
+    rec1 = recommend_books("ENGINEERING PHYSICS", df, tfidf_matrix, tfidf, resolver=resolver)
     if not rec1.empty:
         print(rec1.to_string(index=False))
     
     # Example 2: Recommendations filtered by branch
     print("\n📝 Example 2: Recommendations for 'ENGINEERING PHYSICS' in 'BASIC SCIENCE AND HUMANITIES'")
     print("-" * 60)
-    rec2 = recommend_books("ENGINEERING PHYSICS", df, cosine_sim, tfidf, 
-                          branch="BASIC SCIENCE AND HUMANITIES")
+    rec2 = recommend_books("ENGINEERING PHYSICS", df, tfidf_matrix, tfidf, 
+                          branch="BASIC SCIENCE AND HUMANITIES", resolver=resolver)
     if not rec2.empty:
         print(rec2.to_string(index=False))
     
     # Example 3: Recommendations filtered by author
     print("\n📝 Example 3: Recommendations for 'ENGINEERING PHYSICS' by author 'GAUR'")
     print("-" * 60)
-    rec3 = recommend_books("ENGINEERING PHYSICS", df, cosine_sim, tfidf, 
-                          author="GAUR")
+    rec3 = recommend_books("ENGINEERING PHYSICS", df, tfidf_matrix, tfidf, 
+                          author="GAUR", resolver=resolver)
     if not rec3.empty:
         print(rec3.to_string(index=False))
     
@@ -233,6 +449,64 @@ def main():
     ep_books = df[df['Title'].str.contains('ENGINEERING PHYSICS', case=False, na=False)]
     print(ep_books[['Title', 'Accession_Number', 'Publisher']].head(10).to_string(index=False))
 
+
+def main():
+    """
+    Main function: run the demonstration, or a batch job when --batch/--all is given.
+    """
+    parser = argparse.ArgumentParser(description='KJSIT Library content-based book recommender')
+    parser.add_argument('--file', default="KJSIT Library Book Bank data.xlsx",
+                        help='Library Book Bank workbook')
+    parser.add_argument('--batch', metavar='QUERIES',
+                        help='File with one title or accession number per line')
+    parser.add_argument('--all', action='store_true',
+                        help='Recommend for every book in the catalog')
+    parser.add_argument('--output', '-o', default='recommendations.csv',
+                        help='Batch output file (.csv, or .jsonl for JSON lines)')
+    parser.add_argument('--top-n', '-n', type=int, default=5,
+                        help='Recommendations per query')
+    parser.add_argument('--branch', help='Only recommend books from this branch')
+    parser.add_argument('--author', help='Only recommend books by this author')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                        help='Worker processes for batch mode (default: one per CPU core)')
+    parser.add_argument('--block-size', type=int, default=256,
+                        help='Queries scored per vectorised block')
+    args = parser.parse_args()
+    
+    # Load and clean data
+    file_path = args.file
+    
+    try:
+        df = load_and_clean_data(file_path)
+    except FileNotFoundError:
+        print(f"❌ File '{file_path}' not found. Please check the file path.")
+        return
+    except Exception as e:
+        print(f"❌ Error loading data: {e}")
+        return
+    
+    # Create book profiles
+    df = create_book_profiles(df)
+    
+    # Build recommendation model
+    tfidf, tfidf_matrix = build_model(df)
+    
+    # Build the title index once for all lookups against this model
+    resolver = TitleResolver(df)
+    
+    if args.batch or args.all:
+        try:
+            queries = read_batch_queries(args.batch) if args.batch else resolver.accessions
+        except OSError as e:
+            print(f"❌ Could not read queries: {e}")
+            sys.exit(1)
+        run_batch(queries, df, tfidf_matrix, resolver, args.output, top_n=args.top_n,
+                  branch=args.branch, author=args.author, workers=args.workers,
+                  block_size=args.block_size)
+        return
+    
+    run_examples(df, tfidf_matrix, tfidf, resolver)
+
 # OPTIONAL FUTURE EXTENSIONS (commented out):
 """
 1. Streamlit UI Implementation:
@@ -259,7 +533,7 @@ author = st.text_input("Filter by Author")
 top_n = st.slider("Number of recommendations", 1, 20, 5)
 
 if st.button("Get Recommendations"):
-    rec = recommend_books(title, df, cosine_sim, tfidf, top_n, 
+    rec = recommend_books(title, df, tfidf_matrix, tfidf, top_n, 
                          branch if branch != "All" else None, author if author else None)
     st.dataframe(rec)
 """
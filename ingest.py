@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+KJSIT Book Recommendation System - Workbook Ingestion
+Parses a directory or glob of library workbooks (every sheet of every file)
+across a process pool and loads them into the books table through a single
+writer that inserts in chunked transactions.
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from config import Config, BRANCH_GENRE_MAPPING
+from models import Book, get_session, create_tables
+from analytics import record_books_added
+from data_version import CATALOG, bump_data_version
+
+# Columns every Book Bank sheet must provide (row 0 of each sheet is metadata)
+REQUIRED_COLUMNS = ['Accession number', 'Title', 'Author', 'Publisher', 'Price', 'Branch']
+WORKBOOK_EXTENSIONS = ('.xlsx', '.xls')
+
+
+def generate_isbn(accession_number):
+    """Generate a pseudo-ISBN from accession number"""
+    # Create a deterministic ISBN-like string from accession number
+    base = accession_number.replace('CB', '').zfill(6)
+    return f"978-0-{base[:3]}-{base[3:6]}-{base[-1]}"
+
+
+def book_record_from_row(row) -> Dict:
+    """Map one cleaned workbook row to a Book column mapping"""
+    accession_number = str(row['Accession number'])
+    genre = BRANCH_GENRE_MAPPING.get(str(row['Branch']), 'General')
+
+    return {
+        'isbn': generate_isbn(accession_number),
+        'accession_number': accession_number,
+        'title': str(row['Title']),
+        'author': str(row['Author']),
+        'genre': genre,
+        'publisher': str(row['Publisher']) if pd.notna(row['Publisher']) else None,
+        'price': float(row['Price']) if pd.notna(row['Price']) else None,
+        'description': f"A textbook from KJSIT Library Book Bank - {genre} department.",
+        'publication_year': None,  # Not available in data
+        'pages': None,  # Not available in data
+        'language': 'English',
+        'cover_url': None
+    }
+
+
+def clean_sheet(df: pd.DataFrame) -> pd.DataFrame:
+    """Drop rows without title or author and strip the text columns"""
+    df = df.dropna(subset=['Title', 'Author']).copy()
+    for column in ['Title', 'Author', 'Publisher', 'Branch']:
+        df[column] = df[column].astype('string').str.strip()
+    return df
+
+
+def discover_workbooks(sources: Iterable[str]) -> List[str]:
+    """Expand directories and glob patterns into a sorted list of workbook paths"""
+    paths = set()
+    for source in sources:
+        if os.path.isdir(source):
+            candidates = [os.path.join(source, name) for name in os.listdir(source)]
+        else:
+            candidates = glob.glob(source)
+
+        for path in candidates:
+            name = os.path.basename(path)
+            # Skip Office lock files such as "~$KJSIT Library Book Bank data.xlsx"
+            if name.startswith('~$') or not name.lower().endswith(WORKBOOK_EXTENSIONS):
+                continue
+            if os.path.isfile(path):
+                paths.add(os.path.abspath(path))
+
+    return sorted(paths)
+
+
+def parse_workbook(path: str) -> Dict:
+    """
+    Parse every sheet of a workbook into Book column mappings.
+    Runs inside a pool worker, so it never raises: failures are reported
+    in the returned dict and only affect this file (or sheet).
+    """
+    started = time.perf_counter()
+    result = {'path': path, 'records': [], 'sheets': {}, 'error': None}
+
+    try:
+        sheets = pd.read_excel(path, sheet_name=None, header=1)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['parse_seconds'] = time.perf_counter() - started
+        return result
+
+    for sheet_name, df in sheets.items():
+        if df.empty:
+            continue
+
+        missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+        if missing:
+            result['sheets'][sheet_name] = f"skipped (missing columns: {', '.join(missing)})"
+            continue
+
+        try:
+            df = clean_sheet(df)
+            records = [book_record_from_row(row) for row in df.to_dict('records')]
+        except Exception as e:
+            result['sheets'][sheet_name] = f"failed ({type(e).__name__}: {e})"
+            continue
+
+        result['records'].extend(records)
+        result['sheets'][sheet_name] = f"{len(records)} rows"
+
+    result['parse_seconds'] = time.perf_counter() - started
+    return result
+
+
+def write_books(session, records: List[Dict], chunk_size: int, seen_accessions: set) -> int:
+    """
+    Insert book mappings in chunks inside the session's current transaction.
+    Accession numbers already in the database (or earlier in this run) are
+    skipped, so re-ingesting a workbook is a no-op. Returns rows inserted.
+    """
+    fresh = []
+    for record in records:
+        accession_number = record['accession_number']
+        if accession_number in seen_accessions:
+            continue
+        seen_accessions.add(accession_number)
+        fresh.append(record)
+
+    for start in range(0, len(fresh), chunk_size):
+        session.bulk_insert_mappings(Book, fresh[start:start + chunk_size])
+        session.flush()
+
+    # Keep the analytics aggregates in step, in the same transaction
+    record_books_added(session, fresh)
+    if fresh:
+        # Running processes rebuild their models for the new books
+        bump_data_version(session, CATALOG)
+    return len(fresh)
+
+
+def _failed_parse(path: str, error: Exception) -> Dict:
+    """parse_workbook-shaped result for a file whose worker raised or died"""
+    return {
+        'path': path, 'records': [], 'sheets': {}, 'parse_seconds': 0.0,
+        'error': f"{type(error).__name__}: {error}"
+    }
+
+
+def _parse_in_own_process(path: str) -> Dict:
+    """Parse one workbook in a dedicated worker, so a crash only fails this file"""
+    try:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            return pool.submit(parse_workbook, path).result()
+    except Exception as e:
+        return _failed_parse(path, e)
+
+
+def ingest_workbooks(
+    sources: Iterable[str],
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None
+) -> List[Dict]:
+    """
+    Parse workbooks in parallel and load them through a single writer.
+    Each file is committed in its own transaction, so a bad file is rolled
+    back without affecting the others; a file that fails to parse, or
+    crashes its worker, is reported and skipped. Returns one report dict
+    per file.
+    """
+    paths = discover_workbooks(sources)
+    if not paths:
+        print("❌ No workbooks found to ingest")
+        return []
+
+    workers = workers or Config.INGEST_WORKERS or os.cpu_count() or 1
+    workers = min(workers, len(paths))
+    chunk_size = chunk_size or Config.INGEST_CHUNK_SIZE
+
+    print(f"📚 Ingesting {len(paths)} workbook(s) with {workers} worker process(es)...")
+
+    create_tables()
+    session = get_session()
+    reports = []
+
+    try:
+        seen_accessions = {
+            accession for (accession,) in session.query(Book.accession_number)
+            if accession
+        }
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(parse_workbook, path): path for path in paths}
+
+            # The pool only parses; all writes happen here, in completion order
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    # A worker died and took the pool with it: retry each unfinished file alone
+                    result = _parse_in_own_process(path)
+                except Exception as e:
+                    result = _failed_parse(path, e)
+                report = {
+                    'path': result['path'],
+                    'sheets': result['sheets'],
+                    'parsed_rows': len(result['records']),
+                    'inserted_rows': 0,
+                    'parse_seconds': result['parse_seconds'],
+                    'write_seconds': 0.0,
+                    'error': result['error']
+                }
+
+                if result['error'] is None and result['records']:
+                    started = time.perf_counter()
+                    snapshot = set(seen_accessions)
+                    try:
+                        report['inserted_rows'] = write_books(
+                            session, result['records'], chunk_size, seen_accessions
+                        )
+                        session.commit()
+                    except Exception as e:
+                        session.rollback()
+                        seen_accessions = snapshot
+                        report['inserted_rows'] = 0
+                        report['error'] = f"{type(e).__name__}: {e}"
+                    report['write_seconds'] = time.perf_counter() - started
+
+                reports.append(report)
+                _print_report(report)
+    finally:
+        session.close()
+
+    total = sum(report['inserted_rows'] for report in reports)
+    failed = sum(1 for report in reports if report['error'])
+    print(f"✅ Ingested {total} books from {len(reports) - failed}/{len(reports)} workbook(s)")
+    return reports
+
+
+def _print_report(report: Dict):
+    """Print the per-file summary line"""
+    name = os.path.basename(report['path'])
+    if report['error']:
+        print(f"   ❌ {name}: {report['error']}")
+        return
+
+    print(f"   • {name}: {report['inserted_rows']}/{report['parsed_rows']} rows inserted "
+          f"(parse {report['parse_seconds']:.2f}s, write {report['write_seconds']:.2f}s)")
+    for sheet_name, status in report['sheets'].items():
+        print(f"       - {sheet_name}: {status}")
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description='Ingest KJSIT Library Book Bank workbooks')
+    parser.add_argument('sources', nargs='+',
+                        help='Workbook files, directories or glob patterns')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                        help='Parser processes (default: one per CPU core)')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='Rows per insert statement')
+
+    args = parser.parse_args()
+    reports = ingest_workbooks(args.sources, args.workers, args.chunk_size)
+
+    if not reports or any(report['error'] for report in reports):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
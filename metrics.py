@@ -0,0 +1,187 @@
+"""
+KJSIT Book Recommendation System - Metrics
+In-process latency and throughput metrics: call counts, errors and latency
+percentiles per instrumented function, cache hit rates and model-build
+durations. Exported as a JSON snapshot or Prometheus text. Metrics are per
+process; each API worker or Streamlit server reports its own.
+"""
+
+import time
+import threading
+import functools
+from collections import deque
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+# Latency percentiles are computed over the most recent samples of each timer
+SAMPLE_WINDOW = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_PREFIX = 'kjsit'
+
+
+class _Timer:
+    __slots__ = ('count', 'errors', 'total', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+
+
+class Metrics:
+    """Thread-safe registry of timers, cache counters and build durations"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timers: Dict[str, _Timer] = {}
+        self._caches: Dict[str, Dict[str, int]] = {}
+        self._builds: Dict[str, Dict[str, float]] = {}
+        self.started_at = time.time()
+
+    def observe(self, name: str, seconds: float, error: bool = False):
+        """Record one call of a timed function"""
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                timer = self._timers[name] = _Timer()
+            timer.count += 1
+            timer.errors += error
+            timer.total += seconds
+            timer.samples.append(seconds)
+
+    def record_error(self, name: str):
+        """Count a failure that was handled (logged and swallowed) rather than raised"""
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                timer = self._timers[name] = _Timer()
+            timer.errors += 1
+
+    def record_cache(self, name: str, hit: bool):
+        """Count one cache lookup"""
+        with self._lock:
+            counts = self._caches.setdefault(name, {'hits': 0, 'misses': 0})
+            counts['hits' if hit else 'misses'] += 1
+
+    def record_build(self, phase: str, seconds: float):
+        """Record the duration of a model-build phase"""
+        with self._lock:
+            build = self._builds.setdefault(phase, {'count': 0, 'last_seconds': 0.0, 'total_seconds': 0.0})
+            build['count'] += 1
+            build['last_seconds'] = seconds
+            build['total_seconds'] += seconds
+            build['finished_at'] = time.time()
+
+    def snapshot(self) -> Dict:
+        """Current values as plain JSON-serialisable dicts"""
+        with self._lock:
+            timers = {
+                name: (timer.count, timer.errors, timer.total, list(timer.samples))
+                for name, timer in self._timers.items()
+            }
+            caches = {name: dict(counts) for name, counts in self._caches.items()}
+            builds = {phase: dict(build) for phase, build in self._builds.items()}
+
+        uptime = time.time() - self.started_at
+        methods = {}
+        for name, (count, errors, total, samples) in sorted(timers.items()):
+            entry = {
+                'count': count,
+                'errors': errors,
+                'total_seconds': total,
+                'mean_seconds': total / count if count else 0.0,
+                'calls_per_second': count / uptime if uptime else 0.0
+            }
+            values = np.quantile(samples, QUANTILES) if samples else [0.0] * len(QUANTILES)
+            for quantile, value in zip(QUANTILES, values):
+                entry[f'p{int(quantile * 100)}_seconds'] = float(value)
+            methods[name] = entry
+
+        for counts in caches.values():
+            lookups = counts['hits'] + counts['misses']
+            counts['hit_rate'] = counts['hits'] / lookups if lookups else 0.0
+
+        return {
+            'uptime_seconds': uptime,
+            'methods': methods,
+            'caches': dict(sorted(caches.items())),
+            'builds': dict(sorted(builds.items()))
+        }
+
+    def to_prometheus(self) -> str:
+        """Current values in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        p = METRIC_PREFIX
+        lines = [
+            f"# TYPE {p}_uptime_seconds gauge",
+            f"{p}_uptime_seconds {snapshot['uptime_seconds']:.3f}",
+            f"# TYPE {p}_call_duration_seconds summary",
+        ]
+        for name, entry in snapshot['methods'].items():
+            for quantile in QUANTILES:
+                value = entry[f'p{int(quantile * 100)}_seconds']
+                lines.append(f'{p}_call_duration_seconds{{method="{name}",quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'{p}_call_duration_seconds_sum{{method="{name}"}} {entry["total_seconds"]:.6f}')
+            lines.append(f'{p}_call_duration_seconds_count{{method="{name}"}} {entry["count"]}')
+
+        lines.append(f"# TYPE {p}_call_errors_total counter")
+        for name, entry in snapshot['methods'].items():
+            lines.append(f'{p}_call_errors_total{{method="{name}"}} {entry["errors"]}')
+
+        lines.append(f"# TYPE {p}_cache_requests_total counter")
+        for name, counts in snapshot['caches'].items():
+            lines.append(f'{p}_cache_requests_total{{cache="{name}",result="hit"}} {counts["hits"]}')
+            lines.append(f'{p}_cache_requests_total{{cache="{name}",result="miss"}} {counts["misses"]}')
+
+        lines.append(f"# TYPE {p}_model_build_seconds gauge")
+        for phase, build in snapshot['builds'].items():
+            lines.append(f'{p}_model_build_seconds{{phase="{phase}"}} {build["last_seconds"]:.6f}')
+        lines.append(f"# TYPE {p}_model_builds_total counter")
+        for phase, build in snapshot['builds'].items():
+            lines.append(f'{p}_model_builds_total{{phase="{phase}"}} {build["count"]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """Drop every recorded value"""
+        with self._lock:
+            self._timers.clear()
+            self._caches.clear()
+            self._builds.clear()
+            self.started_at = time.time()
+
+
+# Process-wide registry
+metrics = Metrics()
+
+
+def timed(name: Optional[str] = None, build: bool = False) -> Callable:
+    """
+    Decorator that records each call's latency (and raised errors) under name.
+    build=True also records the duration as a model-build phase, unless the
+    call raised or returned False (a failure it handled itself).
+    """
+    def decorator(func):
+        metric_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            error = False
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            except Exception:
+                error = True
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                metrics.observe(metric_name, elapsed, error)
+                if build and not error and result is not False:
+                    metrics.record_build(metric_name, elapsed)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,335 @@
+"""
+KJSIT Book Recommendation System - Shared Model Store
+Lets every server process on a host share one copy of the model. The first
+process to need a model builds it and publishes the large arrays (ratings
+matrix, item similarity, TF-IDF matrix) as .npy files; every process then
+memory-maps them read-only, so the pages are shared through the OS page
+cache and extra workers cost almost no extra RAM. A lock file makes sure
+only one process builds per host; the others wait and attach.
+
+Applying rating events takes private copies of the arrays they change, so
+a process that has replayed more than SHARED_MODEL_REPUBLISH_EVENTS events
+(or any, when it first attaches) publishes its caught-up model as a new
+version, and every process moves to it at its next catch-up.
+"""
+
+import os
+import json
+import time
+import shutil
+import pickle
+import logging
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sqlalchemy import func
+
+from config import Config
+from metrics import timed
+from data_version import CATALOG
+from models import Book, DataVersion, get_session
+from recommendation_engine import BookRecommendationEngine
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks; concurrent builders just race to publish
+    fcntl = None
+
+STORE_FORMAT_VERSION = 1
+CURRENT_FILE = 'CURRENT'
+LOCK_FILE = 'build.lock'
+
+
+def database_fingerprint(session) -> Dict:
+    """
+    Cheap summary of the catalog; a shared model is reused only while it
+    matches. Rating writes are not part of it: an attaching process replays
+    them from the rating event log instead of rebuilding. Bulk reloads
+    (ingest, reseed) bump the catalog data version.
+    """
+    books, max_book_id = session.query(func.count(Book.id), func.max(Book.id)).one()
+    catalog_version = session.query(DataVersion.version).filter_by(scope=CATALOG).scalar() or 0
+    return {
+        'books': books,
+        'max_book_id': max_book_id,
+        'catalog_version': catalog_version
+    }
+
+
+@contextmanager
+def _build_lock(directory: str, shared: bool = False):
+    """
+    Per-host lock: exclusive around check-build-publish, shared while
+    attaching, so a concurrent publish cannot remove the version being read
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def read_manifest(directory: str) -> Optional[Dict]:
+    """Manifest of the currently published model, if any"""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            name = f.read().strip()
+        with open(os.path.join(directory, name, 'manifest.json')) as f:
+            manifest = json.load(f)
+        manifest['path'] = os.path.join(directory, name)
+        return manifest
+    except (OSError, ValueError):
+        return None
+
+
+@timed('model_store.publish', build=True)
+def publish_model(engine: BookRecommendationEngine, directory: str, fingerprint: Dict) -> str:
+    """
+    Write the engine's model to a new version directory and make it current.
+    The pointer file is swapped atomically, so readers never see a partial model.
+    Returns the version directory.
+    """
+    name = f"model-{engine.model_version}"
+    path = os.path.join(directory, name)
+    os.makedirs(path, exist_ok=True)
+
+    arrays = {}
+    if engine.ratings_matrix is not None:
+        arrays['ratings_matrix'] = engine.ratings_matrix.to_numpy()
+        arrays['ratings_users'] = engine.ratings_matrix.index.to_numpy()
+        arrays['ratings_books'] = engine.ratings_matrix.columns.to_numpy()
+    if engine.book_similarity is not None:
+        arrays['book_similarity'] = engine.book_similarity
+    if engine.item_neighbours is not None:
+        arrays['item_neighbours'] = engine.item_neighbours
+    if engine.tfidf_matrix is not None:
+        tfidf = engine.tfidf_matrix.tocsr()
+        arrays['tfidf_data'] = tfidf.data
+        arrays['tfidf_indices'] = tfidf.indices
+        arrays['tfidf_indptr'] = tfidf.indptr
+
+    for array_name, array in arrays.items():
+        np.save(os.path.join(path, f"{array_name}.npy"), np.ascontiguousarray(array))
+
+    # Small structures are pickled and loaded privately by each process
+    with open(os.path.join(path, 'frames.pkl'), 'wb') as f:
+        pickle.dump({
+            'books_df': engine.books_df,
+            'ratings_df': engine.ratings_df,
+            'tfidf_vectorizer': engine.tfidf_vectorizer,
+            'content_index': engine.content_index,
+            'cold_start_lists': engine.cold_start_lists,
+            'user_segments': engine._user_segments
+        }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    manifest = {
+        'version': STORE_FORMAT_VERSION,
+        'model_version': engine.model_version,
+        'event_seq': engine.event_seq,
+        'precision': engine.dtype.name,
+        'fingerprint': fingerprint,
+        'arrays': sorted(arrays),
+        'tfidf_shape': list(engine.tfidf_matrix.shape) if engine.tfidf_matrix is not None else None,
+        'created_at': time.time()
+    }
+    with open(os.path.join(path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+
+    tmp_path = os.path.join(directory, f"{CURRENT_FILE}.tmp")
+    with open(tmp_path, 'w') as f:
+        f.write(name)
+    os.replace(tmp_path, os.path.join(directory, CURRENT_FILE))
+
+    _remove_old_versions(directory, keep=name)
+    return path
+
+
+def _remove_old_versions(directory: str, keep: str):
+    # Processes still mapping an old version keep their pages until they unmap (POSIX)
+    for name in os.listdir(directory):
+        if name.startswith('model-') and name != keep:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+@timed('model_store.attach', build=True)
+def attach_model(engine: BookRecommendationEngine, manifest: Dict):
+    """Point the engine at a published model: large arrays are read-only memory maps"""
+    path = manifest['path']
+
+    def load(array_name):
+        return np.load(os.path.join(path, f"{array_name}.npy"), mmap_mode='r')
+
+    with open(os.path.join(path, 'frames.pkl'), 'rb') as f:
+        frames = pickle.load(f)
+
+    arrays = set(manifest['arrays'])
+    if engine.content_index is not None and engine.content_index is not frames.get('content_index'):
+        # Re-attaching: the replaced index's re-weight thread would otherwise keep running
+        engine.content_index.stop_background_reweight()
+    engine.books_df = frames['books_df']
+    engine.ratings_df = frames['ratings_df']
+    engine.tfidf_vectorizer = frames['tfidf_vectorizer']
+    engine.cold_start_lists = frames['cold_start_lists']
+    engine._user_segments = frames['user_segments']
+    # The hashing content index is appended to at runtime, so each process keeps its own copy
+    engine.content_index = frames.get('content_index')
+    if engine.content_index is not None:
+        engine.content_index.start_background_reweight(Config.CONTENT_REWEIGHT_INTERVAL)
+    engine._book_positions = {
+        book_id: pos for pos, book_id in enumerate(engine.books_df.get('book_id', []))
+    }
+    engine._build_popularity_index()
+
+    engine.ratings_matrix = None
+    if 'ratings_matrix' in arrays:
+        engine.ratings_matrix = pd.DataFrame(
+            load('ratings_matrix'),
+            index=pd.Index(load('ratings_users'), name='user_id'),
+            columns=pd.Index(load('ratings_books'), name='book_id'),
+            copy=False
+        )
+
+    engine.book_similarity = engine.book_similarity_df = None
+    if 'book_similarity' in arrays:
+        engine.book_similarity = load('book_similarity')
+        engine.book_similarity_df = pd.DataFrame(
+            engine.book_similarity,
+            index=engine.ratings_matrix.columns,
+            columns=engine.ratings_matrix.columns,
+            copy=False
+        )
+
+    engine.item_neighbours = load('item_neighbours') if 'item_neighbours' in arrays else None
+
+    engine.tfidf_matrix = None
+    if 'tfidf_data' in arrays:
+        engine.tfidf_matrix = sparse.csr_matrix(
+            (load('tfidf_data'), load('tfidf_indices'), load('tfidf_indptr')),
+            shape=tuple(manifest['tfidf_shape']),
+            copy=False
+        )
+
+    engine.dtype = np.dtype(manifest['precision'])
+    engine._build_user_profiles()
+    engine.model_version = manifest['model_version']
+    engine.event_seq = manifest.get('event_seq', 0)
+    engine.shared_model_path = path
+    engine.shared_manifest = manifest
+
+
+def _attach_current(engine: BookRecommendationEngine, directory: str) -> bool:
+    """Attach the engine to the published version if it is a build of the same model; False if not"""
+    with _build_lock(directory, shared=True):
+        manifest = read_manifest(directory)
+        usable = (
+            manifest is not None and
+            manifest.get('precision') == engine.dtype.name and
+            manifest.get('fingerprint') == engine.shared_manifest['fingerprint']
+        )
+        if usable:
+            with engine._write_lock:
+                attach_model(engine, manifest)
+    return usable
+
+
+@timed('model_store.sync')
+def sync_shared_model(
+    engine: BookRecommendationEngine,
+    max_lag: Optional[int] = None,
+    batch_size: int = 1000
+) -> int:
+    """
+    Catch an attached engine up with the rating event log while keeping it on
+    shared pages: move to a version another process published since, replay
+    the remaining events, and once the engine is more than max_lag events
+    (default Config.SHARED_MODEL_REPUBLISH_EVENTS) past the version it
+    attached, publish it as the new version and re-attach. Returns the
+    events applied.
+    """
+    if max_lag is None:
+        max_lag = Config.SHARED_MODEL_REPUBLISH_EVENTS
+    directory = os.path.dirname(engine.shared_manifest['path'])
+
+    # Nothing is lost by moving to a version that already reflects every event this engine has
+    manifest = read_manifest(directory)
+    if (manifest is not None and manifest['path'] != engine.shared_manifest['path'] and
+            manifest.get('event_seq', 0) >= engine.event_seq):
+        _attach_current(engine, directory)
+
+    applied = engine.replay_events(batch_size)
+    if engine.event_seq - engine.shared_manifest.get('event_seq', 0) <= max_lag:
+        return applied
+
+    with _build_lock(directory):
+        manifest = read_manifest(directory)
+        # Publish unless another process got there first (or the host moved to another precision or catalog)
+        if (manifest is not None and
+                manifest.get('precision') == engine.dtype.name and
+                manifest.get('fingerprint') == engine.shared_manifest['fingerprint'] and
+                manifest.get('event_seq', 0) < engine.event_seq):
+            with engine._write_lock:
+                engine.model_version = engine.new_model_version()
+                publish_model(engine, directory, engine.shared_manifest['fingerprint'])
+
+    if _attach_current(engine, directory):
+        applied += engine.replay_events(batch_size)
+    return applied
+
+
+def load_shared_engine(directory: Optional[str] = None, precision: Optional[str] = None) -> BookRecommendationEngine:
+    """
+    Engine attached to the host's shared model, building and publishing it
+    first if no published model matches the database (once per host: the
+    other processes wait on the lock and then attach).
+    """
+    directory = directory or Config.SHARED_MODEL_DIR
+    precision = np.dtype(precision or Config.MODEL_PRECISION).name
+    engine = BookRecommendationEngine(precision=precision, load=False)
+
+    session = get_session()
+    try:
+        fingerprint = database_fingerprint(session)
+    finally:
+        session.close()
+
+    with _build_lock(directory):
+        manifest = read_manifest(directory)
+        fresh = (
+            manifest is not None and
+            manifest.get('version') == STORE_FORMAT_VERSION and
+            manifest.get('precision') == precision and
+            manifest.get('fingerprint') == fingerprint
+        )
+        if not fresh:
+            logging.info(f"Building shared model in {directory}")
+            engine.load_data()
+            if engine.books_df.empty:
+                # Nothing worth sharing (or the build failed and was logged)
+                return engine
+            publish_model(engine, directory, fingerprint)
+
+    # The builder re-attaches too, dropping its private copies for the shared pages.
+    # A version published meanwhile by another process is at least as new, so take CURRENT again
+    with _build_lock(directory, shared=True):
+        manifest = read_manifest(directory)
+        attached = manifest is not None and manifest.get('precision') == precision
+        if attached:
+            attach_model(engine, manifest)
+
+    if attached:
+        # Ratings written since the model was published: replay them once and publish
+        # the result, so the processes attaching next share it instead of each copying
+        sync_shared_model(engine, max_lag=0)
+        return engine
+
+    # Replaced by a model at another precision: keep a private one rather than wait
+    if engine.model_version is None:
+        engine.load_data()
+    return engine
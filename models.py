@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import create_engine, inspect, text, Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 from sqlalchemy.sql import func
@@ -45,6 +45,7 @@ class Book(Base):
     price = Column(Float)  # Price of the book
     average_rating = Column(Float, default=0.0)
     total_ratings = Column(Integer, default=0)
+    rating_sum = Column(Float, default=0.0)  # Exact sum of ratings; average_rating derives from it
     created_at = Column(DateTime, default=func.now())
 
     # Relationships
@@ -64,6 +65,12 @@ class Rating(Base):
     user = relationship("User", back_populates="ratings")
     book = relationship("Book", back_populates="ratings")
 
+    __table_args__ = (
+        Index('ix_ratings_user_id_id', 'user_id', 'id'),
+        # One rating per user and book; a losing concurrent insert becomes an update
+        Index('uq_ratings_user_book', 'user_id', 'book_id', unique=True),
+    )
+
 class Review(Base):
     __tablename__ = 'reviews'
 
@@ -88,19 +95,141 @@ class UserSession(Base):
 
     user = relationship("User")
 
+class AnalyticsCounter(Base):
+    """Precomputed analytics aggregate, maintained incrementally by writes (see analytics.py)"""
+    __tablename__ = 'analytics_counters'
+
+    id = Column(Integer, primary_key=True)
+    metric = Column(String(20), nullable=False)  # 'total', 'genre', 'author', 'rating' or 'meta'
+    key = Column(String(255), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('metric', 'key', name='uq_analytics_metric_key'),
+        Index('ix_analytics_metric_count', 'metric', 'count'),
+    )
+
+class Recommendation(Base):
+    """Precomputed recommendation row, written by the offline job (see precompute.py)"""
+    __tablename__ = 'recommendations'
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(20), nullable=False)  # 'user' (hybrid) or 'similar' (similar books)
+    subject_id = Column(Integer, nullable=False)  # user id or book id, depending on kind
+    book_id = Column(Integer, ForeignKey('books.id'), nullable=False)
+    rank = Column(Integer, nullable=False)
+    score = Column(Float)
+    model_version = Column(String(50), nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index('ix_recommendations_kind_subject_rank', 'kind', 'subject_id', 'rank'),
+    )
+
+class RecommendationSet(Base):
+    """
+    One precompute run's recommendations. Readers only see rows of the active
+    set; the job writes a new set in batches and then switches the pointer.
+    """
+    __tablename__ = 'recommendation_sets'
+
+    model_version = Column(String(50), primary_key=True)
+    event_seq = Column(Integer, nullable=False, default=0)  # Last rating event the model was built from
+    active = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=func.now())
+
+class RatingEvent(Base):
+    """
+    Append-only log of rating changes, written in the same transaction as the
+    change itself (see rating_service.py). Consumers apply the events after
+    the last sequence number they have seen instead of reloading.
+    """
+    __tablename__ = 'rating_events'
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    book_id = Column(Integer, ForeignKey('books.id'), nullable=False)
+    rating = Column(Float)  # None for a deleted rating
+    previous_rating = Column(Float)  # None for a new rating
+    # The book's aggregates after the change, so consumers need no extra reads
+    average_rating = Column(Float)
+    total_ratings = Column(Integer)
+    created_at = Column(DateTime, default=func.now())
+
+    # AUTOINCREMENT: SQLite never reuses a sequence number
+    __table_args__ = (
+        Index('ix_rating_events_user_created', 'user_id', 'created_at'),
+        {'sqlite_autoincrement': True},
+    )
+
+class DataVersion(Base):
+    """
+    Per-scope write counters ('catalog', 'ratings', 'users'), bumped in the
+    same transaction as the write so every process can tell when its model
+    and caches are stale (see data_version.py).
+    """
+    __tablename__ = 'data_versions'
+
+    scope = Column(String(20), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
 # Database setup
+# One pooled engine (and session factory) per database URL per process
+_engines = {}
+_session_factories = {}
+
 def get_engine():
     database_url = os.getenv('DATABASE_URL', 'sqlite:///books_recommendation.db')
-    return create_engine(database_url, echo=False)
+    if database_url not in _engines:
+        _engines[database_url] = create_engine(database_url, echo=False, pool_pre_ping=True)
+    return _engines[database_url]
+
+def _discard_pools_after_fork():
+    # A forked child (pool worker, API process) must not reuse the parent's connections
+    for engine in _engines.values():
+        engine.dispose(close=False)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_discard_pools_after_fork)
 
 def get_session():
     engine = get_engine()
-    Session = sessionmaker(bind=engine)
-    return Session()
+    if engine not in _session_factories:
+        _session_factories[engine] = sessionmaker(bind=engine)
+    return _session_factories[engine]()
+
+# Rebuilds every book's rating aggregates from the ratings table
+_RECOMPUTE_BOOK_AGGREGATES = text("""
+    UPDATE books SET
+        rating_sum = (SELECT COALESCE(SUM(rating), 0.0) FROM ratings WHERE ratings.book_id = books.id),
+        total_ratings = (SELECT COUNT(*) FROM ratings WHERE ratings.book_id = books.id),
+        average_rating = COALESCE((SELECT AVG(rating) FROM ratings WHERE ratings.book_id = books.id), 0.0)
+""")
+
+# Keeps the latest of any duplicate (user, book) ratings written before the unique index
+_DELETE_DUPLICATE_RATINGS = text("""
+    DELETE FROM ratings WHERE id NOT IN (SELECT MAX(id) FROM ratings GROUP BY user_id, book_id)
+""")
 
 def create_tables():
     engine = get_engine()
     Base.metadata.create_all(engine)
 
+    # create_all skips tables that already exist; add columns introduced since
+    recompute = False
+    with engine.begin() as connection:
+        if 'rating_sum' not in {column['name'] for column in inspect(connection).get_columns('books')}:
+            connection.execute(text('ALTER TABLE books ADD COLUMN rating_sum FLOAT DEFAULT 0.0'))
+            recompute = True
+        if not any(index['name'] == 'uq_ratings_user_book' for index in inspect(connection).get_indexes('ratings')):
+            recompute = connection.execute(_DELETE_DUPLICATE_RATINGS).rowcount > 0 or recompute
+        if recompute:
+            connection.execute(_RECOMPUTE_BOOK_AGGREGATES)
+
+    # ...and indexes
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
 if __name__ == "__main__":
     create_tables()
@@ -0,0 +1,233 @@
+"""
+KJSIT Book Recommendation System - Recommendation Pipeline
+Two-stage recommendations: cheap candidate generators each propose a few
+hundred books from precomputed structures (item neighbour lists, genre
+partitions, the popularity index, the user's taste profile), and a
+re-ranker scores only the union with the full hybrid model. The
+re-ranking cost depends on the candidate pool size rather than the catalog
+size; the taste-profile generator is the exception, scoring every book
+against the profile in one sparse product. A new signal is added by
+writing another generator.
+"""
+
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from content_index import top_k
+from metrics import metrics
+
+
+class UserContext:
+    """What the generators and re-ranker need to know about the requesting user"""
+
+    def __init__(self, engine, user_id: int):
+        self.user_id = user_id
+        # Rated books, highest rated first
+        rated, ratings = engine.user_rated_books(user_id)
+        order = np.argsort(-ratings, kind='stable')
+        self.rated_books = rated[order]
+        self.ratings = ratings[order]
+        self._profile_scores = None
+        self._engine = engine
+
+    @property
+    def profile_scores(self):
+        """(scores, book ids) against the user's taste profile, computed once per request"""
+        if self._profile_scores is None:
+            self._profile_scores = self._engine.profile_scores(self.user_id)
+        return self._profile_scores
+
+
+class CandidateGenerator(ABC):
+    """Proposes up to `limit` candidate book ids for a user"""
+
+    name = 'generator'
+
+    def __init__(self, limit: int = 200):
+        self.limit = limit
+
+    @abstractmethod
+    def generate(self, engine, context: UserContext) -> List[int]:
+        """Candidate book ids, best first (rated books may be included; the pipeline drops them)"""
+
+
+class ItemNeighbourGenerator(CandidateGenerator):
+    """Co-rating neighbours of the user's best-rated books"""
+
+    name = 'item_neighbours'
+
+    def __init__(self, limit: int = 200, seeds: int = 20):
+        super().__init__(limit)
+        self.seeds = seeds
+
+    def generate(self, engine, context):
+        if engine.item_neighbours is None or not len(context.rated_books):
+            return []
+
+        columns = engine.ratings_matrix.columns
+        seed_columns = columns.get_indexer(context.rated_books[:self.seeds])
+        seed_columns = seed_columns[seed_columns >= 0]
+        neighbours = engine.item_neighbours[seed_columns]
+        # Neighbour lists are padded with unrelated books when a book has few co-ratings
+        related = np.take_along_axis(engine.book_similarity[seed_columns], neighbours, axis=1) > 0
+        # Interleave the seeds' lists so every seed contributes its nearest neighbours first
+        book_ids = columns.to_numpy()[neighbours.T[related.T]]
+        # Seeds share neighbours: keep each book's first (nearest) occurrence, and spend the limit on unrated books
+        _, first = np.unique(book_ids, return_index=True)
+        book_ids = book_ids[np.sort(first)]
+        book_ids = book_ids[~np.isin(book_ids, context.rated_books)]
+        return book_ids[:self.limit].tolist()
+
+
+class GenrePoolGenerator(CandidateGenerator):
+    """Most popular books of the genres the user reads, shared out by how much they read each"""
+
+    name = 'genre_pool'
+
+    def generate(self, engine, context):
+        if not len(context.rated_books):
+            return []
+
+        positions = [engine._book_positions[b] for b in context.rated_books if b in engine._book_positions]
+        genres = engine.books_df['genre'].iloc[positions].astype(str).value_counts()
+        candidates = []
+        for genre, count in genres.items():
+            partition = engine.genre_index.get(genre)
+            if partition is not None:
+                share = max(1, int(round(self.limit * count / genres.sum())))
+                candidates.extend(book_id for book_id, _ in partition.top(share))
+        return candidates[:self.limit]
+
+
+class PopularityGenerator(CandidateGenerator):
+    """The catalog's most popular books"""
+
+    name = 'popular'
+
+    def generate(self, engine, context):
+        return [book_id for book_id, _ in engine.popularity_index.top(self.limit)]
+
+
+class ContentProfileGenerator(CandidateGenerator):
+    """Unrated books closest to the user's taste profile"""
+
+    name = 'content_profile'
+
+    def generate(self, engine, context):
+        scores, book_ids = context.profile_scores
+        return book_ids[top_k(scores, self.limit)].tolist()
+
+
+class HybridReranker:
+    """
+    Scores candidates with the hybrid model: an item-based collaborative
+    prediction from the user's own ratings, taste-profile similarity and
+    the damped popularity score, blended linearly (each scaled to [0, 1]).
+    cf_shrinkage pulls predictions backed by little similarity toward 0,
+    so one faint neighbour rated 5 does not predict a 5.
+    """
+
+    def __init__(
+        self,
+        cf_weight: float = 0.6,
+        content_weight: float = 0.3,
+        popularity_weight: float = 0.1,
+        cf_shrinkage: float = 1.0
+    ):
+        self.cf_weight = cf_weight
+        self.content_weight = content_weight
+        self.popularity_weight = popularity_weight
+        self.cf_shrinkage = cf_shrinkage
+
+    def predicted_ratings(self, engine, context: UserContext, candidates: np.ndarray) -> np.ndarray:
+        """Similarity-weighted (shrunk) average of the user's ratings over each candidate's rated neighbours"""
+        predicted = np.zeros(len(candidates))
+        if engine.book_similarity is None or not len(context.rated_books):
+            return predicted
+
+        columns = engine.ratings_matrix.columns
+        candidate_columns = columns.get_indexer(candidates)
+        rated_columns = columns.get_indexer(context.rated_books)
+        known = candidate_columns >= 0
+        similarities = np.clip(engine.book_similarity[np.ix_(candidate_columns[known], rated_columns)], 0, None)
+        predicted[known] = similarities @ context.ratings / (similarities.sum(axis=1) + self.cf_shrinkage)
+        return predicted
+
+    def content_scores(self, engine, context: UserContext, candidates: np.ndarray) -> np.ndarray:
+        """Cosine similarity of each candidate to the user's taste profile"""
+        profile = engine.user_profile(context.user_id)
+        if profile is None:
+            return np.zeros(len(candidates))
+        return (engine._content_vectors(candidates.tolist()) @ profile.T).toarray().ravel()
+
+    def score(self, engine, context: UserContext, candidates: np.ndarray) -> Dict[str, np.ndarray]:
+        """Feature columns and the blended 'score' for each candidate"""
+        features = {
+            'predicted_rating': self.predicted_ratings(engine, context, candidates),
+            'similarity_score': self.content_scores(engine, context, candidates),
+            'popularity_score': np.array([engine.popularity_index.score(b) for b in candidates.tolist()])
+        }
+        features['score'] = (
+            self.cf_weight * features['predicted_rating'] / 5.0 +
+            self.content_weight * features['similarity_score'] +
+            self.popularity_weight * features['popularity_score'] / 5.0
+        )
+        return features
+
+
+class RecommendationPipeline:
+    """Candidate generators followed by a re-ranker"""
+
+    def __init__(self, generators: List[CandidateGenerator], reranker: Optional[HybridReranker] = None):
+        self.generators = generators
+        self.reranker = reranker or HybridReranker()
+
+    @classmethod
+    def default(cls) -> 'RecommendationPipeline':
+        return cls([
+            ItemNeighbourGenerator(),
+            ContentProfileGenerator(),
+            GenrePoolGenerator(100),
+            PopularityGenerator(50)
+        ])
+
+    def candidates(self, engine, context: UserContext) -> Dict[int, List[str]]:
+        """Union of every generator's candidates (rated books removed), with the generators that proposed each"""
+        rated = set(context.rated_books.tolist())
+        sources: Dict[int, List[str]] = {}
+        for generator in self.generators:
+            started = time.perf_counter()
+            for book_id in generator.generate(engine, context):
+                if book_id not in rated:
+                    names = sources.setdefault(int(book_id), [])
+                    # A generator may propose a book twice; list it once
+                    if not names or names[-1] != generator.name:
+                        names.append(generator.name)
+            metrics.observe(f"pipeline.{generator.name}", time.perf_counter() - started)
+        return sources
+
+    def recommend(self, engine, user_id: int, limit: int = 10) -> List[Dict]:
+        """The user's top recommendations; empty for users without ratings"""
+        context = UserContext(engine, user_id)
+        if not len(context.rated_books):
+            return []
+
+        sources = self.candidates(engine, context)
+        if not sources:
+            return []
+
+        started = time.perf_counter()
+        candidates = np.array([b for b in sources if b in engine._book_positions], dtype=np.int64)
+        features = self.reranker.score(engine, context, candidates)
+        top = top_k(features['score'], limit)
+        metrics.observe('pipeline.rerank', time.perf_counter() - started)
+
+        recommendations = engine.get_books(candidates[top].tolist())
+        for book_dict, idx in zip(recommendations, top):
+            for name, values in features.items():
+                book_dict[name] = float(values[idx])
+            book_dict['sources'] = sources[int(candidates[idx])]
+        return recommendations
@@ -0,0 +1,94 @@
+"""
+KJSIT Book Recommendation System - Popularity Index
+Books ranked by a damped (Bayesian) average rating, so a single 5-star
+rating does not outrank a 4.8 average over hundreds of ratings:
+
+    score = v / (v + m) * R + m / (v + m) * C
+
+where R is the book's average rating, v its number of ratings, m the
+MIN_RATINGS_THRESHOLD and C the mean rating across the catalog. The index
+is built once per model build and kept sorted, so rating writes move one
+entry and top-k reads are a slice. The engine also keeps one index per
+genre, so genre browsing pages through a pre-sorted partition.
+"""
+
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class PopularityIndex:
+    """Sorted (score descending) list of books with O(log n) lookups and O(k) top-k reads"""
+
+    def __init__(self, min_ratings: int, prior_mean: float, include_unrated: bool = False):
+        self.min_ratings = max(int(min_ratings), 0)
+        # Unrated books score 0.0, after every rated book
+        self.include_unrated = include_unrated
+        # C stays fixed between builds: moving it would re-score every book on each write
+        self.prior_mean = float(prior_mean)
+        # Sort keys (-score, -total_ratings, book_id); ties go to the more-rated book, then the lower id
+        self._keys: List[Tuple[float, int, int]] = []
+        self._entries: Dict[int, Tuple[float, int, int]] = {}
+
+    @classmethod
+    def build(
+        cls,
+        books_df: pd.DataFrame,
+        min_ratings: int,
+        prior_mean: Optional[float] = None,
+        include_unrated: bool = False
+    ) -> 'PopularityIndex':
+        """
+        Index the books in books_df (only rated ones unless include_unrated).
+        prior_mean defaults to the rating-weighted mean of books_df itself.
+        """
+        if books_df is None or books_df.empty:
+            return cls(min_ratings, prior_mean or 0.0, include_unrated)
+
+        totals = books_df['total_ratings'].to_numpy(dtype=np.int64)
+        averages = books_df['average_rating'].fillna(0.0).to_numpy(dtype=np.float64)
+        rated = totals > 0
+        if prior_mean is None:
+            prior_mean = (averages[rated] * totals[rated]).sum() / totals[rated].sum() if rated.any() else 0.0
+
+        index = cls(min_ratings, prior_mean, include_unrated)
+        kept = np.ones_like(rated) if include_unrated else rated
+        scores = index.scores(averages[kept], totals[kept])
+        keys = zip((-scores).tolist(), (-totals[kept]).tolist(), books_df['book_id'].to_numpy()[kept].tolist())
+        index._keys = sorted(keys)
+        index._entries = {key[2]: key for key in index._keys}
+        return index
+
+    def scores(self, averages, totals):
+        """Damped average for scalars or arrays of (average rating, rating count)"""
+        m = self.min_ratings
+        damped = (totals * averages + m * self.prior_mean) / np.maximum(totals + m, 1)
+        return np.where(totals > 0, damped, 0.0)
+
+    def update(self, book_id: int, average_rating: float, total_ratings: int):
+        """Move one book to its new position after a rating write"""
+        old_key = self._entries.pop(book_id, None)
+        if old_key is not None:
+            del self._keys[bisect.bisect_left(self._keys, old_key)]
+
+        total_ratings = int(total_ratings or 0)
+        if total_ratings > 0 or self.include_unrated:
+            score = float(self.scores(float(average_rating or 0.0), total_ratings))
+            key = (-score, -total_ratings, int(book_id))
+            bisect.insort(self._keys, key)
+            self._entries[book_id] = key
+
+    def top(self, k: int, offset: int = 0) -> List[Tuple[int, float]]:
+        """The k most popular (book_id, score) pairs, starting at offset"""
+        offset = max(offset, 0)
+        return [(book_id, -neg_score) for neg_score, _, book_id in self._keys[offset:offset + max(k, 0)]]
+
+    def score(self, book_id: int) -> float:
+        """A book's current score (0.0 if it has no ratings)"""
+        key = self._entries.get(book_id)
+        return -key[0] if key is not None else 0.0
+
+    def __len__(self) -> int:
+        return len(self._keys)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+KJSIT Book Recommendation System - Offline Precompute
+Materialises hybrid recommendations for every user and similar-books lists
+for every book into the recommendations table. Scoring runs across a process
+pool against one loaded engine; a single writer commits the rows in batches
+under a new recommendation set and then switches the active set, so the app
+serves them with one indexed read instead of scoring per page view, and no
+write lock is held for the length of the job.
+"""
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from typing import Dict, List, Optional
+
+from config import Config
+from models import Recommendation, RecommendationSet, User, get_session, create_tables
+from recommendation_engine import BookRecommendationEngine
+
+# Engine used by pool workers; set in the parent before the pool forks
+_ENGINE = None
+
+# Old rows removed per transaction after the switch
+DELETE_BATCH_SIZE = 5000
+
+
+def _init_worker():
+    """Pool initializer: reuse the inherited engine, or load one (spawn start method)"""
+    global _ENGINE
+    if _ENGINE is None:
+        _ENGINE = BookRecommendationEngine()
+
+
+def _score_block(task) -> List[Dict]:
+    """Recommendation rows for one block of users or books (runs in a worker)"""
+    kind, subject_ids, limit = task
+    rows = []
+    for subject_id in subject_ids:
+        if kind == 'user':
+            results = _ENGINE.get_hybrid_recommendations(subject_id, limit)
+        else:
+            results = _ENGINE.get_content_based_recommendations(subject_id, limit)
+
+        for rank, result in enumerate(results):
+            score = result.get('score') or result.get('predicted_rating') or result.get('similarity_score') or 0.0
+            rows.append({
+                'kind': kind,
+                'subject_id': int(subject_id),
+                'book_id': int(result['book_id']),
+                'rank': rank,
+                'score': float(score)
+            })
+    return rows
+
+
+def _delete_versions(session, versions):
+    """Delete the recommendation sets and their rows, a batch per transaction"""
+    for version in versions:
+        while True:
+            batch = session.query(Recommendation.id).filter(
+                Recommendation.model_version == version
+            ).limit(DELETE_BATCH_SIZE).subquery()
+            deleted = session.query(Recommendation).filter(
+                Recommendation.id.in_(batch.select())
+            ).delete(synchronize_session=False)
+            session.commit()
+            if deleted < DELETE_BATCH_SIZE:
+                break
+        session.query(RecommendationSet).filter(
+            RecommendationSet.model_version == version
+        ).delete(synchronize_session=False)
+        session.commit()
+
+
+def precompute_recommendations(
+    workers: Optional[int] = None,
+    limit: Optional[int] = None,
+    block_size: Optional[int] = None
+) -> Dict:
+    """
+    Score every user and book and replace the stored recommendations.
+
+    Args:
+        workers (int, optional): Scoring processes (default Config.PRECOMPUTE_WORKERS)
+        limit (int, optional): Rows kept per user/book (default Config.PRECOMPUTE_LIMIT)
+        block_size (int, optional): Users/books per pool task
+
+    Returns:
+        dict: model_version, users, books, rows and seconds
+    """
+    global _ENGINE
+
+    workers = workers or Config.PRECOMPUTE_WORKERS or os.cpu_count() or 1
+    limit = limit or Config.PRECOMPUTE_LIMIT
+    block_size = block_size or Config.PRECOMPUTE_BLOCK_SIZE
+    started = time.perf_counter()
+
+    create_tables()
+    _ENGINE = BookRecommendationEngine()
+    model_version = _ENGINE.model_version
+
+    session = get_session()
+    try:
+        user_ids = [user_id for (user_id,) in session.query(User.id).order_by(User.id)]
+    finally:
+        session.close()
+    book_ids = _ENGINE.books_df['book_id'].tolist() if not _ENGINE.books_df.empty else []
+
+    tasks = [('user', user_ids[i:i + block_size], limit) for i in range(0, len(user_ids), block_size)]
+    tasks += [('similar', book_ids[i:i + block_size], limit) for i in range(0, len(book_ids), block_size)]
+    workers = max(1, min(workers, len(tasks)))
+
+    print(f"🧮 Precomputing recommendations for {len(user_ids)} users and {len(book_ids)} books "
+          f"with {workers} worker process(es)...")
+
+    session = get_session()
+    written = 0
+    try:
+        # Readers ignore the set's rows until it is activated
+        session.add(RecommendationSet(model_version=model_version, event_seq=_ENGINE.event_seq, active=False))
+        session.commit()
+
+        def write_rows(rows):
+            nonlocal written
+            for row in rows:
+                row['model_version'] = model_version
+            session.bulk_insert_mappings(Recommendation, rows)
+            session.commit()
+            written += len(rows)
+
+        if workers == 1:
+            for task in tasks:
+                write_rows(_score_block(task))
+        else:
+            # With fork the workers inherit the loaded engine copy-on-write
+            with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+                for rows in pool.imap_unordered(_score_block, tasks):
+                    write_rows(rows)
+
+        # Switch: one short transaction makes the new set the only active one
+        session.query(RecommendationSet).update(
+            {RecommendationSet.active: RecommendationSet.model_version == model_version},
+            synchronize_session=False
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        _delete_versions(session, [model_version])
+        raise
+    finally:
+        session.close()
+
+    # Older sets and rows, including those of interrupted runs, are no longer read;
+    # versions start with their build time, so a run started since is left alone
+    session = get_session()
+    try:
+        old_versions = {
+            version for (version,) in session.query(Recommendation.model_version).distinct()
+        } | {
+            version for (version,) in session.query(RecommendationSet.model_version)
+        }
+        _delete_versions(session, sorted(version for version in old_versions if version < model_version))
+    finally:
+        session.close()
+
+    report = {
+        'model_version': model_version,
+        'users': len(user_ids),
+        'books': len(book_ids),
+        'rows': written,
+        'seconds': time.perf_counter() - started
+    }
+    print(f"✅ Wrote {written} recommendation rows (model {model_version}) in {report['seconds']:.2f}s")
+    return report
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description='Precompute recommendations for every user and book')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                        help='Scoring processes (default: one per CPU core)')
+    parser.add_argument('--limit', type=int, default=None,
+                        help='Recommendations kept per user and per book')
+    parser.add_argument('--block-size', type=int, default=None,
+                        help='Users or books per pool task')
+
+    args = parser.parse_args()
+    try:
+        precompute_recommendations(args.workers, args.limit, args.block_size)
+    except Exception as e:
+        print(f"❌ Error precomputing recommendations: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+KJSIT Book Recommendation System - Paginated Queries
+Read-side helpers that return one page of rows at a time using keyset
+pagination, so page cost stays bounded however long a user's history is.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from models import Book, Rating, RatingEvent, Recommendation, RecommendationSet
+
+
+def get_user_ratings_page(
+    session,
+    user_id: int,
+    page_size: int = 10,
+    cursor: Optional[int] = None,
+    genre: Optional[str] = None
+) -> Dict:
+    """
+    One page of a user's rated books, most recent first.
+
+    cursor is the previous page's 'next_cursor' (the last rating id shown).
+    Returns the page 'items', the 'total' after filters, genre 'facets'
+    (counts over all of the user's ratings) and 'next_cursor'.
+    """
+    facets = dict(
+        session.query(Book.genre, func.count(Rating.id)).join(Rating).filter(
+            Rating.user_id == user_id, Book.genre.isnot(None)
+        ).group_by(Book.genre).all()
+    )
+
+    query = session.query(Rating, Book).join(Book).filter(Rating.user_id == user_id)
+    if genre:
+        query = query.filter(Book.genre == genre)
+
+    total = query.with_entities(func.count(Rating.id)).scalar()
+
+    if cursor is not None:
+        query = query.filter(Rating.id < cursor)
+    rows = query.order_by(Rating.id.desc()).limit(page_size + 1).all()
+
+    items = [{
+        'rating_id': rating.id,
+        'book_id': book.id,
+        'title': book.title,
+        'author': book.author,
+        'genre': book.genre,
+        'accession_number': book.accession_number,
+        'price': book.price,
+        'average_rating': book.average_rating,
+        'user_rating': rating.rating
+    } for rating, book in rows[:page_size]]
+
+    return {
+        'items': items,
+        'total': total,
+        'facets': facets,
+        'next_cursor': items[-1]['rating_id'] if len(rows) > page_size else None
+    }
+
+
+def get_precomputed_recommendations(
+    session,
+    kind: str,
+    subject_id: int,
+    limit: int
+) -> Optional[List[Tuple[int, float]]]:
+    """
+    Stored (book_id, score) rows of the active recommendation set for a user
+    ('user') or book ('similar'), best first, read through the
+    (kind, subject_id, rank) index.
+
+    Returns None when there is nothing usable: no rows (new user or book,
+    job never run), or, for users, a rating event newer than the model the
+    rows were scored with.
+    """
+    rows = session.query(
+        Recommendation.book_id, Recommendation.score, RecommendationSet.event_seq
+    ).join(
+        RecommendationSet, RecommendationSet.model_version == Recommendation.model_version
+    ).filter(
+        RecommendationSet.active.is_(True),
+        Recommendation.kind == kind,
+        Recommendation.subject_id == subject_id
+    ).order_by(Recommendation.rank).limit(limit).all()
+
+    if not rows:
+        return None
+
+    if kind == 'user':
+        # Every rating write and delete appends an event, so compare sequence numbers
+        latest_seq = session.query(func.max(RatingEvent.seq)).filter(RatingEvent.user_id == subject_id).scalar()
+        if latest_seq is not None and latest_seq > rows[0].event_seq:
+            return None
+
+    return [(book_id, score) for book_id, score, _ in rows]
+
+
+def get_rating_events(session, after_seq: int = 0, limit: int = 1000) -> List[RatingEvent]:
+    """
+    Rating events with seq greater than after_seq, oldest first, at most
+    limit of them. Consumers remember the last seq they applied and pass it
+    back; an empty list means they are up to date.
+    """
+    return session.query(RatingEvent).filter(
+        RatingEvent.seq > after_seq
+    ).order_by(RatingEvent.seq).limit(limit).all()
+
+
+def latest_rating_event_seq(session) -> int:
+    """Sequence number of the newest rating event (0 if there are none)"""
+    return session.query(func.max(RatingEvent.seq)).scalar() or 0
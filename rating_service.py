@@ -0,0 +1,183 @@
+"""
+KJSIT Book Recommendation System - Rating Writes
+Single entry point for rating writes. A write upserts (or deletes) the
+rating, adjusts the book's exact rating sum, count and average in O(1) in
+the same transaction, keeps the analytics counters in step, appends a RatingEvent
+and bumps the ratings data version for other processes, and then pushes
+the change to the in-process recommendation engine.
+"""
+
+from typing import Dict, Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+
+from models import Book, Rating, RatingEvent, Review
+from analytics import record_rating_change
+from data_version import RATINGS, bump_data_version
+
+MIN_RATING = 1.0
+MAX_RATING = 5.0
+
+
+def _adjust_book_aggregates(session, book_id: int, count_delta: int, sum_delta: float):
+    """Move the book's rating sum and count by a delta in one UPDATE; returns the new average and count"""
+    # The sum is stored exactly, so the average never drifts from re-deriving it
+    new_sum = func.coalesce(Book.rating_sum, 0.0) + sum_delta
+    new_count = func.coalesce(Book.total_ratings, 0) + count_delta
+    session.query(Book).filter(Book.id == book_id).update({
+        Book.rating_sum: case((new_count > 0, new_sum), else_=0.0),
+        Book.average_rating: case((new_count > 0, new_sum / new_count), else_=0.0),
+        Book.total_ratings: new_count
+    }, synchronize_session=False)
+
+    return session.query(Book.average_rating, Book.total_ratings).filter(Book.id == book_id).one()
+
+
+def _record_event(session, user_id, book_id, rating, previous_rating, average_rating, total_ratings) -> RatingEvent:
+    """Append the change to the rating event log (flushed, so its seq is assigned)"""
+    event = RatingEvent(
+        user_id=user_id,
+        book_id=book_id,
+        rating=rating,
+        previous_rating=previous_rating,
+        average_rating=average_rating,
+        total_ratings=total_ratings
+    )
+    session.add(event)
+    session.flush()
+    return event
+
+
+def _write_rating(session, user_id, book_id, rating, review_text):
+    """Upsert the rating and its side effects and commit; returns (previous_rating, average, count, seq)"""
+    if session.query(Book.id).filter(Book.id == book_id).first() is None:
+        raise ValueError("Book not found")
+
+    existing = session.query(Rating).filter_by(user_id=user_id, book_id=book_id).first()
+    previous_rating = existing.rating if existing else None
+
+    if existing:
+        existing.rating = rating
+        # Re-stamp: the rating was given again now
+        existing.created_at = func.now()
+    else:
+        session.add(Rating(user_id=user_id, book_id=book_id, rating=rating))
+
+    average_rating, total_ratings = _adjust_book_aggregates(
+        session, book_id, 0 if existing else 1, rating - (previous_rating or 0.0)
+    )
+
+    record_rating_change(session, previous_rating, rating)
+    event = _record_event(session, user_id, book_id, rating, previous_rating, average_rating, total_ratings)
+    bump_data_version(session, RATINGS)
+
+    if review_text and review_text.strip():
+        session.add(Review(user_id=user_id, book_id=book_id, review_text=review_text.strip()))
+
+    session.commit()
+    return previous_rating, average_rating, total_ratings, event.seq
+
+
+def submit_rating(
+    session,
+    user_id: int,
+    book_id: int,
+    rating: float,
+    review_text: Optional[str] = None,
+    engine=None
+) -> Dict:
+    """
+    Create or update a user's rating for a book and commit it.
+
+    Args:
+        session: Database session (committed here; rolled back on failure)
+        user_id (int): Rating user
+        book_id (int): Rated book
+        rating (float): Rating between 1.0 and 5.0
+        review_text (str, optional): Review stored alongside the rating
+        engine (BookRecommendationEngine, optional): Engine to update in place
+
+    Returns:
+        dict: rating, previous_rating (None for a new rating), the book's
+        new average_rating and total_ratings, and the event's seq
+
+    Raises:
+        ValueError: If the rating is out of range or the book does not exist
+    """
+    rating = float(rating)
+    if not MIN_RATING <= rating <= MAX_RATING:
+        raise ValueError(f"Rating must be between {MIN_RATING} and {MAX_RATING}")
+
+    try:
+        try:
+            previous_rating, average_rating, total_ratings, seq = _write_rating(
+                session, user_id, book_id, rating, review_text
+            )
+        except IntegrityError:
+            # A concurrent first rating won the unique (user, book) insert: update it instead
+            session.rollback()
+            previous_rating, average_rating, total_ratings, seq = _write_rating(
+                session, user_id, book_id, rating, review_text
+            )
+    except Exception:
+        session.rollback()
+        raise
+
+    if engine is not None:
+        engine.apply_rating(user_id, book_id, rating, previous_rating, average_rating, total_ratings, seq=seq)
+
+    return {
+        'rating': rating,
+        'previous_rating': previous_rating,
+        'average_rating': average_rating,
+        'total_ratings': total_ratings,
+        'seq': seq
+    }
+
+
+def delete_rating(session, user_id: int, book_id: int, engine=None) -> Dict:
+    """
+    Delete a user's rating for a book and commit it. Reviews are kept.
+
+    Args:
+        session: Database session (committed here; rolled back on failure)
+        user_id (int): Rating user
+        book_id (int): Rated book
+        engine (BookRecommendationEngine, optional): Engine to update in place
+
+    Returns:
+        dict: previous_rating, the book's new average_rating and
+        total_ratings, and the event's seq
+
+    Raises:
+        ValueError: If the user has not rated the book
+    """
+    try:
+        existing = session.query(Rating).filter_by(user_id=user_id, book_id=book_id).first()
+        if existing is None:
+            raise ValueError("Rating not found")
+        previous_rating = existing.rating
+        session.delete(existing)
+
+        average_rating, total_ratings = _adjust_book_aggregates(session, book_id, -1, -previous_rating)
+
+        record_rating_change(session, previous_rating, None)
+        event = _record_event(session, user_id, book_id, None, previous_rating, average_rating, total_ratings)
+        bump_data_version(session, RATINGS)
+
+        seq = event.seq
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    if engine is not None:
+        engine.apply_rating(user_id, book_id, None, previous_rating, average_rating, total_ratings, seq=seq)
+
+    return {
+        'previous_rating': previous_rating,
+        'average_rating': average_rating,
+        'total_ratings': total_ratings,
+        'seq': seq
+    }
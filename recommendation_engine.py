@@ -3,28 +3,85 @@ import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.preprocessing import MinMaxScaler
+from scipy import sparse
 import logging
+import threading
 from typing import List, Dict, Tuple, Optional
 import os
-from models import Book, Rating, User, get_session
+from datetime import datetime
+from models import Book, Rating, RatingEvent, User, get_session
+from sqlalchemy import func
+from config import Config, GENRE_ALIASES, YEAR_ALIASES
+from metrics import metrics, timed
+from popularity import PopularityIndex
+from content_index import HashingContentIndex, top_k
+from pipeline import RecommendationPipeline
 from sqlalchemy.orm import joinedload
 
 class BookRecommendationEngine:
-    def __init__(self):
-        self.session = get_session()
+    def __init__(self, precision: Optional[str] = None, load: bool = True):
+        # Float width of the rating matrix, TF-IDF matrix and similarity scores
+        self.dtype = np.dtype(precision or Config.MODEL_PRECISION)
         self.books_df = None
+        self.ratings_df = None
         self.ratings_matrix = None
         self.user_similarity = None
         self.book_similarity = None
         self.tfidf_matrix = None
         self.tfidf_vectorizer = None
-        self.load_data()
+        # Used instead of the TF-IDF matrix when Config.CONTENT_INDEX == 'hashing'
+        self.content_index = None
+        # Per-user taste profiles: rating-weighted sums of content vectors (see _build_user_profiles)
+        self._profile_sums = None
+        self._profile_weights = None
+        self._profile_rows = {}
+        self._profile_overrides = {}
+        # content_index.weights_version the profiles were built with
+        self._profile_weights_version = None
+        self._book_positions = {}
+        # Top ITEM_NEIGHBOURS most similar ratings-matrix columns per column
+        self.item_neighbours = None
+        self.pipeline = RecommendationPipeline.default()
+        # (department, year) -> ranked [(book_id, score)] for users without ratings
+        self.cold_start_lists = {}
+        self._user_segments = {}
+        self.popularity_index = PopularityIndex(Config.MIN_RATINGS_THRESHOLD, 0.0)
+        # genre -> that genre's books in popularity order, and lowercase name/alias -> genre
+        self.genre_index = {}
+        self._genre_lookup = {}
+        # Search: sort option -> books in page order, and query -> (match mask, genre facets)
+        self._search_orders = {}
+        self._search_matches = {}
+        self._write_lock = threading.RLock()
+        self.model_version = None
+        # Seq of the last rating event reflected in the model (see catch_up)
+        self.event_seq = 0
+        # Set when the arrays are read-only views of a shared model (see model_store.py)
+        self.shared_model_path = None
+        # Manifest of the shared model version this engine was last attached to
+        self.shared_manifest = None
+        if load:
+            self.load_data()
+
+    @staticmethod
+    def new_model_version() -> str:
+        """
+        Identifies a build of the model (precomputed recommendation rows,
+        shared model versions); unique even for two builds in the same second
+        """
+        return f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{os.getpid()}"
 
-    def load_data(self):
-        """Load books and ratings data from database"""
+    @timed('engine.load_data', build=True)
+    def load_data(self) -> bool:
+        """Load books and ratings data from database; False if the build failed (and was logged)"""
+        # Short-lived: the engine keeps no connection or transaction open between builds
+        session = get_session()
         try:
+            # Read before the ratings: events committed meanwhile are replayed by catch_up
+            self.event_seq = session.query(func.max(RatingEvent.seq)).scalar() or 0
+
             # Load books with ratings
-            books = self.session.query(Book).options(
+            books = session.query(Book).options(
                 joinedload(Book.ratings)
             ).all()
 
@@ -43,10 +100,14 @@ class BookRecommendationEngine:
                     'total_ratings': book.total_ratings
                 })
 
-            self.books_df = pd.DataFrame(books_data)
+            self.books_df = self._compact_books_frame(pd.DataFrame(books_data))
+            self._book_positions = {
+                book_id: pos for pos, book_id in enumerate(self.books_df.get('book_id', []))
+            }
+            self._build_popularity_index()
 
             # Load ratings
-            ratings = self.session.query(Rating).all()
+            ratings = session.query(Rating).all()
             ratings_data = []
             for rating in ratings:
                 ratings_data.append({
@@ -56,6 +117,8 @@ class BookRecommendationEngine:
                 })
 
             self.ratings_df = pd.DataFrame(ratings_data)
+            if not self.ratings_df.empty:
+                self.ratings_df = self.ratings_df.astype({'user_id': 'int32', 'book_id': 'int32'})
 
             # Create user-item matrix (handle duplicate user-book pairs)
             if not self.ratings_df.empty:
@@ -64,74 +127,429 @@ class BookRecommendationEngine:
                     columns='book_id',
                     values='rating',
                     aggfunc='mean'
-                ).fillna(0)
+                ).fillna(0).astype(self.dtype)
 
                 # Calculate item similarity matrix
-                self.book_similarity = cosine_similarity(self.ratings_matrix.T)
-                self.book_similarity_df = pd.DataFrame(
-                    self.book_similarity,
-                    index=self.ratings_matrix.columns,
-                    columns=self.ratings_matrix.columns
-                )
+                self._build_item_similarity()
 
             # Setup content-based filtering
             self._setup_content_based_filtering()
+            self._build_user_profiles()
+            self._build_cold_start_lists()
+
+            self.model_version = self.new_model_version()
+            return True
 
         except Exception as e:
             logging.error(f"Error loading data: {e}")
+            metrics.record_error('engine.load_data')
             self.books_df = pd.DataFrame()
             self.ratings_df = pd.DataFrame()
+            return False
+        finally:
+            session.close()
+
+    # Repeated text (copies of a title, one template description per genre) is
+    # dictionary-encoded; accession numbers are unique, so they stay plain strings
+    CATEGORICAL_COLUMNS = ['title', 'author', 'genre', 'description']
+
+    @classmethod
+    def _compact_books_frame(cls, books_df: pd.DataFrame) -> pd.DataFrame:
+        """Categorical text columns and 32-bit ids/counts for the catalog frame"""
+        if books_df.empty:
+            return books_df
+
+        dtypes = {column: 'category' for column in cls.CATEGORICAL_COLUMNS}
+        dtypes.update(book_id='int32', total_ratings='int32')
+        return books_df.fillna({'total_ratings': 0}).astype(dtypes)
+
+    @timed('engine.build_popularity_index', build=True)
+    def _build_popularity_index(self):
+        """Rank rated books by damped average rating (see popularity.py)"""
+        self.popularity_index = PopularityIndex.build(self.books_df, Config.MIN_RATINGS_THRESHOLD)
+        self._build_genre_index()
+        # books_df was replaced, so search orders and matches are rebuilt on demand
+        self._search_orders = {}
+        self._search_matches = {}
+
+    def _build_genre_index(self):
+        """One pre-sorted partition per genre, ranked like the popular list (unrated books last)"""
+        self.genre_index = {}
+        if not self.books_df.empty:
+            for genre, books in self.books_df.groupby('genre', observed=True):
+                self.genre_index[str(genre)] = PopularityIndex.build(
+                    books, Config.MIN_RATINGS_THRESHOLD,
+                    prior_mean=self.popularity_index.prior_mean, include_unrated=True
+                )
+
+        self._genre_lookup = {genre.lower(): genre for genre in self.genre_index}
+        for alias, genre in GENRE_ALIASES.items():
+            if genre in self.genre_index:
+                self._genre_lookup.setdefault(alias.lower(), genre)
+
+    def resolve_genre(self, genre: str) -> Optional[str]:
+        """Catalog genre for a name or alias (case-insensitive), or None"""
+        return self._genre_lookup.get((genre or '').strip().lower())
+
+    @timed('engine.build_item_similarity', build=True)
+    def _build_item_similarity(self):
+        """Item-item cosine similarity over the ratings matrix columns"""
+        self.book_similarity = cosine_similarity(self.ratings_matrix.T)
+        # A labelled view over the same array, not a second copy
+        self.book_similarity_df = pd.DataFrame(
+            self.book_similarity,
+            index=self.ratings_matrix.columns,
+            columns=self.ratings_matrix.columns,
+            copy=False
+        )
+        self._build_item_neighbours()
+
+    # Neighbours kept per book for candidate generation (see pipeline.py)
+    ITEM_NEIGHBOURS = 50
 
+    def _top_neighbours(self, rows: np.ndarray, first_column: int) -> np.ndarray:
+        """Column indices of each similarity row's best neighbours, best first, excluding itself"""
+        rows = np.array(rows, dtype=np.float32)
+        rows[np.arange(len(rows)), np.arange(first_column, first_column + len(rows))] = -np.inf
+        k = min(self.ITEM_NEIGHBOURS, rows.shape[1] - 1)
+        if k <= 0:
+            return np.zeros((len(rows), 0), dtype=np.int32)
+        top = np.argpartition(-rows, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(rows, top, axis=1), axis=1, kind='stable')
+        return np.take_along_axis(top, order, axis=1).astype(np.int32)
+
+    @timed('engine.build_item_neighbours', build=True)
+    def _build_item_neighbours(self, chunk_size: int = 1024):
+        """Neighbour lists for every book, a chunk of similarity rows at a time"""
+        count = self.book_similarity.shape[0]
+        self.item_neighbours = np.zeros((count, min(self.ITEM_NEIGHBOURS, max(count - 1, 0))), dtype=np.int32)
+        for start in range(0, count, chunk_size):
+            self.item_neighbours[start:start + chunk_size] = self._top_neighbours(
+                self.book_similarity[start:start + chunk_size], start
+            )
+
+    @timed('engine.fit_tfidf', build=True)
     def _setup_content_based_filtering(self):
         """Setup TF-IDF vectorizer for content-based filtering"""
         if self.books_df.empty:
             return
 
-        # Combine title, author, genre, and description for content similarity
-        self.books_df['content'] = (
-            self.books_df['title'].fillna('') + ' ' +
-            self.books_df['author'].fillna('') + ' ' +
-            self.books_df['genre'].fillna('') + ' ' +
-            self.books_df['description'].fillna('')
+        # Combine title, author, genre, and description for content similarity.
+        # Only needed while fitting, so it is not kept on the frame.
+        content = (
+            self.books_df['title'].astype(str) + ' ' +
+            self.books_df['author'].astype(str) + ' ' +
+            self.books_df['genre'].astype(str) + ' ' +
+            self.books_df['description'].astype(str)
         )
 
+        if Config.CONTENT_INDEX == 'hashing':
+            self._sync_content_index(content)
+            return
+
         # Create TF-IDF matrix
         self.tfidf_vectorizer = TfidfVectorizer(
+            dtype=self.dtype,
             stop_words='english',
             max_features=5000,
             ngram_range=(1, 2)
         )
 
         try:
-            self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(
-                self.books_df['content']
-            )
+            self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(content)
         except ValueError:
             # Handle case where content is empty
             self.tfidf_matrix = None
 
-    def get_popular_books(self, limit: int = 10) -> List[Dict]:
-        """Get popular books based on ratings"""
+    def _sync_content_index(self, content: pd.Series):
+        """Build the hashing content index, or on reload vectorise only new and changed books"""
+        book_ids = self.books_df['book_id'].tolist()
+        if self.content_index is None:
+            self.content_index = HashingContentIndex.build(
+                book_ids, content.tolist(), n_features=Config.CONTENT_HASH_FEATURES, dtype=self.dtype
+            )
+        else:
+            changed, removed = self.content_index.sync(book_ids, content.tolist())
+            logging.info(f"Content index: {changed} books added or changed, {removed} removed")
+        self.content_index.start_background_reweight(Config.CONTENT_REWEIGHT_INTERVAL)
+
+    def _content_matrix(self) -> Tuple[Optional[sparse.csr_matrix], np.ndarray]:
+        """Content vectors of the active content model, with the book id of each row"""
+        if self.content_index is not None:
+            return self.content_index.matrix()
+        if self.tfidf_matrix is None:
+            return None, np.zeros(0, dtype=np.int64)
+        return self.tfidf_matrix, self.books_df['book_id'].to_numpy(dtype=np.int64)
+
+    def _content_vector(self, book_id: int):
+        """One book's content vector (1 x features), or None"""
+        if self.content_index is not None:
+            return self.content_index.vector(book_id)
+        pos = self._book_positions.get(book_id)
+        if self.tfidf_matrix is None or pos is None:
+            return None
+        return self.tfidf_matrix[pos:pos + 1]
+
+    def _score_content(self, query) -> Tuple[np.ndarray, np.ndarray]:
+        """Dot product of a query vector with every book's content vector, with the book ids"""
+        if self.content_index is not None:
+            return self.content_index.score(query)
+        scores = (self.tfidf_matrix @ query.T).toarray().ravel()
+        return scores, self.books_df['book_id'].to_numpy(dtype=np.int64)
+
+    @timed('engine.build_user_profiles', build=True)
+    def _build_user_profiles(self):
+        """
+        Every user's taste profile in one sparse product: the rating-weighted
+        sum of the content vectors of the books they rated, with the weight
+        totals kept alongside. Rebuilt when the content index re-weights,
+        since the sums are only valid under the weights they were built with.
+        """
+        weights_version = self.content_index.weights_version if self.content_index is not None else None
+        content, row_book_ids = self._content_matrix()
+        if content is None or self.ratings_df is None or self.ratings_df.empty:
+            self._profile_sums = self._profile_weights = None
+            self._profile_rows = {}
+            self._profile_overrides = {}
+            self._profile_weights_version = weights_version
+            return
+
+        rows = pd.Index(row_book_ids).get_indexer(self.ratings_df['book_id'])
+        rated = rows >= 0
+        users = pd.Index(self.ratings_df['user_id'].unique())
+        weights = sparse.csr_matrix(
+            (
+                self.ratings_df['rating'].to_numpy(dtype=np.float64)[rated],
+                (users.get_indexer(self.ratings_df['user_id'])[rated], rows[rated])
+            ),
+            shape=(len(users), content.shape[0])
+        )
+        # Swapped in together, so readers never see a half-built set
+        (self._profile_sums, self._profile_weights, self._profile_rows,
+         self._profile_overrides, self._profile_weights_version) = (
+            (weights @ content).astype(self.dtype).tocsr(),
+            np.asarray(weights.sum(axis=1)).ravel(),
+            {user_id: row for row, user_id in enumerate(users.tolist())},
+            {},
+            weights_version
+        )
+
+    def _profiles_stale(self) -> bool:
+        """True when the content index has re-weighted since the profiles were built"""
+        return (
+            self.content_index is not None and
+            self.content_index.weights_version != self._profile_weights_version
+        )
+
+    def user_profile(self, user_id: int):
+        """The user's L2-normalised taste profile (1 x features), or None without rated content"""
+        if self._profiles_stale():
+            with self._write_lock:
+                if self._profiles_stale():
+                    self._build_user_profiles()
+
+        override = self._profile_overrides.get(user_id)
+        if override is not None:
+            profile = override[0]
+        elif user_id in self._profile_rows:
+            profile = self._profile_sums[self._profile_rows[user_id]]
+        else:
+            return None
+
+        # The mean is the sum over the weight total; cosine scoring only needs its direction
+        norm = np.sqrt(profile.multiply(profile).sum())
+        return profile / norm if norm > 0 else None
+
+    def _update_user_profile(self, user_id: int, book_id: int, rating: float, previous_rating: Optional[float]):
+        """Move one user's profile by a rating change, in O(book vector size)"""
+        if self._profiles_stale():
+            # ratings_df already holds this change, so the rebuild includes it
+            self._build_user_profiles()
+            return
+
+        vector = self._content_vector(book_id)
+        if vector is None:
+            return
+
+        if user_id in self._profile_overrides:
+            profile, weight = self._profile_overrides[user_id]
+        elif user_id in self._profile_rows:
+            row = self._profile_rows[user_id]
+            profile, weight = self._profile_sums[row], float(self._profile_weights[row])
+        else:
+            profile, weight = sparse.csr_matrix(vector.shape, dtype=self.dtype), 0.0
+
+        delta = rating - (previous_rating or 0.0)
+        self._profile_overrides[user_id] = ((profile + delta * vector).astype(self.dtype).tocsr(), weight + delta)
+
+    def user_rated_books(self, user_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(book ids, ratings) of the books the user rated, from the user-item matrix"""
+        if self.ratings_matrix is None or user_id not in self.ratings_matrix.index:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        row = self.ratings_matrix.to_numpy()[self.ratings_matrix.index.get_loc(user_id)]
+        rated = np.flatnonzero(row > 0)
+        return self.ratings_matrix.columns.to_numpy()[rated], row[rated]
+
+    def profile_scores(self, user_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Profile similarity of every book (rated books -inf), with the book ids; empty without a profile"""
+        profile = self.user_profile(user_id)
+        if profile is None:
+            return np.zeros(0), np.zeros(0, dtype=np.int64)
+
+        scores, book_ids = self._score_content(profile)
+        scores[np.isin(book_ids, self.user_rated_books(user_id)[0])] = -np.inf
+        return scores, book_ids
+
+    def _content_vectors(self, book_ids: List[int]):
+        """Content vectors of several books, one row each (zero rows for unknown books)"""
+        if self.content_index is not None:
+            return self.content_index.vectors(book_ids)
+        positions = [self._book_positions.get(book_id, -1) for book_id in book_ids]
+        known = np.array([pos >= 0 for pos in positions], dtype=bool)
+        rows = self.tfidf_matrix[[pos if pos >= 0 else 0 for pos in positions]]
+        return sparse.diags(known.astype(rows.dtype)) @ rows
+
+    @timed('engine.get_profile_recommendations')
+    def get_profile_recommendations(self, user_id: int, limit: int = 10) -> List[Dict]:
+        """Unrated books closest to the user's taste profile (one sparse product over the catalog)"""
+        scores, book_ids = self.profile_scores(user_id)
+        top = top_k(scores, limit)
+        recommendations = self.get_books(book_ids[top].tolist())
+        for book_dict, idx in zip(recommendations, top):
+            book_dict['similarity_score'] = float(scores[idx])
+        return recommendations
+
+    # Books kept per cold-start list, and the lift (on the 5-point scale)
+    # for books in the department's own genre
+    COLD_START_LIST_SIZE = 50
+    DEPARTMENT_GENRE_BOOST = 0.5
+
+    def _department_key(self, department: Optional[str]) -> Optional[str]:
+        """Segment key for a department: the catalog genre it maps to, if any"""
+        if not department:
+            return None
+        return self.resolve_genre(department) or str(department).strip().lower()
+
+    @staticmethod
+    def _year_key(year: Optional[str]) -> Optional[str]:
+        if not year:
+            return None
+        year = str(year).strip().upper()
+        return YEAR_ALIASES.get(year, year)
+
+    @timed('engine.build_cold_start_lists', build=True)
+    def _build_cold_start_lists(self):
+        """
+        Ranked first-page lists per department x year, per department and
+        overall, for users who have not rated anything yet.
+        """
+        self.cold_start_lists = {}
+        self._user_segments = {}
         if self.books_df.empty:
+            return
+
+        session = get_session()
+        try:
+            users = session.query(User.id, User.department, User.year).all()
+        finally:
+            session.close()
+        self._user_segments = {
+            user.id: (self._department_key(user.department), self._year_key(user.year)) for user in users
+        }
+
+        peer_ratings = pd.DataFrame(columns=['book_id', 'rating', 'department', 'year'])
+        if self._user_segments and self.ratings_df is not None and not self.ratings_df.empty:
+            segments = pd.DataFrame(
+                [(user_id, department, year) for user_id, (department, year) in self._user_segments.items()],
+                columns=['user_id', 'department', 'year']
+            )
+            peer_ratings = self.ratings_df.merge(segments, on='user_id')
+
+        departments = set(self.genre_index) | {department for department, _ in self._user_segments.values() if department}
+        for department in departments:
+            department_ratings = peer_ratings[peer_ratings['department'] == department]
+            self.cold_start_lists[(department, None)] = self._rank_segment(department, department_ratings)
+            for year, year_ratings in department_ratings.groupby('year'):
+                self.cold_start_lists[(department, year)] = self._rank_segment(department, year_ratings)
+        self.cold_start_lists[(None, None)] = self._rank_segment(None, peer_ratings.iloc[:0])
+
+    def _rank_segment(self, department: Optional[str], ratings: pd.DataFrame) -> List[Tuple[int, float]]:
+        """
+        Score the books a segment's peers rated, plus the heads of the
+        department genre and popularity lists: peers' average rating damped
+        toward the book's catalog-wide popularity score, with a lift for the
+        department's own genre.
+        """
+        size = self.COLD_START_LIST_SIZE
+        pool = set(ratings['book_id'].tolist())
+        partition = self.genre_index.get(department)
+        if partition is not None:
+            pool.update(book_id for book_id, _ in partition.top(size))
+        pool.update(book_id for book_id, _ in self.popularity_index.top(size))
+        book_ids = np.array(sorted(b for b in pool if b in self._book_positions), dtype=np.int64)
+        if not len(book_ids):
             return []
 
-        popular_books = self.books_df[
-            self.books_df['total_ratings'] > 0
-        ].sort_values('average_rating', ascending=False).head(limit)
+        stats = ratings.groupby('book_id')['rating'].agg(['count', 'mean'])
+        counts = stats['count'].reindex(book_ids).fillna(0).to_numpy(dtype=np.float64)
+        means = stats['mean'].reindex(book_ids).fillna(0).to_numpy(dtype=np.float64)
+        priors = np.array([
+            self.popularity_index.score(book_id) or self.popularity_index.prior_mean for book_id in book_ids.tolist()
+        ])
+        m = max(Config.MIN_RATINGS_THRESHOLD, 1)
+        scores = (counts * means + m * priors) / (counts + m)
+
+        if partition is not None:
+            genres = self.books_df['genre'].iloc[[self._book_positions[b] for b in book_ids.tolist()]].astype(str)
+            scores += self.DEPARTMENT_GENRE_BOOST * (genres.to_numpy() == department)
+
+        order = np.argsort(-scores, kind='stable')[:size]
+        return [(int(book_ids[i]), float(scores[i])) for i in order]
 
-        return popular_books.to_dict('records')
+    @timed('engine.get_cold_start_recommendations')
+    def get_cold_start_recommendations(
+        self,
+        department: Optional[str] = None,
+        year: Optional[str] = None,
+        limit: int = 10
+    ) -> List[Dict]:
+        """First-page recommendations for a student with no ratings, from their department x year segment"""
+        department, year = self._department_key(department), self._year_key(year)
+        ranked = (
+            self.cold_start_lists.get((department, year)) or
+            self.cold_start_lists.get((department, None)) or
+            self.cold_start_lists.get((None, None), [])
+        )[:limit]
 
-    def get_books_by_genre(self, genre: str, limit: int = 10) -> List[Dict]:
-        """Get books by specific genre"""
+        recommendations = self.get_books([book_id for book_id, _ in ranked])
+        for book_dict, (_, score) in zip(recommendations, ranked):
+            book_dict['score'] = score
+            book_dict['sources'] = ['cold_start']
+        return recommendations
+
+    @timed('engine.get_popular_books')
+    def get_popular_books(self, limit: int = 10) -> List[Dict]:
+        """Get popular books, ranked by damped average rating"""
         if self.books_df.empty:
             return []
 
-        genre_books = self.books_df[
-            self.books_df['genre'].str.contains(genre, case=False, na=False)
-        ].sort_values('average_rating', ascending=False).head(limit)
+        top = self.popularity_index.top(limit)
+        popular_books = self.get_books([book_id for book_id, _ in top])
+        for book, (_, score) in zip(popular_books, top):
+            book['popularity_score'] = score
 
-        return genre_books.to_dict('records')
+        return popular_books
 
+    @timed('engine.get_books_by_genre')
+    def get_books_by_genre(self, genre: str, limit: int = 10, offset: int = 0) -> List[Dict]:
+        """Get a page of books in a genre (name or alias), most popular first"""
+        partition = self.genre_index.get(self.resolve_genre(genre))
+        if partition is None:
+            return []
+
+        return self.get_books([book_id for book_id, _ in partition.top(limit, offset)])
+
+    @timed('engine.get_collaborative_filtering_recommendations')
     def get_collaborative_filtering_recommendations(
         self,
         user_id: int,
@@ -170,12 +588,20 @@ class BookRecommendationEngine:
 
         return recommended_books
 
+    @timed('engine.get_content_based_recommendations')
     def get_content_based_recommendations(
         self,
         book_id: int,
         limit: int = 10
     ) -> List[Dict]:
         """Get content-based recommendations"""
+        if self.content_index is not None:
+            similar = self.content_index.similar(book_id, limit)
+            recommendations = self.get_books([similar_id for similar_id, _ in similar])
+            for book_dict, (_, score) in zip(recommendations, similar):
+                book_dict['similarity_score'] = score
+            return recommendations
+
         if self.tfidf_matrix is None or book_id not in self.books_df['book_id'].values:
             return []
 
@@ -203,29 +629,41 @@ class BookRecommendationEngine:
 
         return []
 
+    @timed('engine.get_hybrid_recommendations')
     def get_hybrid_recommendations(
         self,
         user_id: int,
-        limit: int = 10
+        limit: int = 10,
+        department: Optional[str] = None,
+        year: Optional[str] = None
     ) -> List[Dict]:
-        """Get hybrid recommendations combining collaborative and content-based"""
+        """
+        Get hybrid recommendations combining collaborative and content-based.
+        Users without ratings get their department x year cold-start list;
+        department and year are taken from the model build when not given
+        (pass them for students registered since).
+        """
+        if not len(self.user_rated_books(user_id)[0]):
+            segment = self._user_segments.get(user_id, (None, None))
+            department, year = department or segment[0], year or segment[1]
+            if department is None and year is None:
+                return []
+            return self.get_cold_start_recommendations(department, year, limit)
+
         # Return early if no ratings available
         if self.ratings_df is None or self.ratings_df.empty:
             return []
 
+        if Config.RECOMMENDATION_PIPELINE == 'two_stage':
+            return self.pipeline.recommend(self, user_id, limit)
+
         # Get collaborative filtering recommendations
         cf_recommendations = self.get_collaborative_filtering_recommendations(
             user_id, limit * 2
         )
 
-        # Get content-based recommendations for user's highly rated books
-        user_ratings = self.ratings_df[self.ratings_df['user_id'] == user_id]
-        high_rated_books = user_ratings[user_ratings['rating'] >= 4.0]['book_id'].tolist()
-
-        content_recommendations = []
-        for book_id in high_rated_books[:3]:  # Use top 3 highly rated books
-            content_recs = self.get_content_based_recommendations(book_id, limit // 3)
-            content_recommendations.extend(content_recs)
+        # Get content-based recommendations from the user's taste profile
+        content_recommendations = self.get_profile_recommendations(user_id, limit)
 
         # Combine and deduplicate
         all_recommendations = {}
@@ -243,21 +681,138 @@ class BookRecommendationEngine:
 
         return sorted_recommendations[:limit]
 
+    # Sort options for search_books_page: column and direction
+    SEARCH_SORT_KEYS = {
+        'rating': ('average_rating', False),
+        'title': ('title', True),
+        'author': ('author', True),
+        'price_asc': ('price', True),
+        'price_desc': ('price', False)
+    }
+
+    # Queries whose match masks are kept between pages
+    SEARCH_CACHE_SIZE = 64
+
+    def _search_order(self, sort: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (sort keys, book ids, frame positions) of every book, in ascending
+        (sort key, book_id) order; descending numbers are negated. Built once
+        per sort option and catalog (the rating order also after rating writes).
+        """
+        order = self._search_orders.get(sort)
+        if order is not None:
+            return order
+
+        column, ascending = self.SEARCH_SORT_KEYS[sort]
+        sort_key = self.books_df[column]
+        if column in ('price', 'average_rating'):
+            sort_key = sort_key.fillna(0).astype(np.float64)
+        elif isinstance(sort_key.dtype, pd.CategoricalDtype):
+            # The cursor compares raw values, so sort on the strings
+            sort_key = sort_key.astype(str)
+        if not ascending:
+            sort_key = -sort_key
+
+        frame = pd.DataFrame({'key': sort_key.to_numpy(), 'book_id': self.books_df['book_id'].to_numpy()})
+        positions = frame.sort_values(['key', 'book_id'], kind='stable').index.to_numpy()
+        order = (frame['key'].to_numpy()[positions], frame['book_id'].to_numpy()[positions], positions)
+        self._search_orders[sort] = order
+        return order
+
+    def _search_match(self, query: str) -> Tuple[np.ndarray, Dict]:
+        """Frame-order match mask and genre facets of a query, kept for the next pages"""
+        cache_key = query.casefold()
+        match = self._search_matches.get(cache_key)
+        if match is None:
+            mask = self._search_mask(query).to_numpy()
+            genres = self.books_df['genre'][mask]
+            facets = genres[genres != ''].value_counts()
+            match = (mask, facets[facets > 0].to_dict())
+            if len(self._search_matches) >= self.SEARCH_CACHE_SIZE:
+                self._search_matches.pop(next(iter(self._search_matches)))
+            self._search_matches[cache_key] = match
+        return match
+
+    def _search_mask(self, query: str) -> pd.Series:
+        """Rows whose title, author or genre contains the query (plain text, not a regex)"""
+        return (
+            self.books_df['title'].str.contains(query, case=False, na=False, regex=False) |
+            self.books_df['author'].str.contains(query, case=False, na=False, regex=False) |
+            self.books_df['genre'].str.contains(query, case=False, na=False, regex=False)
+        )
+
+    @timed('engine.search_books')
     def search_books(self, query: str, limit: int = 10) -> List[Dict]:
         """Search books by title, author, or genre"""
         if self.books_df.empty:
             return []
 
         # Simple text search
-        mask = (
-            self.books_df['title'].str.contains(query, case=False, na=False) |
-            self.books_df['author'].str.contains(query, case=False, na=False) |
-            self.books_df['genre'].str.contains(query, case=False, na=False)
-        )
+        mask = self._search_mask(query)
 
         results = self.books_df[mask].sort_values('average_rating', ascending=False).head(limit)
         return results.to_dict('records')
 
+    @timed('engine.search_books_page')
+    def search_books_page(
+        self,
+        query: str,
+        page_size: int = 10,
+        cursor: Optional[Tuple] = None,
+        genre: Optional[str] = None,
+        min_rating: Optional[float] = None,
+        sort: str = 'rating'
+    ) -> Dict:
+        """
+        Search with server-side filters, sorting and keyset pagination.
+
+        cursor is the previous page's 'next_cursor' (sort key, book_id of its
+        last row). Returns the page 'items', the 'total' after filters, genre
+        'facets' (counts over all matches of the query) and 'next_cursor'.
+        """
+        page = {'items': [], 'total': 0, 'facets': {}, 'next_cursor': None}
+        if self.books_df.empty or not query:
+            return page
+
+        mask, page['facets'] = self._search_match(query)
+        selected = mask
+        if genre:
+            selected = selected & (self.books_df['genre'] == genre).to_numpy()
+        if min_rating is not None:
+            selected = selected & (self.books_df['average_rating'] >= min_rating).to_numpy()
+        page['total'] = int(selected.sum())
+
+        keys, book_ids, positions = self._search_order(sort if sort in self.SEARCH_SORT_KEYS else 'rating')
+        start = 0
+        if cursor is not None:
+            # First row after (key, book_id): binary search the key, then the book ids among its ties
+            key, book_id = cursor
+            low, high = np.searchsorted(keys, key, 'left'), np.searchsorted(keys, key, 'right')
+            start = int(low + np.searchsorted(book_ids[low:high], book_id, 'right'))
+
+        # Walk the pre-sorted order from the cursor until one row past a full page has matched
+        hits, chunk = [], max(4 * page_size, 256)
+        while start < len(positions) and len(hits) <= page_size:
+            window = np.arange(start, min(start + chunk, len(positions)))
+            hits.extend(window[selected[positions[window]]].tolist())
+            start, chunk = window[-1] + 1, chunk * 2
+
+        rows = hits[:page_size]
+        if len(hits) > page_size:
+            last = rows[-1]
+            key = keys[last]
+            page['next_cursor'] = (key.item() if hasattr(key, 'item') else key, int(book_ids[last]))
+
+        page['items'] = self.books_df.iloc[positions[rows]].to_dict('records')
+        return page
+
+    @timed('engine.get_books')
+    def get_books(self, book_ids: List[int]) -> List[Dict]:
+        """Book records for the given ids, in the same order (unknown ids are skipped)"""
+        positions = [self._book_positions[b] for b in book_ids if b in self._book_positions]
+        return self.books_df.iloc[positions].to_dict('records')
+
+    @timed('engine.get_book_details')
     def get_book_details(self, book_id: int) -> Optional[Dict]:
         """Get detailed information about a specific book"""
         book_data = self.books_df[self.books_df['book_id'] == book_id]
@@ -273,9 +828,230 @@ class BookRecommendationEngine:
 
         return book_dict
 
+    def _ensure_private_model(self):
+        """Copy-on-write: take private copies of shared read-only arrays before mutating them"""
+        if self.shared_model_path is None:
+            return
+
+        if self.ratings_matrix is not None:
+            self.ratings_matrix = self.ratings_matrix.copy(deep=True)
+        if self.book_similarity is not None:
+            self.book_similarity = np.array(self.book_similarity)
+            self.book_similarity_df = pd.DataFrame(
+                self.book_similarity,
+                index=self.ratings_matrix.columns,
+                columns=self.ratings_matrix.columns,
+                copy=False
+            )
+        if self.item_neighbours is not None:
+            self.item_neighbours = np.array(self.item_neighbours)
+        # tfidf_matrix is never written after the build, so it stays shared
+        self.shared_model_path = None
+
+    def _model_rating(self, user_id: int, book_id: int) -> Optional[float]:
+        """The user's rating of the book as the model currently holds it (None if unrated)"""
+        matrix = self.ratings_matrix
+        if matrix is None or user_id not in matrix.index or book_id not in matrix.columns:
+            return None
+        value = float(matrix.at[user_id, book_id])
+        return value if value > 0 else None
+
+    @timed('engine.apply_rating')
+    def apply_rating(
+        self,
+        user_id: int,
+        book_id: int,
+        rating: Optional[float],
+        previous_rating: Optional[float] = None,
+        average_rating: Optional[float] = None,
+        total_ratings: Optional[int] = None,
+        seq: Optional[int] = None
+    ):
+        """
+        Apply a committed rating write in place, without reloading. A rating
+        of None removes the user's rating. The change is measured against
+        the model's own copy of the rating rather than previous_rating, so
+        applying the same write twice is harmless. average_rating and
+        total_ratings are the book's new aggregates as stored in the
+        database, and seq the write's rating event (advances event_seq when
+        it is the next one).
+        """
+        with self._write_lock:
+            self._ensure_private_model()
+            previous_rating = self._model_rating(user_id, book_id)
+
+            if rating is None:
+                self._remove_rating(user_id, book_id, previous_rating)
+            else:
+                self._set_rating(user_id, book_id, rating, previous_rating)
+
+            # Book aggregates shown in popular lists and details
+            pos = self._book_positions.get(book_id)
+            if pos is not None:
+                if total_ratings is None:
+                    old_total = int(self.books_df.at[pos, 'total_ratings'] or 0)
+                    old_average = float(self.books_df.at[pos, 'average_rating'] or 0.0)
+                    total_ratings = old_total + (rating is not None) - (previous_rating is not None)
+                    rating_sum = old_average * old_total + (rating or 0.0) - (previous_rating or 0.0)
+                    average_rating = rating_sum / total_ratings if total_ratings > 0 else 0.0
+                self.books_df.at[pos, 'average_rating'] = average_rating
+                self.books_df.at[pos, 'total_ratings'] = total_ratings
+                self._search_orders.pop('rating', None)
+                self.popularity_index.update(book_id, average_rating, total_ratings)
+                partition = self.genre_index.get(str(self.books_df.at[pos, 'genre']))
+                if partition is not None:
+                    partition.update(book_id, average_rating, total_ratings)
+
+            if seq is not None and seq == self.event_seq + 1:
+                self.event_seq = seq
+
+    def _set_rating(self, user_id: int, book_id: int, rating: float, previous_rating: Optional[float]):
+        # Ratings list
+        new_row = pd.DataFrame([{'user_id': user_id, 'book_id': book_id, 'rating': rating}]).astype(
+            {'user_id': 'int32', 'book_id': 'int32'}
+        )
+        if self.ratings_df is None or self.ratings_df.empty:
+            self.ratings_df = new_row
+        else:
+            existing = (self.ratings_df['user_id'] == user_id) & (self.ratings_df['book_id'] == book_id)
+            if existing.any():
+                self.ratings_df.loc[existing, 'rating'] = rating
+            else:
+                self.ratings_df = pd.concat([self.ratings_df, new_row], ignore_index=True)
+
+        # User-item matrix (add the user row / book column if they are new)
+        if self.ratings_matrix is None:
+            self.ratings_matrix = pd.DataFrame(0.0, index=[user_id], columns=[book_id], dtype=self.dtype)
+        if user_id not in self.ratings_matrix.index:
+            self.ratings_matrix.loc[user_id] = 0.0
+        new_book = book_id not in self.ratings_matrix.columns
+        if new_book:
+            self.ratings_matrix[book_id] = 0.0
+        self.ratings_matrix.loc[user_id, book_id] = rating
+        if (self.ratings_matrix.dtypes != self.dtype).any():
+            # Enlarging can upcast; keep the configured precision
+            self.ratings_matrix = self.ratings_matrix.astype(self.dtype)
+
+        if new_book or self.book_similarity is None:
+            self._build_item_similarity()
+        else:
+            self._update_book_similarity(book_id)
+
+        self._update_user_profile(user_id, book_id, rating, previous_rating)
+
+    def _remove_rating(self, user_id: int, book_id: int, previous_rating: Optional[float]):
+        if previous_rating is None:
+            return
+
+        if self.ratings_df is not None and not self.ratings_df.empty:
+            existing = (self.ratings_df['user_id'] == user_id) & (self.ratings_df['book_id'] == book_id)
+            self.ratings_df = self.ratings_df[~existing].reset_index(drop=True)
+
+        # The user row and book column stay (as zeros) until the next build
+        self.ratings_matrix.loc[user_id, book_id] = 0.0
+        self._update_book_similarity(book_id)
+        self._update_user_profile(user_id, book_id, 0.0, previous_rating)
+
+    def _update_book_similarity(self, book_id: int):
+        """Only this book's column changed, so only its similarities move"""
+        column = self.ratings_matrix.columns.get_loc(book_id)
+        scores = cosine_similarity(
+            self.ratings_matrix.iloc[:, [column]].T, self.ratings_matrix.T
+        )[0]
+        # book_similarity_df is a view of this array, so it follows
+        self.book_similarity[column, :] = scores
+        self.book_similarity[:, column] = scores
+        # Other books' lists are refreshed with the next build
+        self.item_neighbours[column] = self._top_neighbours(scores[np.newaxis, :], column)[0]
+
+    @timed('engine.catch_up')
+    def catch_up(self, batch_size: int = 1000) -> int:
+        """
+        Apply the rating events committed after event_seq, including writes
+        made by other processes, in log order. Returns how many were applied.
+        An engine attached to a shared model also moves to newer published
+        versions, and republishes once it is far ahead (see model_store.py).
+        """
+        if self.shared_manifest is not None:
+            from model_store import sync_shared_model
+            return sync_shared_model(self, batch_size=batch_size)
+        return self.replay_events(batch_size)
+
+    def replay_events(self, batch_size: int = 1000) -> int:
+        """Apply the rating events after event_seq in log order; returns how many were applied"""
+        from queries import get_rating_events
+
+        applied = 0
+        session = get_session()
+        try:
+            while True:
+                events = get_rating_events(session, self.event_seq, batch_size)
+                if not events:
+                    break
+                for event in events:
+                    with self._write_lock:
+                        self.apply_rating(
+                            event.user_id, event.book_id, event.rating, event.previous_rating,
+                            event.average_rating, event.total_ratings
+                        )
+                        self.event_seq = event.seq
+                applied += len(events)
+        finally:
+            session.close()
+        return applied
+
+    def memory_report(self) -> Dict:
+        """Approximate bytes held by each model structure (deep, including strings)"""
+        report = {}
+        if self.books_df is not None:
+            report['books_df'] = int(self.books_df.memory_usage(deep=True).sum())
+            report['books_df_columns'] = {
+                column: int(size) for column, size in self.books_df.memory_usage(deep=True).items()
+            }
+        if self.ratings_df is not None:
+            report['ratings_df'] = int(self.ratings_df.memory_usage(deep=True).sum())
+        if self.ratings_matrix is not None:
+            report['ratings_matrix'] = int(self.ratings_matrix.memory_usage(deep=True).sum())
+        if self.book_similarity is not None:
+            report['book_similarity'] = int(self.book_similarity.nbytes)
+        if self.tfidf_matrix is not None:
+            report['tfidf_matrix'] = int(
+                self.tfidf_matrix.data.nbytes + self.tfidf_matrix.indices.nbytes +
+                self.tfidf_matrix.indptr.nbytes
+            )
+        if self.content_index is not None:
+            report['content_index'] = self.content_index.memory_bytes()
+        if self._profile_sums is not None:
+            report['user_profiles'] = int(
+                self._profile_sums.data.nbytes + self._profile_sums.indices.nbytes +
+                self._profile_sums.indptr.nbytes + self._profile_weights.nbytes
+            )
+        report['total'] = sum(size for name, size in report.items() if name != 'books_df_columns')
+        return report
+
+    @timed('engine.refresh_data')
     def refresh_data(self):
         """Refresh data from database"""
+        self.shared_model_path = None
+        self.shared_manifest = None
         self.load_data()
 
-# Global recommendation engine instance
-recommendation_engine = BookRecommendationEngine()
+def create_recommendation_engine() -> BookRecommendationEngine:
+    """
+    A ready engine: attached to this host's shared model when
+    SHARED_MODEL_DIR is set, otherwise built in this process.
+    """
+    if Config.SHARED_MODEL_DIR:
+        from model_store import load_shared_engine
+        return load_shared_engine(Config.SHARED_MODEL_DIR)
+    return BookRecommendationEngine()
+
+# Process-wide recommendation engine, built on first use
+_recommendation_engine = None
+
+def get_recommendation_engine() -> BookRecommendationEngine:
+    """Return the shared engine instance, loading it on first call"""
+    global _recommendation_engine
+    if _recommendation_engine is None:
+        _recommendation_engine = create_recommendation_engine()
+    return _recommendation_engine
@@ -48,6 +48,26 @@ def initialize_database():
         print(f"❌ Error initializing database: {e}")
         return False
 
+def ingest_library_workbooks(sources, workers=None):
+    """Load one or more Book Bank workbooks into the database"""
+    try:
+        from ingest import ingest_workbooks
+        reports = ingest_workbooks(sources, workers)
+        return bool(reports) and not any(report['error'] for report in reports)
+    except Exception as e:
+        print(f"❌ Error ingesting workbooks: {e}")
+        return False
+
+def precompute_recommendations(workers=None):
+    """Materialise recommendations for every user and book"""
+    try:
+        from precompute import precompute_recommendations as run_precompute
+        run_precompute(workers)
+        return True
+    except Exception as e:
+        print(f"❌ Error precomputing recommendations: {e}")
+        return False
+
 def start_application(port=8501):
     """Start the Streamlit application"""
     print(f"🚀 Starting application on port {port}...")
@@ -66,6 +86,16 @@ def start_application(port=8501):
     except Exception as e:
         print(f"❌ Error starting application: {e}")
 
+def start_api_server(port=None, workers=None):
+    """Start the JSON recommendation API"""
+    try:
+        from api_server import serve
+        serve(port, workers)
+    except KeyboardInterrupt:
+        print("\n👋 API server stopped by user")
+    except Exception as e:
+        print(f"❌ Error starting API server: {e}")
+
 def reset_database():
     """Reset database (remove and recreate)"""
     db_path = "books_recommendation.db"
@@ -85,6 +115,16 @@ def main():
                        help='Reset database before starting')
     parser.add_argument('--init-only', '-i', action='store_true',
                        help='Only initialize database, don\'t start app')
+    parser.add_argument('--ingest', nargs='+', metavar='PATH',
+                       help='Ingest workbooks (files, directories or globs) and exit')
+    parser.add_argument('--precompute', action='store_true',
+                       help='Precompute recommendations for every user and book and exit')
+    parser.add_argument('--api', action='store_true',
+                       help='Start the JSON API instead of the Streamlit app')
+    parser.add_argument('--api-port', type=int, default=None,
+                       help='Port for the JSON API (default: API_PORT, 5000)')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                       help='Worker processes for ingestion, precompute or the API (default: one per CPU core)')
 
     args = parser.parse_args()
 
@@ -94,6 +134,18 @@ def main():
     if not check_requirements():
         sys.exit(1)
 
+    # Ingest workbooks and exit
+    if args.ingest:
+        if not ingest_library_workbooks(args.ingest, args.workers):
+            sys.exit(1)
+        return
+
+    # Precompute recommendations and exit
+    if args.precompute:
+        if not precompute_recommendations(args.workers):
+            sys.exit(1)
+        return
+
     # Reset database if requested
     if args.reset:
         if not reset_database():
@@ -112,8 +164,11 @@ def main():
         print("✅ Database initialized. Exiting...")
         return
 
-    # Start application
-    start_application(args.port)
+    # Start the API or the application
+    if args.api:
+        start_api_server(args.api_port, args.workers)
+    else:
+        start_application(args.port)
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,8 @@
-import pandas as pd
 from models import get_session, Book, User, Rating, Review, create_tables
-from recommendation_engine import recommendation_engine
+from ingest import book_record_from_row, clean_sheet
+from data_loader import read_library_workbook
+from analytics import rebuild_analytics_summary
+from data_version import CATALOG, USERS, bump_data_version
 import random
 from datetime import datetime, timedelta
 import hashlib
@@ -20,12 +22,6 @@ def map_branch_to_department(branch):
     }
     return branch_mapping.get(branch, 'Computer Science')
 
-def generate_isbn(accession_number):
-    """Generate a pseudo-ISBN from accession number"""
-    # Create a deterministic ISBN-like string from accession number
-    base = accession_number.replace('CB', '').zfill(6)
-    return f"978-0-{base[:3]}-{base[3:6]}-{base[-1]}"
-
 def seed_kjsit_data():
     """Seed the database with real KJSIT Library Book Bank data"""
     session = get_session()
@@ -37,16 +33,12 @@ def seed_kjsit_data():
         print("📚 Loading KJSIT Library Book Bank data...")
 
         # Load the Excel file
-        df = pd.read_excel('KJSIT Library Book Bank data.xlsx', header=1)
+        df = read_library_workbook('KJSIT Library Book Bank data.xlsx', sheet_name='Sheet1', header=1)
 
         print(f"📊 Loaded {len(df)} books from KJSIT Library")
 
         # Clean and prepare data
-        df = df.dropna(subset=['Title', 'Author'])  # Remove rows without title or author
-        df['Title'] = df['Title'].str.strip()
-        df['Author'] = df['Author'].str.strip()
-        df['Publisher'] = df['Publisher'].str.strip()
-        df['Branch'] = df['Branch'].str.strip()
+        df = clean_sheet(df)  # Remove rows without title or author, strip text
 
         # NOTE: We're keeping all books including duplicates/editions
         # Each accession number represents a unique copy/edition
@@ -55,38 +47,8 @@ def seed_kjsit_data():
         # Add ALL books to database (including duplicates/editions)
         # Each accession number represents a unique copy/edition
         books_added = 0
-        for _, row in df.iterrows():
-            # Generate ISBN from accession number
-            isbn = generate_isbn(str(row['Accession number']))
-
-            # Map branch to genre
-            branch = str(row['Branch'])
-            genre_mapping = {
-                'BASIC SCIENCE AND HUMANITIES': 'Engineering Physics',
-                'COMPUTER': 'Computer Science',
-                'INFORMATION TECHNOLOGY': 'Information Technology',
-                'ELECTRONICS': 'Electronics',
-                'ELECTRONICS AND TELECOMMUNICATIONS': 'Electronics and Telecommunications'
-            }
-            genre = genre_mapping.get(branch, 'General')
-
-            # Create book record (we're keeping ALL books now)
-            book = Book(
-                isbn=isbn,
-                accession_number=str(row['Accession number']),
-                title=str(row['Title']),
-                author=str(row['Author']),
-                genre=genre,
-                publisher=str(row['Publisher']) if pd.notna(row['Publisher']) else None,
-                price=float(row['Price']) if pd.notna(row['Price']) else None,
-                description=f"A textbook from KJSIT Library Book Bank - {genre} department.",
-                publication_year=None,  # Not available in data
-                pages=None,  # Not available in data
-                language='English',
-                cover_url=None
-            )
-
-            session.add(book)
+        for row in df.to_dict('records'):
+            session.add(Book(**book_record_from_row(row)))
             books_added += 1
 
         session.commit()
@@ -228,10 +190,15 @@ def seed_kjsit_data():
         for book in books:
             ratings = session.query(Rating).filter_by(book_id=book.id).all()
             if ratings:
-                avg_rating = sum(r.rating for r in ratings) / len(ratings)
-                book.average_rating = round(avg_rating, 2)
+                book.rating_sum = sum(r.rating for r in ratings)
+                book.average_rating = book.rating_sum / len(ratings)
                 book.total_ratings = len(ratings)
 
+        # Recompute the analytics aggregates for the freshly seeded tables
+        rebuild_analytics_summary(session)
+        # Ratings were replaced without events, so running processes rebuild
+        bump_data_version(session, CATALOG)
+        bump_data_version(session, USERS)
         session.commit()
 
         print("\n📊 Database Statistics:")
@@ -0,0 +1,112 @@
+"""
+KJSIT Book Recommendation System - Title Resolver
+Resolves a free-text title to ranked candidate books using indexes built
+once per model, instead of a regex scan over the whole frame per query.
+"""
+
+import re
+import bisect
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalise_title(title) -> str:
+    """Lower-case a title and collapse punctuation/whitespace to single spaces"""
+    return _NON_ALNUM.sub(' ', str(title).lower()).strip()
+
+
+def title_ngrams(normalised: str, n: int = 3) -> set:
+    """Character n-grams of a normalised title, padded so short words still count"""
+    padded = f" {normalised} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class TitleResolver:
+    """
+    Title lookup over a book frame, answered in three tiers:
+    exact hits from a normalised-title hash map, prefix hits from a sorted
+    title array, and fuzzy hits from a character n-gram index.
+    """
+
+    def __init__(self, df: pd.DataFrame, title_column: str = 'Title',
+                 accession_column: str = 'Accession_Number', ngram: int = 3,
+                 min_fuzzy_score: float = 0.8):
+        self.ngram = ngram
+        self.min_fuzzy_score = min_fuzzy_score
+        self.accessions = [str(a) for a in df[accession_column].tolist()]
+        self._accession_positions = {a: pos for pos, a in enumerate(self.accessions)}
+
+        # Normalised title -> row positions of every edition, in frame order
+        self._positions: Dict[str, List[int]] = defaultdict(list)
+        for pos, title in enumerate(df[title_column].tolist()):
+            key = normalise_title(title)
+            if key:
+                self._positions[key].append(pos)
+
+        self._titles = sorted(self._positions)
+        self._title_grams = [title_ngrams(t, ngram) for t in self._titles]
+
+        self._gram_index: Dict[str, List[int]] = defaultdict(list)
+        for title_id, grams in enumerate(self._title_grams):
+            for gram in grams:
+                self._gram_index[gram].append(title_id)
+
+    def position_of(self, accession_number) -> Optional[int]:
+        """Row position of an accession number, if it is in the catalog"""
+        return self._accession_positions.get(str(accession_number).strip())
+
+    def _ranked_titles(self, query: str) -> List[str]:
+        key = normalise_title(query)
+        if not key:
+            return []
+
+        ranked = []
+        if key in self._positions:
+            ranked.append(key)
+
+        # Prefix hits: contiguous run of the sorted array, shortest titles first
+        start = bisect.bisect_left(self._titles, key)
+        end = bisect.bisect_left(self._titles, key + '\uffff')
+        prefix_hits = sorted((t for t in self._titles[start:end] if t != key), key=lambda t: (len(t), t))
+        ranked.extend(prefix_hits)
+
+        # Fuzzy hits: share of the query's n-grams found in the title, then overlap
+        seen = set(ranked)
+        query_grams = title_ngrams(key, self.ngram)
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for title_id in self._gram_index.get(gram, ()):
+                shared[title_id] += 1
+
+        scored = []
+        for title_id, count in shared.items():
+            title = self._titles[title_id]
+            if title in seen:
+                continue
+            coverage = count / len(query_grams)
+            if coverage < self.min_fuzzy_score:
+                continue
+            dice = 2 * count / (len(query_grams) + len(self._title_grams[title_id]))
+            scored.append((-coverage, -dice, title))
+
+        ranked.extend(title for _, _, title in sorted(scored))
+        return ranked
+
+    def resolve_positions(self, query: str, limit: Optional[int] = None) -> List[int]:
+        """Ranked row positions for a title query (every edition of each title)"""
+        positions = []
+        for title in self._ranked_titles(query):
+            positions.extend(self._positions[title])
+            if limit is not None and len(positions) >= limit:
+                return positions[:limit]
+        return positions
+
+    def resolve(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """Ranked candidate accession numbers for a title query"""
+        return [self.accessions[pos] for pos in self.resolve_positions(query, limit)]